@@ -0,0 +1,62 @@
+"""Measures the cost of analyzing one package per invocation, with and without the fork server.
+
+Each package is analyzed in turn by running the command-line interface in a new interpreter, by running the client
+of a fork server in a new interpreter, and by calling :func:`ros_cmake_analyzer.server.request` from this process,
+which excludes the startup of the client. The median time of each is reported. Usage::
+
+    python benchmarks/fork_server.py [--runs 10] [package ...]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from pathlib import Path
+
+from ros_cmake_analyzer.server import request
+
+DEFAULT_PACKAGES = ("tests/test_packages/autorally_core", "tests/test_packages/car_demo")
+
+
+def _median_ms(runs: int, call: t.Callable[[], object]) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("packages", nargs="*", default=DEFAULT_PACKAGES, help="The ROS 1 packages to analyze")
+    parser.add_argument("--runs", type=int, default=10, help="The number of times to analyze each package")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        address = Path(directory) / "server.sock"
+        server = subprocess.Popen([sys.executable, "-m", "ros_cmake_analyzer.server", "serve", str(address)])
+        try:
+            while not address.exists():
+                time.sleep(0.01)
+            # The first request waits for the server to warm up
+            request(address, "ros1", args.packages[0])
+            print(f"{'package':<40} {'cli':>10} {'client':>10} {'request':>10}")
+            for package in args.packages:
+                cli = _median_ms(args.runs, lambda p=package: subprocess.run(
+                    [sys.executable, "-m", "ros_cmake_analyzer.main", "ros1", p], capture_output=True, check=True))
+                client = _median_ms(args.runs, lambda p=package: subprocess.run(
+                    [sys.executable, "-m", "ros_cmake_analyzer.server", "request", str(address), "ros1", p],
+                    capture_output=True, check=True))
+                direct = _median_ms(args.runs, lambda p=package: request(address, "ros1", p))
+                print(f"{Path(package).name:<40} {cli:8.1f}ms {client:8.1f}ms {direct:8.1f}ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
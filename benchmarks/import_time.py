@@ -0,0 +1,52 @@
+"""Measures how long it takes to import ros_cmake_analyzer, and fails if that exceeds a budget.
+
+Each module is imported in a fresh interpreter with ``python -X importtime``, and the cumulative time reported
+for the module is taken from the fastest of several runs, which excludes the startup of the interpreter itself.
+Usage::
+
+    python benchmarks/import_time.py [--budget 50] [--runs 5] [module ...]
+"""
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+
+DEFAULT_MODULES = ("ros_cmake_analyzer", "ros_cmake_analyzer.main", "ros_cmake_analyzer.ros1",
+                   "ros_cmake_analyzer.ros2")
+
+
+def import_time(module: str, runs: int = 5) -> float:
+    """Returns the fastest cumulative time, in milliseconds, taken to import a module in a new interpreter."""
+    best = float("inf")
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            _, _, cumulative, name = (part.strip() for part in line.replace(":", "|", 1).split("|"))
+            if name == module:
+                best = min(best, int(cumulative) / 1000)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="The modules to import")
+    parser.add_argument("--budget", type=float, default=50.0,
+                        help="The time in milliseconds that importing ros_cmake_analyzer may take")
+    parser.add_argument("--runs", type=int, default=5, help="The number of times to import each module")
+    args = parser.parse_args()
+    over_budget = False
+    for module in args.modules:
+        elapsed = import_time(module, args.runs)
+        # Only the package itself, and the CLI up to parsing its arguments, are held to the budget
+        budgeted = module in ("ros_cmake_analyzer", "ros_cmake_analyzer.main")
+        status = ("over budget" if elapsed > args.budget else "ok") if budgeted else ""
+        over_budget |= budgeted and elapsed > args.budget
+        print(f"{module:<32} {elapsed:8.1f} ms  {status}")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
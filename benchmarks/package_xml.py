@@ -0,0 +1,80 @@
+"""Compares the streaming package.xml reader against the minidom-based parser that it replaced.
+
+The minidom path parsed each manifest twice: once into a DOM for the package definition, and once more with
+defusedxml for the exports of the package. Usage::
+
+    python benchmarks/package_xml.py [--count 3000]
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import typing as t
+import xml.dom.minidom as dom
+from pathlib import Path
+
+from defusedxml.ElementTree import parse as parse_xml
+
+from ros_cmake_analyzer.core.package_xml import reader
+from ros_cmake_analyzer.core.package_xml.reader import load_package_xml, read_package_xml
+
+FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "test_packages"
+DEPENDENCY_TAGS = ("build_depend", "buildtool_depend", "build_export_depend", "buildtool_export_depend",
+                   "exec_depend", "run_depend", "test_depend", "doc_depend", "depend", "conflict", "replace")
+
+
+def _minidom_nodes(parent: t.Any, tagname: str) -> list[t.Any]:
+    return [n for n in parent.childNodes if n.nodeType == n.ELEMENT_NODE and n.tagName == tagname]
+
+
+def _minidom_text(node: t.Any) -> str:
+    return "".join(n.data for n in node.childNodes if n.nodeType == n.TEXT_NODE).strip()
+
+
+def read_with_minidom(path: Path) -> tuple[str, list[str], dict[str, list[str]]]:
+    root = _minidom_nodes(dom.parseString(path.read_text(encoding="utf8")), "package")[0]
+    name = _minidom_text(_minidom_nodes(root, "name")[0])
+    depends = {tag: [_minidom_text(n) for n in _minidom_nodes(root, tag)] for tag in DEPENDENCY_TAGS}
+    exports = []
+    for child in parse_xml(path).getroot():
+        if child.tag == "export":
+            exports.extend(node.tag for node in child)
+    return name, exports, depends
+
+
+def make_manifests(directory: Path, count: int) -> list[Path]:
+    templates = [path.read_text() for path in sorted(FIXTURES.glob("*/package.xml"))]
+    paths = []
+    for i in range(count):
+        path = directory / f"package_{i}.xml"
+        path.write_text(templates[i % len(templates)].replace("</name>", f"_{i}</name>", 1))
+        paths.append(path)
+    return paths
+
+
+def _time(label: str, function: t.Callable[[Path], t.Any], paths: list[Path]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        function(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:9.1f} ms  {elapsed / len(paths) * 1e6:8.1f} us/manifest")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=3000, help="The number of manifests to read")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_manifests(Path(directory), args.count)
+        baseline = _time("minidom + defusedxml", read_with_minidom, paths)
+        streaming = _time("streaming", read_package_xml, paths)
+        reader._cache.clear()
+        _time("cached (first read)", load_package_xml, paths)
+        cached = _time("cached (repeat read)", load_package_xml, paths)
+    print(f"streaming is {baseline / streaming:.1f}x faster; repeat lookups are {baseline / cached:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
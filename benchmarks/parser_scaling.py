@@ -0,0 +1,155 @@
+"""Measures how the stages of the CMake parser scale with the size of their input, and fails if any scales badly.
+
+Each stage is timed at a series of geometrically increasing input sizes, and the growth exponent k of its time
+t ~ n^k is fitted by least squares on a log-log scale. A stage whose exponent exceeds the limit (1.3 by default,
+to leave room for noise on top of linear growth) is reported as "superlinear", and the script then exits with
+status 1. The stages, and the input that each of them is given at size n, are:
+
+* ``lexer``: a CMakeLists.txt of n commands,
+* ``unterminated_brackets``: a file of n bracket arguments and bracket comments that are never closed,
+* ``generator_expressions``: a file with n generator expressions,
+* ``resolve_vars``: an argument that refers to n variables,
+* ``expand_list``: an argument that refers to a list variable of n items,
+* ``parse_block``: a macro whose body is n commands,
+* ``nested_blocks``: n commands inside ifs and foreach loops that are nested eight levels deep,
+* ``argparse``: n arguments to a command that takes n options.
+
+The time taken for each command grows with the depth at which it is nested, as each level is a generator that
+passes the command on, so deeper nesting is measured by the size of a deeply nested body, rather than by its depth.
+Usage::
+
+    python benchmarks/parser_scaling.py [--stage lexer ...] [--limit 1.3] [--sizes 2000,4000,8000,16000]
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+import typing as t
+
+from ros_cmake_analyzer.cmake_parser.parser import (
+    ParserContext,
+    _lexer,
+    _resolve_generator_expressions,
+    _resolve_vars,
+)
+from ros_cmake_analyzer.cmake_parser.parser import argparse as cmake_argparse
+
+DEFAULT_SIZES = (2000, 4000, 8000, 16000)
+NESTING_DEPTH = 8
+
+
+def _parse(source: str) -> None:
+    for _ in ParserContext().parse(source, var={}):
+        pass
+
+
+def _lexer_stage(n: int) -> t.Callable[[], object]:
+    source = "".join(f'set(VAR_{i} "value {i}" ${{OTHER_{i}}}) # comment {i}\n' for i in range(n))
+    return lambda: list(_lexer(source))
+
+
+def _unterminated_brackets_stage(n: int) -> t.Callable[[], object]:
+    source = "".join(f"set(VAR_{i} [[ value)\n#[=[ comment\n" for i in range(n))
+    return lambda: list(_lexer(source))
+
+
+def _generator_expressions_stage(n: int) -> t.Callable[[], object]:
+    source = "".join(f"target_include_directories(t PUBLIC $<BUILD_INTERFACE:inc_{i}> $<INSTALL_INTERFACE:x>)\n"
+                     for i in range(n))
+    return lambda: _resolve_generator_expressions(source)
+
+
+def _resolve_vars_stage(n: int) -> t.Callable[[], object]:
+    variables = {f"V{i}": f"value_{i}" for i in range(n)}
+    argument = ";".join(f"${{V{i}}}" for i in range(n))
+    return lambda: _resolve_vars(argument, variables, {})
+
+
+def _expand_list_stage(n: int) -> t.Callable[[], object]:
+    variables = {"SOURCES": ";".join(f"src/file_{i}.cpp" for i in range(n))}
+    return lambda: _resolve_vars("prefix ${SOURCES} suffix", variables, {})
+
+
+def _parse_block_stage(n: int) -> t.Callable[[], object]:
+    body = "".join(f"  set(VAR_{i} value)\n" for i in range(n))
+    source = f"macro(generated)\n{body}endmacro()\ngenerated()\n"
+    return lambda: _parse(source)
+
+
+def _nested_blocks_stage(n: int) -> t.Callable[[], object]:
+    opening = "".join("if(TRUE)\n" if level % 2 == 0 else f"foreach(x{level} a)\n" for level in range(NESTING_DEPTH))
+    closing = "".join("endif()\n" if level % 2 == 0 else "endforeach()\n" for level in reversed(range(NESTING_DEPTH)))
+    body = "".join(f"set(VAR_{i} value)\n" for i in range(n))
+    source = opening + body + closing
+    return lambda: _parse(source)
+
+
+def _argparse_stage(n: int) -> t.Callable[[], object]:
+    options = {f"OPTION_{i}": "*" for i in range(n)}
+    arguments = [item for i in range(n) for item in (f"OPTION_{i}", f"value_{i}")]
+    return lambda: cmake_argparse(arguments, options)
+
+
+STAGES: dict[str, t.Callable[[int], t.Callable[[], object]]] = {
+    "lexer": _lexer_stage,
+    "unterminated_brackets": _unterminated_brackets_stage,
+    "generator_expressions": _generator_expressions_stage,
+    "resolve_vars": _resolve_vars_stage,
+    "expand_list": _expand_list_stage,
+    "parse_block": _parse_block_stage,
+    "nested_blocks": _nested_blocks_stage,
+    "argparse": _argparse_stage,
+}
+
+
+def best_time(function: t.Callable[[], object], runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def growth_exponent(sizes: t.Sequence[int], times: t.Sequence[float]) -> float:
+    """Returns the slope of the least-squares fit of log(time) against log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(elapsed, 1e-9)) for elapsed in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return covariance / variance
+
+
+def measure(stage: str, sizes: t.Sequence[int] = DEFAULT_SIZES, runs: int = 3) -> tuple[list[float], float]:
+    """Times a stage at each size, and returns the times along with their growth exponent."""
+    times = [best_time(STAGES[stage](size), runs) for size in sizes]
+    return times, growth_exponent(sizes, times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stage", action="append", choices=sorted(STAGES), dest="stages",
+                        help="A stage to measure; may be repeated. Defaults to every stage.")
+    parser.add_argument("--limit", type=float, default=1.3, help="The largest acceptable growth exponent")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="The comma-separated input sizes to time each stage at")
+    parser.add_argument("--runs", type=int, default=3, help="The number of times to time each size")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    superlinear = False
+    for stage in args.stages or STAGES:
+        times, exponent = measure(stage, sizes, args.runs)
+        status = "superlinear" if exponent > args.limit else "ok"
+        superlinear |= exponent > args.limit
+        timings = "  ".join(f"{elapsed * 1000:8.2f}" for elapsed in times)
+        print(f"{stage:<22} {timings}  ms   n^{exponent:.2f}  {status}")
+    if superlinear:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
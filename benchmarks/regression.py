@@ -0,0 +1,179 @@
+"""Compares the performance of the extractors against a stored baseline, and fails if it has regressed.
+
+Each scenario is one of the synthetic workspaces of :mod:`throughput`. It is analyzed once to warm up, and then
+timed over a number of trials, from which the median and 95th percentile time per trial are kept, along with
+the median absolute deviation of the trials as a measure of their noise. A final trial runs under
+:mod:`tracemalloc` to record the peak memory allocated while analyzing the workspace. ``save`` writes the results to
+a baseline file, and ``compare`` measures again and reports each scenario against the baseline::
+
+    python benchmarks/regression.py save --baseline baseline.json
+    python benchmarks/regression.py compare --baseline baseline.json [--tolerance 0.15] [--memory-tolerance 0.1]
+
+A scenario has regressed when its median time exceeds that of the baseline by more than the tolerance, and by
+more than three times the larger of the two deviations, so that a noisy trial does not fail the comparison. As a
+busy machine can slow down every trial of a scenario at once, a scenario that appears slower is measured again, up
+to ``--retries`` times, and the fastest of its measurements is kept. Its memory has regressed when its peak
+allocation exceeds that of the baseline by more than the memory tolerance.
+
+``compare`` exits with status 1 if any scenario has regressed. Baselines are only comparable on the same machine
+and Python version, which are stored with the results, and a mismatch is reported.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing as t
+from pathlib import Path
+
+from synthetic import WorkspaceSpec, generate_workspace
+from throughput import PRESETS
+
+from ros_cmake_analyzer.batch import extractor_for
+from ros_cmake_analyzer.diagnostics import diagnostics
+
+FORMAT_VERSION = 1
+# The number of deviations by which a median must move to count as a change, rather than as noise
+NOISE_FACTOR = 3.0
+
+
+def _analyze(extractor: t.Any, packages: list[Path]) -> None:
+    for package in packages:
+        extractor(package).get_cmake_info()
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(percentile * (len(ordered) - 1)))]
+
+
+def measure(spec: WorkspaceSpec, trials: int) -> dict[str, float]:
+    """Times the analysis of a synthetic workspace, and measures its peak memory allocation."""
+    extractor = extractor_for(spec.ros)
+    with tempfile.TemporaryDirectory() as directory, diagnostics.silenced():
+        packages = generate_workspace(directory, spec)
+        _analyze(extractor, packages)
+        times = []
+        for _ in range(trials):
+            start = time.perf_counter()
+            _analyze(extractor, packages)
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            _analyze(extractor, packages)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    median = statistics.median(times)
+    return {
+        "median": median,
+        "p95": _percentile(times, 0.95),
+        "deviation": statistics.median(abs(elapsed - median) for elapsed in times),
+        "peak_bytes": peak,
+        "packages": len(packages),
+    }
+
+
+def run(scenarios: t.Iterable[str], trials: int, packages: int) -> dict[str, t.Any]:
+    results = {}
+    for name in scenarios:
+        spec = PRESETS[name]
+        results[name] = measure(WorkspaceSpec(**{**spec.to_dict(), "packages": packages}), trials)
+        print(f"measured {name}: median {results[name]['median'] * 1000:.1f} ms", file=sys.stderr)
+    return {
+        "version": FORMAT_VERSION,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.machine()},
+        "trials": trials,
+        "scenarios": results,
+    }
+
+
+def _is_slower(before: dict[str, float], now: dict[str, float], tolerance: float) -> bool:
+    noise = NOISE_FACTOR * max(before["deviation"], now["deviation"])
+    return now["median"] / before["median"] - 1 > tolerance and now["median"] - before["median"] > noise
+
+
+def remeasure_slower(baseline: dict[str, t.Any], current: dict[str, t.Any], tolerance: float, retries: int) -> None:
+    """Measures the scenarios that appear slower than the baseline again, keeping their fastest measurement."""
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        for _ in range(retries):
+            if before is None or not _is_slower(before, now, tolerance):
+                break
+            print(f"remeasuring {name}", file=sys.stderr)
+            spec = WorkspaceSpec(**{**PRESETS[name].to_dict(), "packages": now["packages"]})
+            again = measure(spec, current["trials"])
+            if again["median"] < now["median"]:
+                now = current["scenarios"][name] = again
+
+
+def compare(baseline: dict[str, t.Any], current: dict[str, t.Any], tolerance: float,
+            memory_tolerance: float) -> tuple[list[str], bool]:
+    """Returns a report of each scenario of the current run against the baseline, and whether any regressed."""
+    lines = []
+    if baseline["machine"] != current["machine"]:
+        lines.append(f"warning: the baseline was measured on {baseline['machine']}, not {current['machine']}")
+    lines.append(f"{'scenario':<16} {'baseline':>10} {'current':>10} {'change':>8} {'p95':>10} "
+                 f"{'peak MiB':>9} {'change':>8}  status")
+    regressed = False
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            lines.append(f"{name:<16} {'':>10} {now['median'] * 1000:8.1f}ms {'':>8} {now['p95'] * 1000:8.1f}ms "
+                         f"{now['peak_bytes'] / 2**20:9.1f} {'':>8}  new")
+            continue
+        time_change = now["median"] / before["median"] - 1
+        slower = _is_slower(before, now, tolerance)
+        memory_change = now["peak_bytes"] / before["peak_bytes"] - 1 if before["peak_bytes"] else 0.0
+        larger = memory_change > memory_tolerance
+        problems = [problem for problem, found in (("slower", slower), ("more memory", larger)) if found]
+        regressed |= bool(problems)
+        lines.append(f"{name:<16} {before['median'] * 1000:8.1f}ms {now['median'] * 1000:8.1f}ms "
+                     f"{time_change:+8.1%} {now['p95'] * 1000:8.1f}ms {now['peak_bytes'] / 2**20:9.1f} "
+                     f"{memory_change:+8.1%}  {', '.join(problems) or 'ok'}")
+    return lines, regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["save", "compare"],
+                        help="Whether to save a new baseline, or to compare against an existing one")
+    parser.add_argument("--baseline", type=Path, default=Path("benchmark-baseline.json"),
+                        help="The file that the baseline is saved to or read from")
+    parser.add_argument("--scenario", action="append", choices=sorted(PRESETS), dest="scenarios",
+                        help="A scenario to measure; may be repeated. Defaults to those in the baseline, or all.")
+    parser.add_argument("--trials", type=int, default=7, help="The number of timed trials of each scenario")
+    parser.add_argument("--packages", type=int, default=20, help="The number of packages in each workspace")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="The fraction by which the median time may grow before it is a regression")
+    parser.add_argument("--memory-tolerance", type=float, default=0.1,
+                        help="The fraction by which the peak allocation may grow before it is a regression")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="The number of times to measure a scenario again when it appears slower")
+    args = parser.parse_args()
+    if args.mode == "save":
+        results = run(args.scenarios or PRESETS, args.trials, args.packages)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Saved a baseline of {len(results['scenarios'])} scenarios to {args.baseline}")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("version") != FORMAT_VERSION:
+        sys.exit(f"{args.baseline} is not a baseline of version {FORMAT_VERSION}")
+    scenarios = args.scenarios or [name for name in baseline["scenarios"] if name in PRESETS]
+    packages = next(iter(baseline["scenarios"].values()), {}).get("packages", args.packages)
+    current = run(scenarios, args.trials, packages)
+    remeasure_slower(baseline, current, args.tolerance, args.retries)
+    lines, regressed = compare(baseline, current, args.tolerance, args.memory_tolerance)
+    print("\n".join(lines))
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
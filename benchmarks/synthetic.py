@@ -0,0 +1,163 @@
+"""Generates synthetic ROS workspaces, so that the extractors can be measured on inputs of any size and shape.
+
+Workspaces are deterministic: the same :class:`WorkspaceSpec` always produces byte-identical files. Each package
+has a package.xml, a CMakeLists.txt that exercises the constructs that the spec asks for, and every source file that
+the CMakeLists.txt refers to, so that the extractors can resolve all of them. The shape of each package is set by:
+
+* ``depth``: each CMakeLists.txt adds a subdirectory with a CMakeLists.txt of its own, this many levels deep,
+* ``macros``: each CMakeLists.txt defines this many macros (and calls each of them once),
+* ``foreach``: each CMakeLists.txt adds an executable in a foreach() loop over this many items,
+* ``globs``: each CMakeLists.txt builds a library from file(GLOB ...) over this many sources, and
+* ``nodelets``: the package exports this many nodelets (ROS 1) or plugins (ROS 2) in a plugin description file.
+
+Usage::
+
+    python benchmarks/synthetic.py /tmp/workspace --packages 100 --depth 2 --globs 20
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import typing as t
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class WorkspaceSpec:
+    ros: str = "ros1"
+    packages: int = 10
+    depth: int = 1
+    macros: int = 2
+    foreach: int = 4
+    globs: int = 4
+    nodelets: int = 2
+    seed: int = 0
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return asdict(self)
+
+
+_SOURCE = "#include <cstdio>\n\nint {name}_main() {{ return std::puts(\"{name}\"); }}\n"
+_NODELET_SOURCE = """#include <pluginlib/class_list_macros.h>
+
+namespace {package} {{
+class {name} : public nodelet::Nodelet {{
+  void onInit() override {{}}
+}};
+}}  // namespace {package}
+
+PLUGINLIB_EXPORT_CLASS({package}::{name}, nodelet::Nodelet)
+"""
+
+
+def _write(path: Path, contents: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(contents)
+
+
+def _package_xml(spec: WorkspaceSpec, name: str, rng: random.Random) -> str:
+    depends = "".join(f"  <depend>dep_{rng.randrange(50)}</depend>\n" for _ in range(rng.randint(2, 8)))
+    if spec.ros == "ros1":
+        buildtool = "catkin"
+        export = '    <nodelet plugin="${prefix}/nodelet_plugins.xml"/>\n' if spec.nodelets else ""
+    else:
+        buildtool = "ament_cmake"
+        export = "    <build_type>ament_cmake</build_type>\n"
+    return (f'<?xml version="1.0"?>\n<package format="{2 if spec.ros == "ros1" else 3}">\n'
+            f"  <name>{name}</name>\n  <version>1.0.0</version>\n  <description>Synthetic package</description>\n"
+            f'  <maintainer email="synthetic@example.com">Synthetic</maintainer>\n  <license>BSD</license>\n'
+            f"  <buildtool_depend>{buildtool}</buildtool_depend>\n{depends}"
+            f"  <export>\n{export}  </export>\n</package>\n")
+
+
+def _plugin_xml(package: str, nodelets: list[str]) -> str:
+    return "".join(f'<library path="lib/lib{package}_{name}">\n'
+                   f'  <class name="{package}/{name}" type="{package}::{name}" base_class_type="nodelet::Nodelet">\n'
+                   f"    <description>{name}</description>\n  </class>\n</library>\n" for name in nodelets)
+
+
+def _cmakelists(spec: WorkspaceSpec, package: str, directory: Path, prefix: str, level: int) -> str:
+    """Writes the sources of one (sub)directory of a package, and returns the contents of its CMakeLists.txt."""
+    lines: list[str] = []
+    if level == 0:
+        lines.append("cmake_minimum_required(VERSION 3.5)")
+        lines.append(f"project({package})")
+        if spec.ros == "ros1":
+            lines.append("find_package(catkin REQUIRED COMPONENTS roscpp nodelet)")
+            lines.append("catkin_package()")
+        else:
+            lines.append("find_package(ament_cmake REQUIRED)")
+        lines.append("include_directories(include)")
+    for i in range(spec.macros):
+        macro = f"{prefix}_add_tool_{i}"
+        lines.append(f"macro({macro} name)")
+        lines.append("  set(TOOL_SOURCE src/${name}.cpp)")
+        lines.append("  add_executable(${name} ${TOOL_SOURCE})")
+        lines.append("  target_link_libraries(${name} ${CMAKE_THREAD_LIBS_INIT} pthread)")
+        lines.append(f"endmacro({macro})")
+        lines.append(f"{macro}({prefix}_tool_{i})")
+        _write(directory / "src" / f"{prefix}_tool_{i}.cpp", _SOURCE.format(name=f"{prefix}_tool_{i}"))
+    if spec.foreach:
+        items = [f"{prefix}_node_{i}" for i in range(spec.foreach)]
+        lines.append(f"set({prefix.upper()}_NODES {' '.join(items)})")
+        lines.append(f"foreach(node ${{{prefix.upper()}_NODES}})")
+        lines.append("  add_executable(${node} src/nodes/${node}.cpp)")
+        lines.append("endforeach()")
+        for item in items:
+            _write(directory / "src" / "nodes" / f"{item}.cpp", _SOURCE.format(name=item))
+    if spec.globs:
+        lines.append(f"file(GLOB {prefix.upper()}_SOURCES src/glob/*.cpp)")
+        lines.append(f"add_library({prefix}_glob ${{{prefix.upper()}_SOURCES}})")
+        for i in range(spec.globs):
+            _write(directory / "src" / "glob" / f"{prefix}_part_{i}.cpp", _SOURCE.format(name=f"{prefix}_part_{i}"))
+    if level < spec.depth:
+        lines.append(f"add_subdirectory(sub{level + 1})")
+        child = _cmakelists(spec, package, directory / f"sub{level + 1}", f"{prefix}_s{level + 1}", level + 1)
+        _write(directory / f"sub{level + 1}" / "CMakeLists.txt", child)
+    return "\n".join(lines) + "\n"
+
+
+def generate_package(root: Path, spec: WorkspaceSpec, index: int) -> Path:
+    rng = random.Random(f"{spec.seed}:{index}")
+    name = f"synthetic_{index:05d}"
+    package_dir = root / name
+    _write(package_dir / "package.xml", _package_xml(spec, name, rng))
+    cmakelists = _cmakelists(spec, name, package_dir, name, 0)
+    if spec.nodelets:
+        nodelets = [f"Nodelet{i}" for i in range(spec.nodelets)]
+        for nodelet in nodelets:
+            _write(package_dir / "src" / "nodelets" / f"{nodelet}.cpp",
+                   _NODELET_SOURCE.format(package=name, name=nodelet))
+        # One library for each nodelet, so that nodelets are resolved to their targets by class name
+        cmakelists += "".join(f"add_library({name}_{nodelet} src/nodelets/{nodelet}.cpp)\n" for nodelet in nodelets)
+        _write(package_dir / "nodelet_plugins.xml", _plugin_xml(name, nodelets))
+        if spec.ros == "ros2":
+            cmakelists += "pluginlib_export_plugin_description_file(nodelet nodelet_plugins.xml)\n"
+    if spec.ros == "ros2":
+        cmakelists += "ament_package()\n"
+    _write(package_dir / "CMakeLists.txt", cmakelists)
+    return package_dir
+
+
+def generate_workspace(root: str | Path, spec: WorkspaceSpec) -> list[Path]:
+    """Writes the packages of a synthetic workspace underneath root, and returns their directories."""
+    root = Path(root)
+    return [generate_package(root, spec, index) for index in range(spec.packages)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", type=Path, help="The directory to write the workspace to")
+    defaults = WorkspaceSpec()
+    parser.add_argument("--ros", choices=["ros1", "ros2"], default=defaults.ros)
+    for name in ("packages", "depth", "macros", "foreach", "globs", "nodelets", "seed"):
+        parser.add_argument(f"--{name}", type=int, default=getattr(defaults, name))
+    args = vars(parser.parse_args())
+    directory = args.pop("directory")
+    packages = generate_workspace(directory, WorkspaceSpec(**args))
+    print(f"Wrote {len(packages)} packages to {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Measures the end-to-end throughput of the extractors on synthetic workspaces, and reports it as JSON.
+
+Each preset describes the shape of a workspace (see :mod:`synthetic`). For each preset, a workspace is generated in
+a temporary directory, and every package in it is analyzed in this process, first without statistics to measure the
+throughput in packages per second, and then with ``collect_stats=True`` to break the time down into the lexing,
+parsing and expansion of CMake files and the slowest command handlers. The report also includes the peak resident
+set size of the process, which only ever grows, so presets are best run one at a time when comparing memory usage.
+Usage::
+
+    python benchmarks/throughput.py [--preset glob-heavy ...] [--packages 50] [--repeat 3] [--output report.json]
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import resource
+import sys
+import tempfile
+import time
+import typing as t
+
+from synthetic import WorkspaceSpec, generate_workspace
+
+from ros_cmake_analyzer.batch import extractor_for
+from ros_cmake_analyzer.diagnostics import diagnostics
+from ros_cmake_analyzer.stats import AnalysisStats
+
+PRESETS: dict[str, WorkspaceSpec] = {
+    "small": WorkspaceSpec(),
+    "deep": WorkspaceSpec(depth=6),
+    "macro-heavy": WorkspaceSpec(macros=30),
+    "foreach-heavy": WorkspaceSpec(foreach=200),
+    "glob-heavy": WorkspaceSpec(globs=100),
+    "nodelet-heavy": WorkspaceSpec(nodelets=50),
+    "ros2": WorkspaceSpec(ros="ros2"),
+}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, and macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(spec: WorkspaceSpec, repeat: int = 3, handlers: int = 10) -> dict[str, t.Any]:
+    """Analyzes a synthetic workspace of the given shape, and returns its throughput and a breakdown of its time."""
+    extractor = extractor_for(spec.ros)
+    with tempfile.TemporaryDirectory() as directory, diagnostics.silenced():
+        packages = generate_workspace(directory, spec)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for package in packages:
+                extractor(package).get_cmake_info()
+            best = min(best, time.perf_counter() - start)
+        stats: AnalysisStats | None = None
+        for package in packages:
+            info = extractor(package, collect_stats=True).get_cmake_info()
+            if info.stats is None:
+                continue
+            if stats is None:
+                stats = info.stats
+            else:
+                stats.merge(info.stats)
+    stats = stats or AnalysisStats(packages=0)
+    files = stats.files.values()
+    return {
+        "spec": spec.to_dict(),
+        "seconds": best,
+        "packages_per_second": len(packages) / best if best else 0.0,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "phases": {
+            "lex_seconds": sum(file.lex_seconds for file in files),
+            "parse_seconds": sum(file.parse_seconds for file in files),
+            "expand_seconds": sum(file.expand_seconds for file in files),
+        },
+        "cmake_files": len(stats.files),
+        "bytes_read": stats.bytes_read,
+        "filesystem": dict(stats.filesystem),
+        "slowest_handlers": {command: handler.to_dict() for command, handler in stats.slowest_handlers(handlers)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS), dest="presets",
+                        help="A shape of workspace to measure; may be repeated. Defaults to every preset.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of timed passes over each workspace")
+    parser.add_argument("--output", help="The file to write the report to, rather than stdout")
+    for name in ("packages", "seed"):
+        parser.add_argument(f"--{name}", type=int, help=f"Overrides the {name} of every preset")
+    args = parser.parse_args()
+    overrides = {name: getattr(args, name) for name in ("packages", "seed") if getattr(args, name) is not None}
+    report = {}
+    for name in args.presets or PRESETS:
+        spec = dataclasses.replace(PRESETS[name], **overrides)
+        report[name] = measure(spec, args.repeat)
+        print(f"{name:<16} {report[name]['packages_per_second']:10.1f} packages/s", file=sys.stderr)
+    contents = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:  # noqa: PTH123
+            f.write(contents + "\n")
+    else:
+        print(contents)
+
+
+if __name__ == "__main__":
+    main()
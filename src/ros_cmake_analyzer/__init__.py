@@ -1,7 +1,16 @@
+from __future__ import annotations
+
 __all__ = ("CMakeExtractor",)
 
-from loguru import logger as _logger
+# Avoids importing typing, which is a noticeable part of the time taken to import the package
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .extractor import CMakeExtractor
 
-from .extractor import CMakeExtractor
 
-_logger.disable("ros_cmake_analyzer")
+def __getattr__(name: str) -> object:
+    # The extractor, and everything that it depends on, is only imported once it is used
+    if name == "CMakeExtractor":
+        from .extractor import CMakeExtractor
+        return CMakeExtractor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
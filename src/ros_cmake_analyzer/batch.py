@@ -0,0 +1,547 @@
+from __future__ import annotations
+
+__all__ = (
+    "BatchAnalyzer",
+    "BatchReport",
+    "ResultSink",
+    "WorkerSummary",
+    "extractor_for",
+    "find_packages",
+)
+
+import collections
+import contextlib
+import multiprocessing
+import os
+import tempfile
+import time
+import typing as t
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+
+from . import trace
+from .diagnostics import PackageFailed, diagnostics
+from .model import CMakeInfo
+from .paths import path_session
+from .serialization import decode, encode
+from .transfer import TRANSPORTS, EncodedResult, SpoolFile, to_shared_memory
+
+if t.TYPE_CHECKING:
+    from .budget import Budget
+    from .core.package import Package
+    from .extractor import CMakeExtractor
+    from .prelude import PreludeCache
+    from .schedule import CostHistory
+    from .stats import AnalysisStats
+    from .trace import Tracer
+
+ROS_VERSIONS = ("ros1", "ros2")
+
+
+def extractor_for(ros_version: str) -> type[CMakeExtractor]:
+    """Returns the extractor class that handles packages for a given ROS major version.
+
+    Raises
+    ------
+    ValueError
+        if the ROS version is not one of 'ros1' or 'ros2'
+
+    """
+    if ros_version == "ros1":
+        from .ros1 import ROS1CMakeExtractor
+        return ROS1CMakeExtractor
+    if ros_version == "ros2":
+        from .ros2 import ROS2CMakeExtractor
+        return ROS2CMakeExtractor
+    raise ValueError(f"Unknown ROS version: {ros_version}")
+
+
+def _resident_set_size() -> int | None:
+    """Returns the resident set size of this process in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:  # noqa: PTH123
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def find_packages(directory: str | Path) -> t.Iterator[Path]:
+    """Finds the directories of all packages underneath a given directory.
+
+    A package is any directory that contains a package.xml file. Packages cannot be nested, so the
+    search does not descend any further into a package directory. Hidden directories are skipped.
+    """
+    for dirpath, dirnames, filenames in os.walk(directory):
+        if "package.xml" in filenames:
+            dirnames.clear()
+            yield Path(dirpath)
+        else:
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+
+
+class ResultSink(t.Protocol):
+    """Consumes the results of a batch run as each package is analyzed.
+
+    A sink may additionally define ``add_encoded(package, data)``, in which case results from worker processes are
+    given to it in the binary format of :mod:`ros_cmake_analyzer.serialization`, without being decoded, and
+    ``add_failure(path, reason)``, in which case it is also told about each package that could not be analyzed.
+    """
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        ...
+
+
+@dataclass(frozen=True, slots=True)
+class WorkerSummary:
+    """The packages analyzed by one worker process of a batch run, and the most memory that it was seen to use.
+
+    Attributes
+    ----------
+    index: int
+        The slot of the pool that the process filled, which is shared by the processes that replace it
+    pid: int | None
+        The process ID
+    packages: int
+        The number of packages that the process analyzed, including those that failed
+    peak_rss: int | None
+        The largest resident set size, in bytes, that the process reported after analyzing a package, or None if it
+        could not be measured
+    retired: str
+        Why the process stopped: "finished" at the end of the run, "crashed", or recycled after "max_tasks" packages
+        or when its resident set size reached "max_rss"
+
+    """
+
+    index: int
+    pid: int | None
+    packages: int
+    peak_rss: int | None
+    retired: str
+
+
+@dataclass
+class BatchReport:
+    """Summarizes a batch run.
+
+    Attributes
+    ----------
+    analyzed: list[Path]
+        The packages that were successfully analyzed, in the order that they finished.
+    failed: dict[Path, str]
+        The packages that could not be analyzed, along with the reason why.
+    stats: AnalysisStats | None
+        The statistics of all the analyzed packages combined, if the analyzer was asked to collect them.
+    truncated: list[Path]
+        The analyzed packages whose analysis exceeded the budget, and whose results are therefore partial.
+    workers: list[WorkerSummary]
+        The worker processes of a parallel run, in the order in which they stopped.
+
+    """
+
+    analyzed: list[Path] = field(default_factory=list)
+    failed: dict[Path, str] = field(default_factory=dict)
+    stats: AnalysisStats | None = None
+    truncated: list[Path] = field(default_factory=list)
+    workers: list[WorkerSummary] = field(default_factory=list)
+
+    def _add_stats(self, stats: AnalysisStats | None) -> None:
+        if stats is None:
+            return
+        if self.stats is None:
+            from .stats import AnalysisStats
+            self.stats = AnalysisStats(packages=0)
+        self.stats.merge(stats)
+
+
+class BatchAnalyzer:
+    """Analyzes many packages and hands each result to a set of sinks.
+
+    Results are not retained by the analyzer itself, so memory use does not grow with the number of packages.
+
+    With more than one worker, packages are analyzed in a pool of worker processes. Each worker encodes its result
+    in the binary format and transfers it to the parent through the chosen transport: "shm" writes each result
+    to a shared memory segment, "spool" appends it to a memory-mapped file that belongs to the worker, and
+    "pickle" sends the CMakeInfo itself over the pipe. Results are only decoded in the parent if a sink needs
+    the decoded form.
+
+    With ``collect_stats=True``, each package is analyzed with statistics enabled (see :mod:`ros_cmake_analyzer.stats`),
+    and the statistics of all packages are combined in the report. Workers send their statistics to the parent
+    alongside each result. Likewise, given a :class:`ros_cmake_analyzer.trace.Tracer`, the spans of every package,
+    including those recorded by workers, are collected in the tracer, with one track for each worker process.
+
+    Given a :class:`ros_cmake_analyzer.budget.Budget`, the analysis of each package is limited by it, and a package
+    that exceeds it is reported as analyzed, with its partial result, and is also listed in the report as truncated.
+    A worker process that dies while analyzing a package, for instance as it runs out of memory, is replaced, and the
+    package is given to another worker up to ``retries`` more times before it is reported as failed. So that
+    memory that a worker accumulates over a long run is given back, a worker is replaced between packages once it
+    has analyzed ``max_tasks_per_worker`` packages, or once its resident set size, which it reads from
+    /proc/self/statm after each package, reaches ``max_worker_rss`` bytes. The report lists each worker process
+    with the largest resident set size that it reported.
+
+    Given a :class:`ros_cmake_analyzer.schedule.CostHistory`, the packages are analyzed in decreasing order of their
+    expected cost, so that the largest packages are not left until last, and the time taken by each package is
+    recorded in the history.
+
+    With ``resilient=True``, the text around a syntax error in a CMake file is skipped, and recorded as an unprocessed
+    command of the package, rather than failing the package. With ``share_preludes=True``, the state after the prelude
+    of a top-level CMakeLists.txt file that other packages share is restored from a snapshot rather than recomputed
+    (see :mod:`ros_cmake_analyzer.prelude`). Each worker process keeps snapshots of its own.
+    """
+
+    def __init__(
+            self,
+            ros_version: str,
+            sinks: t.Sequence[ResultSink] = (),
+            workers: int = 1,
+            transport: str = "shm",
+            *,
+            collect_stats: bool = False,
+            tracer: Tracer | None = None,
+            budget: Budget | None = None,
+            resilient: bool = False,
+            retries: int = 0,
+            max_tasks_per_worker: int | None = None,
+            max_worker_rss: int | None = None,
+            cost_history: CostHistory | None = None,
+            share_preludes: bool = False,
+    ) -> None:
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}")
+        self.ros_version = ros_version
+        self.extractor_class = extractor_for(ros_version)
+        self.sinks = list(sinks)
+        self.workers = workers
+        self.transport = transport
+        self.collect_stats = collect_stats
+        self.tracer = tracer
+        self.budget = budget
+        self.resilient = resilient
+        self.retries = retries
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_rss = max_worker_rss
+        self.cost_history = cost_history
+        self.share_preludes = share_preludes
+        self.preludes: PreludeCache | None = None
+        if share_preludes:
+            from .prelude import PreludeCache
+            self.preludes = PreludeCache()
+
+    def analyze(self, package_dir: Path) -> tuple[Package, CMakeInfo]:
+        with trace.span(package_dir.name, "package", {"path": str(package_dir)}):
+            extractor = self.extractor_class(package_dir, collect_stats=self.collect_stats, budget=self.budget,
+                                             resilient=self.resilient, preludes=self.preludes)
+            return extractor.package, extractor.get_cmake_info()
+
+    def run(self, package_dirs: t.Iterable[str | Path]) -> BatchReport:
+        paths = [Path(package_dir) for package_dir in package_dirs]
+        if self.tracer is None:
+            return self._run(paths)
+        self.tracer.name_process(os.getpid(), "ros-cmake-analyzer")
+        previous = trace.activate(self.tracer)
+        try:
+            return self._run(paths)
+        finally:
+            trace.activate(previous)
+
+    def _record_cost(self, path: Path, started: float) -> None:
+        if self.cost_history is not None:
+            self.cost_history.record(path, time.perf_counter() - started)
+
+    def _run(self, paths: list[Path]) -> BatchReport:
+        if self.cost_history is not None:
+            paths = self.cost_history.schedule(paths)
+        if self.workers > 1:
+            return self._run_parallel(paths)
+        report = BatchReport()
+        for path in paths:
+            started = time.perf_counter()
+            try:
+                package, info = self.analyze(path)
+            except Exception as e:  # noqa: BLE001  A broken package should not stop the batch
+                self._record_cost(path, started)
+                self._fail(report, path, str(e))
+                continue
+            self._record_cost(path, started)
+            for sink in self.sinks:
+                sink.add(package, info)
+            report.analyzed.append(path)
+            if info.truncated:
+                report.truncated.append(path)
+            report._add_stats(info.stats)
+        return report
+
+    def _fail(self, report: BatchReport, path: Path, reason: str) -> None:
+        diagnostics.emit(PackageFailed(path, reason))
+        report.failed[path] = reason
+        for sink in self.sinks:
+            add_failure = getattr(sink, "add_failure", None)
+            if add_failure is not None:
+                add_failure(path, reason)
+
+    def _deliver(self, package: Package, result: EncodedResult | CMakeInfo) -> None:
+        if isinstance(result, CMakeInfo):
+            for sink in self.sinks:
+                sink.add(package, result)
+            return
+        try:
+            with result.attach() as data:
+                info = None
+                for sink in self.sinks:
+                    add_encoded = getattr(sink, "add_encoded", None)
+                    if add_encoded is not None:
+                        add_encoded(package, data)
+                    else:
+                        if info is None:
+                            info = decode(data)
+                        sink.add(package, info)
+        finally:
+            result.discard()
+
+    def _start_worker(self, index: int, spool_dir: Path) -> _Worker:
+        trace_threshold = self.tracer.handler_threshold if self.tracer is not None else None
+        worker = _Worker.start(index, self.ros_version, self.transport, spool_dir, collect_stats=self.collect_stats,
+                               trace_threshold=trace_threshold, budget=self.budget, resilient=self.resilient,
+                               share_preludes=self.share_preludes)
+        if self.tracer is not None and worker.process.pid is not None:
+            self.tracer.name_process(worker.process.pid, f"worker-{index}")
+        return worker
+
+    def _retirement(self, worker: _Worker) -> str | None:
+        """Returns why a worker that has just finished a package should be replaced, if it should be."""
+        if self.max_tasks_per_worker is not None and worker.packages >= self.max_tasks_per_worker:
+            return "max_tasks"
+        if self.max_worker_rss is not None and worker.rss is not None and worker.rss >= self.max_worker_rss:
+            return "max_rss"
+        return None
+
+    def _retire_worker(
+            self,
+            report: BatchReport,
+            pool: dict[int, _Worker],
+            worker: _Worker,
+            reason: str,
+            spool_dir: Path,
+            *,
+            replace: bool,
+    ) -> _Worker | None:
+        """Stops a worker, and starts another in its place if there are packages left for it."""
+        worker.stop()
+        report.workers.append(worker.summary(reason))
+        del pool[worker.index]
+        if not replace:
+            return None
+        replacement = pool[worker.index] = self._start_worker(worker.index, spool_dir)
+        return replacement
+
+    def _handle_result(self, report: BatchReport, worker: _Worker, path: Path, started: float,
+                       message: tuple[t.Any, ...]) -> None:
+        """Delivers the result that a worker sent for a package to the sinks, and records it in the report."""
+        status, package, result, stats, events, rss = message
+        # The result is delivered first, as it must be discarded whatever happens next
+        if status in ("ok", "truncated"):
+            self._deliver(package, result)
+        worker.record(rss)
+        self._record_cost(path, started)
+        if events and self.tracer is not None:
+            self.tracer.extend(events)
+        if status in ("ok", "truncated"):
+            report.analyzed.append(path)
+            if status == "truncated":
+                report.truncated.append(path)
+            report._add_stats(stats)
+        else:
+            self._fail(report, path, result)
+
+    def _handle_crash(
+            self,
+            report: BatchReport,
+            pool: dict[int, _Worker],
+            worker: _Worker,
+            path: Path,
+            *,
+            crashes: collections.Counter[Path],
+            pending: collections.deque[Path],
+            spool_dir: Path,
+    ) -> _Worker | None:
+        """Retries or fails the package of a worker that died, and returns the worker that replaces it, if any."""
+        worker.stop()
+        crashes[path] += 1
+        if crashes[path] <= self.retries:
+            pending.append(path)
+        else:
+            reason = f"worker process exited with code {worker.process.exitcode}"
+            if crashes[path] > 1:
+                reason += f" ({crashes[path]} attempts)"
+            self._fail(report, path, reason)
+        return self._retire_worker(report, pool, worker, "crashed", spool_dir, replace=bool(pending))
+
+    def _recycle(
+            self,
+            report: BatchReport,
+            pool: dict[int, _Worker],
+            worker: _Worker,
+            spool_dir: Path,
+            *,
+            replace: bool,
+    ) -> _Worker | None:
+        """Returns the worker that should take the next package in place of one that has just finished a package.
+
+        Workers are only recycled between packages, once their result has been delivered.
+        """
+        retirement = self._retirement(worker)
+        if retirement is None:
+            return worker
+        return self._retire_worker(report, pool, worker, retirement, spool_dir, replace=replace)
+
+    def _run_parallel(self, paths: list[Path]) -> BatchReport:
+        report = BatchReport()
+        pending = collections.deque(paths)
+        crashes: collections.Counter[Path] = collections.Counter()
+        with tempfile.TemporaryDirectory(prefix="ros-cmake-analyzer-") as directory:
+            spool_dir = Path(directory)
+            pool = {i: self._start_worker(i, spool_dir) for i in range(min(self.workers, len(paths)))}
+            idle: list[_Worker] = list(pool.values())
+            # The worker that is analyzing each package, and when it was given the package
+            busy: dict[int, tuple[_Worker, Path, float]] = {}
+            try:
+                while pending or busy:
+                    while idle and pending:
+                        worker = idle.pop()
+                        path = pending.popleft()
+                        worker.connection.send(path)
+                        busy[worker.index] = (worker, path, time.perf_counter())
+                    ready = wait([worker.connection for worker, _, _ in busy.values()])
+                    for worker, path, started in [task for task in busy.values() if task[0].connection in ready]:
+                        del busy[worker.index]
+                        try:
+                            # Results that are sent as pickles are unpickled into a path table of their own
+                            with path_session():
+                                message = worker.connection.recv()
+                        except EOFError:
+                            successor = self._handle_crash(report, pool, worker, path, crashes=crashes,
+                                                           pending=pending, spool_dir=spool_dir)
+                        else:
+                            self._handle_result(report, worker, path, started, message)
+                            successor = self._recycle(report, pool, worker, spool_dir, replace=bool(pending))
+                        if successor is not None:
+                            idle.append(successor)
+            finally:
+                for worker in pool.values():
+                    worker.stop()
+                    report.workers.append(worker.summary("finished"))
+        return report
+
+
+class _Worker:
+    """A process in the worker pool of a batch run, and the pipe that the parent uses to talk to it."""
+
+    def __init__(self, index: int, process: multiprocessing.process.BaseProcess, connection: Connection) -> None:
+        self.index = index
+        self.process = process
+        self.connection = connection
+        self.packages = 0
+        # The resident set size that the process reported after its last package, and the largest one, in bytes
+        self.rss: int | None = None
+        self.peak_rss: int | None = None
+
+    def record(self, rss: int | None) -> None:
+        """Records that the process has finished a package, after which it reported a resident set size."""
+        self.packages += 1
+        self.rss = rss
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def summary(self, retired: str) -> WorkerSummary:
+        return WorkerSummary(self.index, self.process.pid, self.packages, self.peak_rss, retired)
+
+    @classmethod
+    def start(
+            cls,
+            index: int,
+            ros_version: str,
+            transport: str,
+            spool_dir: Path,
+            *,
+            collect_stats: bool = False,
+            trace_threshold: float | None = None,
+            budget: Budget | None = None,
+            resilient: bool = False,
+            share_preludes: bool = False,
+    ) -> _Worker:
+        parent_connection, child_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_connection, ros_version, transport, spool_dir / f"worker-{index}.spool"),
+            kwargs={"collect_stats": collect_stats, "trace_threshold": trace_threshold, "budget": budget,
+                    "resilient": resilient, "share_preludes": share_preludes},
+            name=f"ros-cmake-analyzer-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        return cls(index, process, parent_connection)
+
+    def stop(self) -> None:
+        if self.connection.closed:
+            return
+        with contextlib.suppress(OSError):
+            self.connection.send(None)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self._discard_unreceived()
+        self.connection.close()
+
+    def _discard_unreceived(self) -> None:
+        """Frees the results that the process sent but the parent never received, as when a batch is interrupted."""
+        with contextlib.suppress(EOFError, OSError):
+            while self.connection.poll():
+                status, _, result, _, _, _ = self.connection.recv()
+                if status != "error" and not isinstance(result, CMakeInfo):
+                    result.discard()
+
+
+def _worker_main(
+        connection: Connection,
+        ros_version: str,
+        transport: str,
+        spool_path: Path,
+        *,
+        collect_stats: bool,
+        trace_threshold: float | None,
+        budget: Budget | None,
+        resilient: bool,
+        share_preludes: bool,
+) -> None:
+    analyzer = BatchAnalyzer(ros_version, collect_stats=collect_stats, budget=budget, resilient=resilient,
+                             share_preludes=share_preludes)
+    # Replaces any tracer that was inherited from the parent
+    tracer = trace.Tracer(trace_threshold) if trace_threshold is not None else None
+    trace.activate(tracer)
+    spool = SpoolFile(spool_path) if transport == "spool" else None
+    try:
+        while (path := connection.recv()) is not None:
+            try:
+                package, info = analyzer.analyze(path)
+            except Exception as e:  # noqa: BLE001  Failures are reported to the parent
+                connection.send(("error", None, str(e), None, tracer.take() if tracer is not None else None,
+                                 _resident_set_size()))
+                continue
+            result: EncodedResult | CMakeInfo
+            if transport == "pickle":
+                result = info
+            elif spool is not None:
+                result = spool.write(encode(info))
+            else:
+                result = to_shared_memory(encode(info))
+            status = "truncated" if info.truncated else "ok"
+            connection.send((status, package, result, info.stats, tracer.take() if tracer is not None else None,
+                             _resident_set_size()))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if spool is not None:
+            spool.close()
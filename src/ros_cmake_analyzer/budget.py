@@ -0,0 +1,131 @@
+"""Limits on the work done to analyze a single package, so that one pathological package cannot stall a batch run.
+
+A :class:`Budget` is given to an extractor (or to :class:`ros_cmake_analyzer.batch.BatchAnalyzer`, which gives it
+to the extractor of every package), and bounds:
+
+* ``max_seconds``: the wall time spent on the package,
+* ``max_commands``: the number of commands produced by the parser, after expanding loops, macros and functions,
+* ``max_loop_iterations``: the number of iterations of all the foreach() loops,
+* ``max_call_depth``: the depth to which macro and function calls are nested, and
+* ``max_glob_results``: the number of files matched by all the globs of file(GLOB ...) and file(GLOB_RECURSE ...).
+
+Each limit is optional. The limits are checked cooperatively, by the parser as it produces commands and by the
+handlers that glob, and the first one that is exceeded raises :class:`BudgetExceeded`. The extractor then stops
+processing the package, and returns the :class:`ros_cmake_analyzer.model.CMakeInfo` gathered so far with
+``truncated=True``.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "Budget",
+    "BudgetExceeded",
+    "BudgetTracker",
+)
+
+import time
+import typing as t
+from dataclasses import dataclass
+
+T = t.TypeVar("T")
+
+
+@dataclass(frozen=True, slots=True)
+class Budget:
+    """The limits on the analysis of a single package. A limit of None is not enforced."""
+
+    max_seconds: float | None = None
+    max_commands: int | None = None
+    max_loop_iterations: int | None = None
+    max_call_depth: int | None = None
+    max_glob_results: int | None = None
+
+    def tracker(self) -> BudgetTracker:
+        """Returns a tracker that enforces this budget, whose clock starts now."""
+        return BudgetTracker(self)
+
+
+class BudgetExceeded(Exception):
+    """Raised when the analysis of a package exceeds one of the limits of its budget.
+
+    Attributes
+    ----------
+    limit: str
+        The name of the limit that was exceeded, such as "max_commands"
+    value: float
+        The value of the limit
+
+    """
+
+    def __init__(self, limit: str, value: float) -> None:
+        super().__init__(f"{limit}={value} exceeded")
+        self.limit = limit
+        self.value = value
+
+    def __reduce__(self) -> tuple[type[BudgetExceeded], tuple[str, float]]:
+        return type(self), (self.limit, self.value)
+
+
+class BudgetTracker:
+    """Counts the work done on a package against a budget.
+
+    The first limit to be exceeded is kept as :attr:`exceeded`, and is raised again by every later check, so that
+    processing stops however deeply the check that first failed was nested.
+    """
+
+    __slots__ = ("budget", "calls", "commands", "deadline", "exceeded", "glob_results", "loop_iterations")
+
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self.deadline = time.perf_counter() + budget.max_seconds if budget.max_seconds is not None else None
+        self.commands = 0
+        self.loop_iterations = 0
+        self.calls = 0
+        self.glob_results = 0
+        self.exceeded: BudgetExceeded | None = None
+
+    def _exceed(self, limit: str) -> t.NoReturn:
+        if self.exceeded is None:
+            self.exceeded = BudgetExceeded(limit, getattr(self.budget, limit))
+        raise self.exceeded
+
+    def check(self) -> None:
+        """Raises the limit that was already exceeded, if there is one, or max_seconds once the time is up."""
+        if self.exceeded is not None:
+            raise self.exceeded
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self._exceed("max_seconds")
+
+    def command(self) -> None:
+        """Counts a command produced by the parser."""
+        self.commands += 1
+        limit = self.budget.max_commands
+        if limit is not None and self.commands > limit:
+            self._exceed("max_commands")
+        self.check()
+
+    def loop_iteration(self) -> None:
+        """Counts an iteration of a foreach() loop."""
+        self.loop_iterations += 1
+        limit = self.budget.max_loop_iterations
+        if limit is not None and self.loop_iterations > limit:
+            self._exceed("max_loop_iterations")
+        self.check()
+
+    def enter_call(self) -> None:
+        """Counts the start of a macro or function call, which must be matched by a call to :meth:`exit_call`."""
+        self.calls += 1
+        limit = self.budget.max_call_depth
+        if limit is not None and self.calls > limit:
+            self._exceed("max_call_depth")
+
+    def exit_call(self) -> None:
+        self.calls -= 1
+
+    def glob(self, matches: t.Iterable[T]) -> t.Iterator[T]:
+        """Yields the matches of a glob, stopping the glob as soon as there are too many matches in total."""
+        limit = self.budget.max_glob_results
+        for match in matches:
+            self.glob_results += 1
+            if limit is not None and self.glob_results > limit:
+                self._exceed("max_glob_results")
+            yield match
@@ -0,0 +1,244 @@
+"""Runs batch analyses that can be resumed after they are interrupted, and writes their results to a single file.
+
+A :class:`Checkpoint` is a sink for a :class:`ros_cmake_analyzer.batch.BatchAnalyzer` that appends the result of each
+package, as a line of the JSON Lines format of :class:`ros_cmake_analyzer.serialization.JSONLinesWriter`, to a
+partial result file next to the output (``<output>.partial``). Once a result has been written, a record of the
+package and the offset and length of its result is appended to a journal (``<output>.journal``), as are the
+packages that could not be analyzed. Only the packages in the journal are considered complete, so a run that is
+interrupted, even by a crash part way through writing a result, can be resumed from the journal: the partial file
+is truncated to the end of the last complete result, the packages that were analyzed are skipped, and those that
+could not be analyzed are tried again. Once every package is complete, the partial file is renamed to the output,
+which therefore only ever holds a finished run, and the journal is removed. From the command line::
+
+    python -m ros_cmake_analyzer.checkpoint results.jsonl ros1 ~/snapshots --workers 8 --retries 2
+    python -m ros_cmake_analyzer.checkpoint results.jsonl ros1 ~/snapshots --workers 8 --retries 2 --resume
+    python -m ros_cmake_analyzer.checkpoint results.jsonl ros1 ~/snapshots --workers 8 --max-worker-rss 2048
+    python -m ros_cmake_analyzer.checkpoint results.jsonl ros1 ~/snapshots --workers 8 --cost-history costs.json
+    python -m ros_cmake_analyzer.checkpoint results.jsonl ros1 ~/snapshots --workers 8 --share-preludes
+
+Results and journal records are flushed to the operating system as they are written, which is enough to survive
+the crash of the process, but they are only synced to disk when the run is finalized.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "Checkpoint",
+    "run_checkpointed",
+)
+
+import io
+import json
+import os
+import sys
+import typing as t
+from argparse import ArgumentParser
+from pathlib import Path
+
+from .serialization import JSONLinesWriter
+
+if t.TYPE_CHECKING:
+    from types import TracebackType
+
+    from .batch import BatchAnalyzer, BatchReport
+    from .core.package import Package
+    from .model import CMakeInfo
+
+JOURNAL_FORMAT = "ros-cmake-analyzer/journal"
+JOURNAL_VERSION = 1
+
+
+class Checkpoint:
+    """The partial result file and journal of a batch run that writes its results to a given output file.
+
+    Attributes
+    ----------
+    output: Path
+        The file that the results are written to once the run is finalized
+    analyzed: dict[str, tuple[int, int]]
+        The offset and length in the partial result file of the result of each package that has been analyzed,
+        keyed by the path of the package
+    failed: dict[str, str]
+        The reason why each package that could not be analyzed failed, keyed by the path of the package
+
+    """
+
+    def __init__(self, output: Path, *, resume: bool = False) -> None:
+        self.output = output
+        self.partial_path = output.with_name(output.name + ".partial")
+        self.journal_path = output.with_name(output.name + ".journal")
+        self.analyzed: dict[str, tuple[int, int]] = {}
+        self.failed: dict[str, str] = {}
+        if resume and self.journal_path.exists() and self.partial_path.exists():
+            end = self._load_journal()
+            self._partial = self.partial_path.open("r+b")
+            if self._partial.seek(0, os.SEEK_END) < end:
+                self._partial.close()
+                self._journal.close()
+                raise ValueError(f"{self.partial_path} is shorter than the results recorded in {self.journal_path}")
+            # Discards a result that was being written when the run was interrupted
+            self._partial.truncate(end)
+            self._partial.seek(end)
+        else:
+            self._partial = self.partial_path.open("wb")
+            self._journal = self.journal_path.open("wb")
+            self._append({"format": JOURNAL_FORMAT, "version": JOURNAL_VERSION})
+
+    def _load_journal(self) -> int:
+        """Reads the complete records of the journal, and returns the offset of the end of the last result."""
+        self._journal = self.journal_path.open("r+b")
+        valid = 0
+        end = 0
+        for number, line in enumerate(self._journal):
+            # A record that was being written when the run was interrupted is incomplete, and is discarded
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if number == 0:
+                if record.get("format") != JOURNAL_FORMAT or record.get("version") != JOURNAL_VERSION:
+                    self._journal.close()
+                    raise ValueError(f"{self.journal_path} is not a journal of a supported version")
+            elif "failed" in record:
+                self.failed[record["path"]] = record["failed"]
+            else:
+                # A package that failed is tried again when a run is resumed, and may succeed
+                self.failed.pop(record["path"], None)
+                self.analyzed[record["path"]] = (record["offset"], record["length"])
+                end = record["offset"] + record["length"]
+            valid += len(line)
+        self._journal.truncate(valid)
+        self._journal.seek(valid)
+        return end
+
+    def __enter__(self) -> t.Self:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def is_analyzed(self, package_dir: Path) -> bool:
+        return str(package_dir) in self.analyzed
+
+    def _append(self, record: dict[str, t.Any]) -> None:
+        self._journal.write(json.dumps(record).encode("utf-8") + b"\n")
+        self._journal.flush()
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        buffer = io.StringIO()
+        JSONLinesWriter(buffer).add(package, info)
+        data = buffer.getvalue().encode("utf-8")
+        offset = self._partial.tell()
+        self._partial.write(data)
+        self._partial.flush()
+        path = str(package.path)
+        self.failed.pop(path, None)
+        self.analyzed[path] = (offset, len(data))
+        self._append({"path": path, "offset": offset, "length": len(data)})
+
+    def add_failure(self, package_dir: Path, reason: str) -> None:
+        path = str(package_dir)
+        self.failed[path] = reason
+        self._append({"path": path, "failed": reason})
+
+    def finalize(self) -> None:
+        """Atomically replaces the output with the partial result file, and removes the journal."""
+        self._partial.flush()
+        os.fsync(self._partial.fileno())
+        self.close()
+        self.partial_path.replace(self.output)
+        self.journal_path.unlink()
+
+    def close(self) -> None:
+        self._partial.close()
+        self._journal.close()
+
+
+def run_checkpointed(
+        analyzer: BatchAnalyzer,
+        package_dirs: t.Iterable[str | Path],
+        output: Path,
+        *,
+        resume: bool = False,
+) -> tuple[BatchReport, Checkpoint]:
+    """Analyzes the packages that the checkpoint of the output does not record as analyzed, and finalizes it.
+
+    Packages that the checkpoint records as failed are tried again.
+
+    If the run is interrupted, the partial result file and journal are left in place, to be resumed from.
+
+    Returns
+    -------
+    tuple[BatchReport, Checkpoint]
+        The report of the packages that were analyzed by this run, and the checkpoint, which records the packages
+        that were completed by this run and the runs that it resumed
+
+    """
+    with Checkpoint(output, resume=resume) as checkpoint:
+        # Each package is only analyzed once, however many times it is given
+        remaining = [package_dir for package_dir in dict.fromkeys(Path(package_dir) for package_dir in package_dirs)
+                     if not checkpoint.is_analyzed(package_dir)]
+        analyzer.sinks.append(checkpoint)
+        try:
+            report = analyzer.run(remaining)
+        finally:
+            analyzer.sinks.remove(checkpoint)
+        checkpoint.finalize()
+    return report, checkpoint
+
+
+def main(arguments: list[str]) -> None:
+    parser = ArgumentParser(prog="python -m ros_cmake_analyzer.checkpoint")
+    parser.add_argument("output", type=Path, help="The JSON Lines file to write the results to")
+    parser.add_argument("ros", type=str, choices=["ros1", "ros2"], help="The ROS major version of the packages")
+    parser.add_argument("dirs", type=Path, nargs="+", help="Packages, or directories that contain packages")
+    parser.add_argument("--workers", type=int, default=1, help="The number of worker processes to use")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="The number of times to retry a package whose worker process dies")
+    parser.add_argument("--max-tasks-per-worker", type=int,
+                        help="Replace each worker process after it has analyzed this many packages")
+    parser.add_argument("--max-worker-rss", type=int,
+                        help="Replace each worker process once its resident set size reaches this many MiB")
+    parser.add_argument("--cost-history", type=Path,
+                        help="Analyze the most expensive packages first, by the costs recorded in this file, "
+                             "and record the cost of each package in it")
+    parser.add_argument("--share-preludes", action="store_true",
+                        help="Restore the state after a prelude that CMakeLists.txt files share from a snapshot")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip the packages that an interrupted run into the same output analyzed, "
+                             "and retry those that it failed to analyze")
+    args = parser.parse_args(arguments)
+
+    from .batch import BatchAnalyzer, find_packages
+    from .schedule import CostHistory
+    package_dirs = [package for directory in args.dirs for package in find_packages(directory)]
+    max_worker_rss = args.max_worker_rss * 2 ** 20 if args.max_worker_rss is not None else None
+    cost_history = CostHistory.load(args.cost_history) if args.cost_history is not None else None
+    analyzer = BatchAnalyzer(args.ros, workers=args.workers, retries=args.retries,
+                             max_tasks_per_worker=args.max_tasks_per_worker, max_worker_rss=max_worker_rss,
+                             cost_history=cost_history, share_preludes=args.share_preludes)
+    try:
+        report, checkpoint = run_checkpointed(analyzer, package_dirs, args.output, resume=args.resume)
+    finally:
+        # The costs of the packages that were analyzed are worth keeping even if the run is interrupted
+        if cost_history is not None:
+            cost_history.save(args.cost_history)
+    resumed = len(checkpoint.analyzed) + len(checkpoint.failed) - len(report.analyzed) - len(report.failed)
+    print(f"Wrote {len(checkpoint.analyzed)} packages to {args.output} ({len(checkpoint.failed)} failed, "
+          f"{resumed} completed by earlier runs)")
+    for path, reason in checkpoint.failed.items():
+        print(f"{path}\t{reason}")
+    for worker in report.workers:
+        peak = f"{worker.peak_rss / 2 ** 20:.1f} MiB" if worker.peak_rss is not None else "unknown"
+        print(f"worker-{worker.index} (pid {worker.pid}): {worker.packages} packages, peak RSS {peak}, "
+              f"{worker.retired}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
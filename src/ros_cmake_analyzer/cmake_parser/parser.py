@@ -30,6 +30,8 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import re
+import time
+from collections import deque
 from copy import copy
 from itertools import zip_longest
 
@@ -53,43 +55,75 @@ def _unescape(s):
     return "".join((_special_escapes.get(p, p[1:]) if p.startswith("\\") else p) for p in re.split(r"(\\.)", s))
 
 
-_find_var = re.compile(r"(?<!\\)\$\{([a-z_0-9]+)}", re.IGNORECASE).search
-_find_env_var = re.compile(r"(?<!\\)\$ENV\{([A-Za-z_0-9]+)}").search
+_var_pattern = re.compile(r"(?<!\\)\$\{([a-z_0-9]+)}", re.IGNORECASE)
+_env_var_pattern = re.compile(r"(?<!\\)\$ENV\{([A-Za-z_0-9]+)}")
+_find_var = _var_pattern.search
+_find_env_var = _env_var_pattern.search
+
+
+def _substitute(s, pattern, replacement):
+    # Replaces every match in a single pass, and repeats for references that only appear once the innermost ones
+    # are replaced, such as ${A_${B}}. Replacing the leftmost match and searching again from the start, as the
+    # original implementation did, takes quadratic time in the number of references. Both give the same result,
+    # unless a replacement ends with a backslash, which escapes the reference that follows it; only then does
+    # the order of replacement matter, so the slow path is taken.
+    trailing_backslash = False
+
+    def replace(mo):
+        nonlocal trailing_backslash
+        value = replacement(mo)
+        if value.endswith("\\"):
+            trailing_backslash = True
+        return value
+
+    result = s
+    count = 1
+    while count:
+        result, count = pattern.subn(replace, result)
+        if trailing_backslash:
+            return _substitute_sequentially(s, pattern, replacement)
+    return result
+
+
+def _substitute_sequentially(s, pattern, replacement):
+    mo = pattern.search(s)
+    while mo is not None:
+        s = s[:mo.start(0)] + replacement(mo) + s[mo.end(0):]
+        mo = pattern.search(s)
+    return s
 
 
 def _resolve_vars(s, var, env_var):
-    if var is not None:
-        mo = _find_var(s)
-        while mo is not None:
-            key = _unescape(mo.group(1))
-            value = _escape(var.get(key, ""))
-            s = s[:mo.start(0)] + value + s[mo.end(0):]
-            mo = _find_var(s)
-    if env_var is not None:
-        mo = _find_env_var(s)
-        while mo is not None:
+    if var is not None and "${" in s:
+        def replace_var(mo):
+            return _escape(var.get(_unescape(mo.group(1)), ""))
+
+        s = _substitute(s, _var_pattern, replace_var)
+    if env_var is not None and "$ENV{" in s:
+        def replace_env_var(mo):
             key = _unescape(mo.group(1))
-            value = _escape(env_var.get(key, "$ENV{%s}" % key))
-            s = s[:mo.start(0)] + value + s[mo.end(0):]
-            mo = _find_env_var(s)
+            return _escape(env_var.get(key, "$ENV{%s}" % key))
+
+        s = _substitute(s, _env_var_pattern, replace_env_var)
     return s
 
 
-_find_genexp = re.compile(r"(?<!\\)\$<([a-z_0-9]+):([^<>]+)>", re.IGNORECASE).search
+_genexp_pattern = re.compile(r"(?<!\\)\$<([a-z_0-9]+):([^<>]+)>", re.IGNORECASE)
+_find_genexp = _genexp_pattern.search
+
+
+def _resolve_generator_expression(mo):
+    if mo.group(1) == "BUILD_INTERFACE":
+        return mo.group(2)
+    return ""
 
 
 # TODO We just replace most generator expressions by empty strings.
 #      This may or may not be a smart thing to do in this context
 def _resolve_generator_expressions(s):
-    mo = _find_genexp(s)
-    while mo is not None:
-        if mo.group(1) == "BUILD_INTERFACE":
-            value = mo.group(2)
-        else:
-            value = ""
-        s = s[:mo.start(0)] + value + s[mo.end(0):]
-        mo = _find_genexp(s)
-    return s
+    if "$<" not in s:
+        return s
+    return _substitute(s, _genexp_pattern, _resolve_generator_expression)
 
 
 _token_spec = [
@@ -104,31 +138,62 @@ _token_spec = [
     ("PRAGMA", r"#catkin_lint:.*?$"),
     ("COMMENT", r"#\[(?P<COMMENT_FILL>=*)\[.*?\](?P=COMMENT_FILL)\]|#.*?$"),
 ]
-_next_token = re.compile("|".join("(?P<%s>%s)" % pair for pair in _token_spec), re.MULTILINE | re.IGNORECASE | re.DOTALL).match
-
-
-def _lexer(s):
+# Bracket arguments and bracket comments are matched by _lexer itself rather than by this expression, as the lazy
+# search for their end takes linear time, and would be repeated for each unterminated bracket in the file
+_next_token = re.compile("|".join("(?P<%s>%s)" % (typ, r"#.*?$" if typ == "COMMENT" else pattern)
+                                  for typ, pattern in _token_spec if typ != "BRACKET"),
+                         re.MULTILINE | re.IGNORECASE | re.DOTALL).match
+_open_bracket = re.compile(r"#?\[(=*)\[").match
+
+
+def _lexer(s, recover=False, line_starts=None):
+    # When recovering from errors, a character that cannot start a token is yielded as an ERROR token of its own.
+    # Given a list of line starts, the offset at which each line after the first starts is appended to it, counting
+    # lines as the tokens do, which excludes the line breaks within strings, bracket arguments and comments.
     line = 1
     col = 1
-    mo = _next_token(s)
     pos = 0
-    while mo is not None:
-        typ = mo.lastgroup
+    # The position from which each closing bracket is known not to occur
+    unterminated = {}
+    while True:
+        typ = None
+        bracket = _open_bracket(s, pos) if s.startswith(("[", "#["), pos) else None
+        if bracket is not None:
+            close = "]%s]" % bracket.group(1)
+            end = -1 if unterminated.get(close, len(s) + 1) <= pos else s.find(close, bracket.end())
+            if end < 0:
+                unterminated.setdefault(close, pos)
+            else:
+                typ = "COMMENT" if s[pos] == "#" else "BRACKET"
+                end += len(close)
+                val = s[pos:end]
+        if typ is None:
+            mo = _next_token(s, pos)
+            if mo is not None:
+                typ = mo.lastgroup
+                end = mo.end()
+                val = mo.group(typ)
+            elif recover and pos < len(s):
+                typ = "ERROR"
+                end = pos + 1
+                val = s[pos]
+            else:
+                break
         if typ == "NL":
             line += 1
             col = 1
+            if line_starts is not None:
+                line_starts.append(end)
         else:
             if typ != "SKIP":
-                val = mo.group(typ)
                 if typ == "STRING":
                     val = val[1:-1]
                     val = re.sub(r"\\\n", "", val)
                 if typ == "BRACKET":
                     val = re.sub(r"^\[(=*)\[(?:\r\n|\r|\n)?(.*)]\1]$", r"\2", val)
                 yield (typ, val, line, col)
-            col += mo.end() - mo.start()
-        pos = mo.end()
-        mo = _next_token(s, pos)
+            col += end - pos
+        pos = end
     if pos != len(s):
         raise CMakeSyntaxError("Unexpected character %r on line %d" % (s[pos], line))
 
@@ -185,67 +250,162 @@ class Callable(BasicBlock):
         self.new_context = new_context
 
 
-def _parse_commands(s, filename):
+class SkippedRegion:
+    """Text that was skipped to recover from a syntax error: the command that it starts with, if it got as far as
+    a command name, and the values of the rest of its tokens."""
+
+    def __init__(self, message, command, args, line, end_line):
+        self.message = message
+        self.command = command
+        self.args = args
+        self.line = line
+        self.end_line = end_line
+
+
+def _parse_commands(s, filename, stats=None, errors=None, line_starts=None):
+    recover = errors is not None
+    if stats is None:
+        return _parse_tokens(_lexer(_resolve_generator_expressions(s), recover, line_starts), filename, errors)
+    # The tokens are collected up front, so that lexing and parsing can be timed separately
+    start = time.perf_counter()
+    tokens = list(_lexer(_resolve_generator_expressions(s), recover, line_starts))
+    lexed = time.perf_counter()
+    commands = _parse_tokens(tokens, filename, errors)
+    stats.lex_seconds += lexed - start
+    stats.parse_seconds += time.perf_counter() - lexed
+    return commands
+
+
+def _parse_tokens(tokens, filename, errors=None):
+    """Parses the tokens of a file into its commands.
+
+    Given a list of errors, a syntax error is appended to it as a SkippedRegion rather than raised, and parsing
+    resumes at the next word that starts a line. A command whose parentheses are still open at the end of the file
+    is parsed again from the line after the one on which it starts.
+    """
     commands = []
     state = 0
     line = 0
-    s = _resolve_generator_expressions(s)
-    for typ, val, line, col in _lexer(s):
-        if typ == "COMMENT":
-            continue
-        if typ == "PRAGMA":
-            args = re.split(r"\s+", val[13:])
-            commands.append(Command("#catkin_lint", [("LITERAL", arg) for arg in args if len(arg) > 0], filename, line, col))
-            continue
-        if state == 0:
-            if typ != "WORD":
-                raise CMakeSyntaxError("%s(%d): expected command identifier and got '%s'" % (filename, line, val))
-            cmdname = val
-            cmdargs = []
-            cmdline = line
-            cmdcol = col
-            state = 1
-        elif state == 1:
-            if typ != "LPAREN":
-                raise CMakeSyntaxError("%s(%d): expected '(' and got '%s'" % (filename, line, val))
-            paren = 1
-            state = 2
-        elif state == 2:
-            if typ == "LPAREN":
-                paren += 1
-            elif typ == "RPAREN":
-                paren -= 1
-                if paren == 0:
-                    commands.append(Command(cmdname, cmdargs, filename, cmdline, cmdcol))
-                    state = 0
+    last_line = 0
+    # While recovering, the message of the error and the command and tokens that have been skipped since
+    skipping = None
+    # When recovering, the tokens of the command that is being parsed, which are parsed again if it is unterminated
+    pending = [] if errors is not None else None
+    tokens = iter(tokens)
+    while True:
+        for token in tokens:
+            typ, val, line, col = token
+            starts_line = line > last_line
+            last_line = line
+            if typ == "COMMENT":
+                continue
+            if skipping is not None:
+                if not (starts_line and typ == "WORD"):
+                    skipping[2].append(val)
                     continue
-            cmdargs.append((typ, val))
-    if state == 1:
-        raise CMakeSyntaxError("%s(%d): expected '(' and got end of file" % (filename, line))
-    if state == 2:
-        raise CMakeSyntaxError("%s(%d): expected ')' and got end of file" % (filename, line))
+                errors.append(SkippedRegion(skipping[0], skipping[1], skipping[2], skipping[3], line - 1))
+                skipping = None
+            if typ == "PRAGMA":
+                args = re.split(r"\s+", val[13:])
+                commands.append(Command("#catkin_lint", [("LITERAL", arg) for arg in args if len(arg) > 0], filename, line, col))
+                continue
+            message = None
+            if state == 0:
+                if typ != "WORD":
+                    message = "%s(%d): expected command identifier and got '%s'" % (filename, line, val)
+                else:
+                    cmdname = val
+                    cmdargs = []
+                    cmdline = line
+                    cmdcol = col
+                    state = 1
+            elif state == 1:
+                if typ != "LPAREN":
+                    message = "%s(%d): expected '(' and got '%s'" % (filename, line, val)
+                    if errors is not None and starts_line and typ == "WORD":
+                        # Only the name of the previous command is skipped, and this word starts the next one
+                        errors.append(SkippedRegion(message, cmdname, [], cmdline, line - 1))
+                        message = None
+                        cmdname = val
+                        cmdline = line
+                        cmdcol = col
+                        pending.clear()
+                else:
+                    paren = 1
+                    state = 2
+            elif state == 2:
+                if typ == "LPAREN":
+                    paren += 1
+                elif typ == "RPAREN":
+                    paren -= 1
+                    if paren == 0:
+                        commands.append(Command(cmdname, cmdargs, filename, cmdline, cmdcol))
+                        state = 0
+                        if pending is not None:
+                            pending.clear()
+                        continue
+                elif typ == "ERROR":
+                    message = "%s(%d): unexpected character '%s'" % (filename, line, val)
+                if message is None:
+                    cmdargs.append((typ, val))
+            if message is not None:
+                if errors is None:
+                    raise CMakeSyntaxError(message)
+                if state == 0:
+                    skipping = (message, None, [val], line)
+                else:
+                    skipping = (message, cmdname, [v for _, v in cmdargs] + [val], cmdline)
+                    state = 0
+                    pending.clear()
+            elif pending is not None and state != 0:
+                pending.append(token)
+        if state == 0:
+            break
+        expected = "'('" if state == 1 else "')'"
+        if errors is None:
+            raise CMakeSyntaxError("%s(%d): expected %s and got end of file" % (filename, line, expected))
+        # The error is reported on the line on which the unterminated command starts, which is the line it skips
+        message = "%s(%d): expected %s and got end of file" % (filename, cmdline, expected)
+        # Only the line on which the command starts is skipped, so only its arguments on that line are recorded
+        errors.append(SkippedRegion(message, cmdname, [token[1] for token in pending[2:] if token[2] == cmdline],
+                                    cmdline, cmdline))
+        # Parses the rest of the file again, from the line after the one on which the unterminated command starts
+        tokens = iter([token for token in pending if token[2] > cmdline])
+        pending = []
+        state = 0
+        last_line = cmdline
+    if skipping is not None:
+        errors.append(SkippedRegion(skipping[0], skipping[1], skipping[2], skipping[3], line))
     return commands
 
 
 def _parse_block(filename, cmds, block_name, result_type, *args):
+    # cmds is a deque, from which the commands of the block are taken
     result = result_type(*args)
+    block_name = block_name.lower()
+    end_name = "end%s" % block_name
     nesting = 1
     while cmds:
-        if cmds[0].name.lower() == block_name.lower():
+        name = cmds[0].name.lower()
+        if name == block_name:
             nesting += 1
-        if cmds[0].name.lower() == "end%s" % block_name.lower():
+        if name == end_name:
             nesting -= 1
             if nesting == 0:
                 return result
-        cmd = cmds.pop(0)
-        result.commands.append(cmd)
+        result.commands.append(cmds.popleft())
     raise CMakeSyntaxError("%s: expected 'end%s()' and got end of file" % (filename, block_name))
 
 
+_is_identifier = re.compile(r"^#?[a-z_][a-z_0-9]*$").match
+
+
 class ParserContext:
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, budget=None):
         self.parent = parent
         self.callable = copy(parent.callable) if parent is not None else {}
+        # A ros_cmake_analyzer.budget.BudgetTracker, which is shared with the contexts of called functions
+        self.budget = budget if budget is not None or parent is None else parent.budget
         self._call_stack = set([])
         self._skip_block = False
         self._block_level = -1
@@ -269,11 +429,14 @@ class ParserContext:
                     var[key] = value if value is not None else ""
             var["ARGN"] = ";".join(argn)
             var["ARGV"] = ";".join(args)
-            cmds = copy(f.commands)
             self._call_stack.add(lname)
-            for cmd, args, arg_tokens, loc in self._yield(cmds, var, env_var, skip_callable):
+            if self.budget is not None:
+                self.budget.enter_call()
+            for cmd, args, arg_tokens, loc in self._yield(f.commands, var, env_var, skip_callable):
                 yield (cmd, args, arg_tokens, loc)
         finally:
+            if lname in self._call_stack and self.budget is not None:
+                self.budget.exit_call()
             self._call_stack.remove(lname)
             for key, value in save_vars.items():
                 if value is not None:
@@ -288,14 +451,16 @@ class ParserContext:
     def _yield(self, cmds, var, env_var, skip_callable):
         if var is None:
             var = {}
+        # Commands are taken from the front of the list, which a deque does in constant time
+        cmds = deque(cmds)
         self._block_level = self._block_level + 1
         while cmds:
             if self._block_level == 0:
                 self._skip_block = False
-            cmd = cmds.pop(0)
+            cmd = cmds.popleft()
             cmdname = _resolve_vars(cmd.name, var, env_var)
             cmdname_lower = cmdname.lower()
-            if not re.match(r"^#?[a-z_][a-z_0-9]*$", cmdname_lower):
+            if not _is_identifier(cmdname_lower):
                 raise CMakeSyntaxError("%s(%d): invalid command identifier '%s'" % (cmd.filename, cmd.line, cmdname))
             args = _resolve_args(cmd.args, var, env_var)
             if cmd.name.lower() == "macro":
@@ -351,9 +516,10 @@ class ParserContext:
                     else:
                         loop_args = args[1:]
                     for loop_value in loop_args:
+                        if self.budget is not None:
+                            self.budget.loop_iteration()
                         var[loop_var] = str(loop_value)
-                        loop_cmds = copy(f.commands)
-                        for cmd, args, arg_tokens, loc in self._yield(loop_cmds, var, env_var, skip_callable):
+                        for cmd, args, arg_tokens, loc in self._yield(f.commands, var, env_var, skip_callable):
                             yield (cmd, args, arg_tokens, loc)
                             if self._skip_block:
                                 break
@@ -381,13 +547,26 @@ class ParserContext:
                 yield (cmdname, args, cmd.args, (cmd.filename, cmd.line, cmd.column))
         self._block_level = self._block_level - 1
 
-    def parse(self, s, var=None, env_var=None, filename=None, skip_callable=False):
+    def parse(self, s, var=None, env_var=None, filename=None, skip_callable=False, stats=None, errors=None):
+        # Given a list of errors, syntax errors in s are appended to it as SkippedRegions, rather than raised
         if filename is None:
             filename = "<inline>"
-        cmds = _parse_commands(s, filename)
+        cmds = _parse_commands(s, filename, stats, errors)
+        yield from self.execute(cmds, var, env_var, filename, skip_callable)
+
+    def execute(self, cmds, var=None, env_var=None, filename="<inline>", skip_callable=False):
+        # Runs commands that have already been parsed, such as the rest of a file after some of its commands
         self._block_level = -1
-        for cmd, args, arg_tokens, loc in self._yield(cmds, var, env_var, skip_callable):
-            yield (cmd, args, arg_tokens, loc)
+        budget = self.budget
+        try:
+            for cmd, args, arg_tokens, loc in self._yield(cmds, var, env_var, skip_callable):
+                if budget is not None:
+                    budget.command()
+                yield (cmd, args, arg_tokens, loc)
+        except RecursionError:
+            # Each nested block and function call is another generator, so deep nesting, or a function that calls
+            # itself, exhausts the stack
+            raise CMakeSyntaxError("%s: blocks or function calls are nested too deeply" % filename) from None
 
     def skip_block(self):
         self._skip_block = True
@@ -407,42 +586,47 @@ def argparse(args, opts):
             result[optname] = {}
         else:
             raise RuntimeError("invalid option '%s': %s" % (optname, opttype))
+    # The options are indexed by their first word, so that each argument is only compared against the options
+    # that it may start, and the arguments are walked by position rather than deleted from the front of a list.
+    # Of the options that match, the longest is taken, and the first of those in the order of opts.
+    by_first_word = {}
+    for optname, opttype in dict.items(opts):
+        words = optname.split()
+        if words:
+            by_first_word.setdefault(words[0], []).append((words, optname, opttype))
     curname = None
     curtype = None
-    t_args = args[:]
-    while t_args:
+    n = len(args)
+    i = 0
+    while i < n:
         L = 0
-        for k, v in dict.items(opts):
-            kl = k.split()
-            ll = len(kl)
-            if kl == t_args[:ll]:
-                if ll > L:
-                    L = ll
-                    curname = k
-                    curtype = v
+        for words, k, v in by_first_word.get(args[i], ()):
+            ll = len(words)
+            if ll > L and words == args[i:i + ll]:
+                L = ll
+                curname = k
+                curtype = v
         if L > 0:
-            del t_args[:L]
+            i += L
             if curtype == "-":
                 result[curname] = True
                 curname = None
                 curtype = None
         elif curname is not None:
             if curtype == "?" or curtype == "!":
-                result[curname] = t_args[0]
+                result[curname] = args[i]
                 curname = None
                 curtype = None
-                del t_args[0]
+                i += 1
             elif curtype == "p":
-                if len(t_args) < 2:
-                    t_args.append("")
-                result[curname][t_args[0]] = t_args[1]
-                del t_args[:2]
+                result[curname][args[i]] = args[i + 1] if i + 1 < n else ""
+                i += 2
             else:
-                result[curname].append(t_args[0])
-                del t_args[0]
+                result[curname].append(args[i])
+                i += 1
         else:
-            remaining.append(t_args[0])
-            del t_args[0]
+            remaining.append(args[i])
+            i += 1
     for optname, opttype in dict.items(opts):
         if opttype == "+" and not result[optname]:
             raise CMakeSyntaxError("option '%s' has empty, unquoted argument" % optname)
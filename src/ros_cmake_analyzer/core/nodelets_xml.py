@@ -1,7 +1,11 @@
+import io
+import typing as t
 from dataclasses import dataclass
+from pathlib import Path
 
-from defusedxml import ElementTree as ET  # noqa: N817
-from loguru import logger
+from ros_cmake_analyzer.diagnostics import Level, Message, diagnostics
+
+from .plugin_xml import PluginClass, parse_plugin_description, read_plugin_description
 
 
 @dataclass
@@ -30,30 +34,18 @@ class NodeletsInfo:
     libraries: list["NodeletLibrary"]
 
     @classmethod
-    def from_nodelet_xml(cls, contents: str) -> "NodeletsInfo":
-        libraries: list["NodeletLibrary"] = []
-        contents = "<root>\n" + contents + "\n</root>"
-        tree = ET.fromstring(contents)
-        root = get_xml_nodes_by_name("root", tree)[0]
-        libraries_dom = get_xml_nodes_by_name("library", root)
-        if not libraries_dom:
-            logger.warning("Expected there to be <library/> elements in nodelet_plugins.xml, but there are none.")
-            logger.debug(contents)
-        for library_dom in libraries_dom:
-            path = library_dom.attrib.get("path")
-            class_doms = get_xml_nodes_by_name(
-                "class",
-                library_dom,
-            )
-            for class_dom in class_doms:
-                name = class_dom.attrib.get("name")
-                type_ = class_dom.attrib.get("type")
-                libraries.append(NodeletLibrary(path=path,
-                                                name=name,
-                                                type_=type_,
-                                                ))
+    def _from_classes(cls, classes: t.Iterable[PluginClass]) -> "NodeletsInfo":
+        libraries = [NodeletLibrary(path=c.library, name=c.name, type_=c.type_) for c in classes]
+        if not libraries:
+            diagnostics.emit(Message(Level.WARNING, "Expected there to be <library/> elements in "
+                                                    "nodelet_plugins.xml, but there are none."))
         return NodeletsInfo(libraries=libraries)
 
+    @classmethod
+    def from_nodelet_xml(cls, contents: str) -> "NodeletsInfo":
+        return cls._from_classes(parse_plugin_description(io.BytesIO(contents.encode("utf-8"))))
 
-def get_xml_nodes_by_name(tag_name: str, tree: ET) -> list[ET]:
-    return list(tree.iter(tag_name))
+    @classmethod
+    def from_file(cls, path: Path) -> "NodeletsInfo":
+        """Reads the nodelets in a plugin description file, which is only parsed again if it has changed."""
+        return cls._from_classes(read_plugin_description(path))
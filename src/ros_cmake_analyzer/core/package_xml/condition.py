@@ -13,20 +13,125 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import operator
-
-import pyparsing as pp
-
-# operatorPrecedence renamed to infixNotation in 1.5.7
-try:
-    from pyparsing import infixNotation
-except ImportError:
-    from pyparsing import operatorPrecedence as infixNotation
+import re
 
 
 def evaluate_condition(condition, context):
     if condition is None:
         return True
+    return compile_condition(condition)(context)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_condition(condition):
+    """Compile a condition into a reusable evaluator.
+
+    The evaluator is called with a context, a mapping of variable names (without the leading $) to values.
+    Conditions are compiled by a hand-written recursive-descent parser for the grammar of REP 149. It accepts
+    exactly the conditions that the pyparsing grammar in :func:`evaluate_condition_reference` accepts, and the
+    compiled evaluators are shared between all calls with the same condition.
+
+    :raises: :exc:`ValueError` if the condition fails to parse
+    """
+    return _ConditionParser(condition).parse()
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_OPERATOR = re.compile(r"==|!=|>=|>|<=|<")
+_IDENTIFIER = re.compile(r"\$[A-Za-z0-9_]+")
+_VALUE = re.compile(r"[A-Za-z0-9_-]+")
+_QUOTED = {'"': re.compile(r'"([^"\n]*)"'), "'": re.compile(r"'([^'\n]*)'")}
+_WHITESPACE_ESCAPES = re.compile(r"\\[tnfr]")
+_ESCAPED = {"\\t": "\t", "\\n": "\n", "\\f": "\f", "\\r": "\r"}
+
+
+class _ConditionParser:
+    """Parses a condition, in which "and" binds more tightly than "or"::
+
+        expression := conjunction ("or" conjunction)*
+        conjunction := atom ("and" atom)*
+        atom := "(" expression ")" | term operator term
+        term := $identifier | value | "quoted value" | 'quoted value'
+
+    As in pyparsing, "and" and "or" are matched as literals, and quoted values have whitespace escapes expanded.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.position = 0
+
+    def error(self, expected):
+        raise ValueError("condition '%s' failed to parse: expected %s at char %d" % (self.text, expected, self.position))
+
+    def skip(self):
+        self.position = _WHITESPACE.match(self.text, self.position).end()
+
+    def keyword(self, word):
+        self.skip()
+        if self.text.startswith(word, self.position):
+            self.position += len(word)
+            return True
+        return False
+
+    def parse(self):
+        expression = self.expression()
+        self.skip()
+        if self.position != len(self.text):
+            self.error("end of text")
+        return expression
+
+    def expression(self):
+        args = [self.conjunction()]
+        while self.keyword("or"):
+            args.append(self.conjunction())
+        return args[0] if len(args) == 1 else _Or.of(args)
+
+    def conjunction(self):
+        args = [self.atom()]
+        while self.keyword("and"):
+            args.append(self.atom())
+        return args[0] if len(args) == 1 else _And.of(args)
+
+    def atom(self):
+        if self.keyword("("):
+            expression = self.expression()
+            if not self.keyword(")"):
+                self.error("')'")
+            return expression
+        left = self.term()
+        self.skip()
+        match = _OPERATOR.match(self.text, self.position)
+        if match is None:
+            self.error("operator")
+        self.position = match.end()
+        return _Condition([[left, _Operator([match.group()]), self.term()]])
+
+    def term(self):
+        self.skip()
+        text, position = self.text, self.position
+        match = _IDENTIFIER.match(text, position)
+        if match is not None:
+            self.position = match.end()
+            return _Identifier([match.group()])
+        match = _VALUE.match(text, position)
+        if match is not None:
+            self.position = match.end()
+            return _Value([match.group()])
+        quoted = _QUOTED.get(text[position:position + 1])
+        match = quoted.match(text, position) if quoted is not None else None
+        if match is not None:
+            self.position = match.end()
+            return _Value([_WHITESPACE_ESCAPES.sub(lambda m: _ESCAPED[m.group()], match.group(1))])
+        self.error("identifier or value")
+
+
+def evaluate_condition_reference(condition, context):
+    """Evaluate a condition with the original pyparsing grammar, which is kept to test :func:`compile_condition`."""
+    if condition is None:
+        return True
+    import pyparsing as pp
     expr = _get_condition_expression()
     try:
         parse_results = expr.parseString(condition, parseAll=True)
@@ -42,6 +147,13 @@ _condition_expression = None
 def _get_condition_expression():
     global _condition_expression
     if not _condition_expression:
+        import pyparsing as pp
+        # operatorPrecedence renamed to infixNotation in 1.5.7
+        try:
+            from pyparsing import infixNotation
+        except ImportError:
+            from pyparsing import operatorPrecedence as infixNotation
+
         operator = pp.Regex("==|!=|>=|>|<=|<").setName("operator")
         operator.setParseAction(_Operator)
 
@@ -142,6 +254,12 @@ class _BinOp:
     def __init__(self, t):
         self.args = t[0][0::2]
 
+    @classmethod
+    def of(cls, args):
+        op = cls.__new__(cls)
+        op.args = args
+        return op
+
     def __call__(self, context):
         return self.evalop(a(context) for a in self.args)
 
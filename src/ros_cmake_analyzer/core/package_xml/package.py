@@ -37,8 +37,6 @@
 import os
 import re
 import sys
-import typing as t
-import xml.dom.minidom as dom
 from copy import deepcopy
 
 from .condition import evaluate_condition
@@ -58,23 +56,23 @@ class PackageDefinition:
         "package_format",
         "name",
         "version",
-        # "version_compatibility",
-        # "description",
-        # "maintainers",
-        # "licenses",
-        # "urls",
-        # "authors",
-        # "build_depends",
-        # "buildtool_depends",
-        # "build_export_depends",
-        # "buildtool_export_depends",
-        # "exec_depends",
-        # "test_depends",
-        # "doc_depends",
-        # "conflicts",
-        # "replaces",
-        # "group_depends",
-        # "member_of_groups",
+        "version_compatibility",
+        "description",
+        "maintainers",
+        "licenses",
+        "urls",
+        "authors",
+        "build_depends",
+        "buildtool_depends",
+        "build_export_depends",
+        "buildtool_export_depends",
+        "exec_depends",
+        "test_depends",
+        "doc_depends",
+        "conflicts",
+        "replaces",
+        "group_depends",
+        "member_of_groups",
         "exports",
         "filename",
     ]
@@ -85,50 +83,50 @@ class PackageDefinition:
         :param filename: location of package.xml.  Necessary if
           converting ``${prefix}`` in ``<export>`` values, ``str``.
         """
-        # # initialize all slots ending with "s" with lists, all other with plain values
-        # for attr in self.__slots__:
-        #     if attr.endswith("s"):
-        #         value = list(kwargs[attr]) if attr in kwargs else []
-        #         setattr(self, attr, value)
-        #     else:
-        #         value = kwargs[attr] if attr in kwargs else None
-        #         setattr(self, attr, value)
-        # if "depends" in kwargs:
-        #     for d in kwargs["depends"]:
-        #         for slot in [self.build_depends, self.build_export_depends, self.exec_depends]:
-        #             if d not in slot:
-        #                 slot.append(deepcopy(d))
-        #     del kwargs["depends"]
-        # if "run_depends" in kwargs:
-        #     for d in kwargs["run_depends"]:
-        #         for slot in [self.build_export_depends, self.exec_depends]:
-        #             if d not in slot:
-        #                 slot.append(deepcopy(d))
-        #     del kwargs["run_depends"]
+        # initialize all slots ending with "s" with lists, all other with plain values
+        for attr in self.__slots__:
+            if attr.endswith("s"):
+                value = list(kwargs[attr]) if attr in kwargs else []
+                setattr(self, attr, value)
+            else:
+                value = kwargs[attr] if attr in kwargs else None
+                setattr(self, attr, value)
+        if "depends" in kwargs:
+            for d in kwargs["depends"]:
+                for slot in [self.build_depends, self.build_export_depends, self.exec_depends]:
+                    if d not in slot:
+                        slot.append(deepcopy(d))
+            del kwargs["depends"]
+        if "run_depends" in kwargs:
+            for d in kwargs["run_depends"]:
+                for slot in [self.build_export_depends, self.exec_depends]:
+                    if d not in slot:
+                        slot.append(deepcopy(d))
+            del kwargs["run_depends"]
         self.filename = filename
-        # self.licenses = [license_ if isinstance(license_, License) else License(license_) for license_ in self.licenses]
-        # # verify that no unknown keywords are passed
-        # unknown = set(kwargs.keys()).difference(self.__slots__)
-        # if unknown:
-        #     raise TypeError("Unknown properties: %s" % ", ".join(unknown))
-
-    # def __getattr__(self, name):
-    #     if name == "run_depends":
-    #         # merge different dependencies if they are not exactly equal
-    #         # potentially having the same dependency name multiple times with different attributes
-    #         run_depends = []
-    #         [run_depends.append(deepcopy(d)) for d in self.exec_depends + self.build_export_depends if d not in run_depends]
-    #         return run_depends
-    #     raise AttributeError(name)
-    #
-    # def __getitem__(self, key):
-    #     if key in self.__slots__ + ["run_depends"]:
-    #         return getattr(self, key)
-    #     raise KeyError('Unknown key "%s"' % key)
-    #
-    # def __iter__(self):
-    #     for slot in self.__slots__:
-    #         yield slot
+        self.licenses = [license_ if isinstance(license_, License) else License(license_) for license_ in self.licenses]
+        # verify that no unknown keywords are passed
+        unknown = set(kwargs.keys()).difference(self.__slots__)
+        if unknown:
+            raise TypeError("Unknown properties: %s" % ", ".join(unknown))
+
+    def __getattr__(self, name):
+        if name == "run_depends":
+            # merge different dependencies if they are not exactly equal
+            # potentially having the same dependency name multiple times with different attributes
+            run_depends = []
+            [run_depends.append(deepcopy(d)) for d in self.exec_depends + self.build_export_depends if d not in run_depends]
+            return run_depends
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key in self.__slots__ + ["run_depends"]:
+            return getattr(self, key)
+        raise KeyError('Unknown key "%s"' % key)
+
+    def __iter__(self):
+        for slot in self.__slots__:
+            yield slot
 
     def __str__(self):
         data = {}
@@ -162,49 +160,49 @@ class PackageDefinition:
             return build_type_exports[0]
         raise InvalidPackage("Only one <build_type> element is permitted.", self.filename)
 
-    # def has_invalid_metapackage_dependencies(self):
-    #     """Return True if this package has invalid dependencies for a metapackage.
-    #
-    #     This is defined by REP-0127 as any non-run_depends dependencies other then a buildtool_depend on catkin.
-    #
-    #     :returns: True if the given package has any invalid dependencies, otherwise False
-    #     :rtype: bool
-    #     """
-    #     buildtool_depends = [d.name for d in self.buildtool_depends if d.name != "catkin"]
-    #     return len(self.build_depends + buildtool_depends + self.test_depends) > 0
-
-    # def is_metapackage(self):
-    #     """Return True if this pacakge is a metapackage, otherwise False.
-    #
-    #     :returns: True if metapackage, else False
-    #     :rtype: bool
-    #     """
-    #     return "metapackage" in (e.tagname for e in self.exports)
-    #
-    # def evaluate_conditions(self, context):
-    #     """Evaluate the conditions of all dependencies and memberships.
-    #
-    #     :param context: A dictionary with key value pairs to replace variables
-    #       starting with $ in the condition.
-    #     :raises: :exc:`ValueError` if any condition fails to parse
-    #     """
-    #     for attr in (
-    #         "build_depends",
-    #         "buildtool_depends",
-    #         "build_export_depends",
-    #         "buildtool_export_depends",
-    #         "exec_depends",
-    #         "test_depends",
-    #         "doc_depends",
-    #         "conflicts",
-    #         "replaces",
-    #         "group_depends",
-    #         "member_of_groups",
-    #         "exports",
-    #     ):
-    #         conditionals = getattr(self, attr)
-    #         for conditional in conditionals:
-    #             conditional.evaluate_condition(context)
+    def has_invalid_metapackage_dependencies(self):
+        """Return True if this package has invalid dependencies for a metapackage.
+
+        This is defined by REP-0127 as any non-run_depends dependencies other then a buildtool_depend on catkin.
+
+        :returns: True if the given package has any invalid dependencies, otherwise False
+        :rtype: bool
+        """
+        buildtool_depends = [d.name for d in self.buildtool_depends if d.name != "catkin"]
+        return len(self.build_depends + buildtool_depends + self.test_depends) > 0
+
+    def is_metapackage(self):
+        """Return True if this pacakge is a metapackage, otherwise False.
+
+        :returns: True if metapackage, else False
+        :rtype: bool
+        """
+        return "metapackage" in (e.tagname for e in self.exports)
+
+    def evaluate_conditions(self, context):
+        """Evaluate the conditions of all dependencies and memberships.
+
+        :param context: A dictionary with key value pairs to replace variables
+          starting with $ in the condition.
+        :raises: :exc:`ValueError` if any condition fails to parse
+        """
+        for attr in (
+            "build_depends",
+            "buildtool_depends",
+            "build_export_depends",
+            "buildtool_export_depends",
+            "exec_depends",
+            "test_depends",
+            "doc_depends",
+            "conflicts",
+            "replaces",
+            "group_depends",
+            "member_of_groups",
+            "exports",
+        ):
+            conditionals = getattr(self, attr)
+            for conditional in conditionals:
+                conditional.evaluate_condition(context)
 
     def validate(self, warnings=None):
         """Make sure all standards for packages are met.
@@ -525,6 +523,7 @@ def has_ros_schema_reference_string(data):
     """
     if sys.version_info[0] == 2 and not isinstance(data, str):
         data = data.encode("utf-8")
+    import xml.dom.minidom as dom
     try:
         root = dom.parseString(data)
     except Exception:
@@ -557,16 +556,6 @@ def parse_package(path, warnings=None):
     return parse_package_string(xml, filename, warnings=warnings)
 
 
-def _check_known_attributes(node, known):
-    if node.hasAttributes():
-        attrs = map(str, node.attributes.keys())
-        # colon is the namespace separator in attributes, xmlns can be added to any tag
-        unknown_attrs = [attr for attr in attrs if not (attr in known or attr == "xmlns" or ":" in attr)]
-        if unknown_attrs:
-            return ['The "%s" tag must not have the following attributes: %s' % (node.tagName, ", ".join(unknown_attrs))]
-    return []
-
-
 def parse_package_string(data, filename=None, warnings=None):
     """Parse package.xml string contents.
 
@@ -576,255 +565,5 @@ def parse_package_string(data, filename=None, warnings=None):
     :returns: return parsed :class:`Package`
     :raises: :exc:`InvalidPackage`
     """
-    if sys.version_info[0] == 2 and not isinstance(data, str):
-        data = data.encode("utf-8")
-    try:
-        root = dom.parseString(data)
-    except Exception as ex:
-        raise InvalidPackage("The manifest contains invalid XML:\n%s" % ex, filename)
-
-    pkg = PackageDefinition(filename)
-
-    # verify unique root node
-    nodes = _get_nodes(root, "package")
-    if len(nodes) != 1:
-        raise InvalidPackage('The manifest must contain a single "package" root tag', filename)
-    root = nodes[0]
-
-    # format attribute
-    value = _get_node_attr(root, "format", default=1)
-    pkg.package_format = int(value)
-    assert pkg.package_format in (1, 2, 3), \
-        "Unable to handle package.xml format version '%d', please update catkin_pkg " \
-        "(e.g. on Ubuntu/Debian use: sudo apt-get update && sudo apt-get install --only-upgrade python-catkin-pkg)" % pkg.package_format
-
-    # name
-    pkg.name = _get_node_value(_get_node(root, "name", filename))
-
-    # version and optional compatibility
-    version_node = _get_node(root, "version", filename)
-    pkg.version = _get_node_value(version_node)
-    pkg.version_compatibility = _get_node_attr(
-        version_node, "compatibility", default=None)
-
-    # description
-    pkg.description = _get_node_value(_get_node(root, "description", filename), allow_xml=True, apply_str=False)
-
-    # at least one maintainer, all must have email
-    maintainers = _get_nodes(root, "maintainer")
-    for node in maintainers:
-        pkg.maintainers.append(Person(
-            _get_node_value(node, apply_str=False),
-            _get_node_attr(node, "email"),
-        ))
-
-    # urls with optional type
-    urls = _get_nodes(root, "url")
-    for node in urls:
-        pkg.urls.append(Url(
-            _get_node_value(node),
-            _get_node_attr(node, "type", default="website"),
-        ))
-
-    # authors with optional email
-    authors = _get_nodes(root, "author")
-    for node in authors:
-        pkg.authors.append(Person(
-            _get_node_value(node, apply_str=False),
-            _get_node_attr(node, "email", default=None),
-        ))
-
-    # at least one license
-    licenses = _get_nodes(root, "license")
-    for node in licenses:
-        pkg.licenses.append(License(
-            _get_node_value(node),
-            _get_node_attr(node, "file", default=None),
-        ))
-
-    errors = []
-    # dependencies and relationships
-    pkg.build_depends = _get_dependencies(root, "build_depend")
-    pkg.buildtool_depends = _get_dependencies(root, "buildtool_depend")
-    if pkg.package_format == 1:
-        run_depends = _get_dependencies(root, "run_depend")
-        for d in run_depends:
-            pkg.build_export_depends.append(deepcopy(d))
-            pkg.exec_depends.append(deepcopy(d))
-    if pkg.package_format != 1:
-        pkg.build_export_depends = _get_dependencies(root, "build_export_depend")
-        pkg.buildtool_export_depends = _get_dependencies(root, "buildtool_export_depend")
-        pkg.exec_depends = _get_dependencies(root, "exec_depend")
-        depends = _get_dependencies(root, "depend")
-        for dep in depends:
-            # check for collisions with specific dependencies
-            same_build_depends = ["build_depend" for d in pkg.build_depends if d == dep]
-            same_build_export_depends = ["build_export_depend" for d in pkg.build_export_depends if d == dep]
-            same_exec_depends = ["exec_depend" for d in pkg.exec_depends if d == dep]
-            if same_build_depends or same_build_export_depends or same_exec_depends:
-                errors.append("The generic dependency on '%s' is redundant with: %s" % (dep.name, ", ".join(same_build_depends + same_build_export_depends + same_exec_depends)))
-            # only append non-duplicates
-            if not same_build_depends:
-                pkg.build_depends.append(deepcopy(dep))
-            if not same_build_export_depends:
-                pkg.build_export_depends.append(deepcopy(dep))
-            if not same_exec_depends:
-                pkg.exec_depends.append(deepcopy(dep))
-        pkg.doc_depends = _get_dependencies(root, "doc_depend")
-    pkg.test_depends = _get_dependencies(root, "test_depend")
-    pkg.conflicts = _get_dependencies(root, "conflict")
-    pkg.replaces = _get_dependencies(root, "replace")
-
-    # group dependencies and memberships
-    pkg.group_depends = _get_group_dependencies(root, "group_depend")
-    pkg.member_of_groups = _get_group_memberships(root, "member_of_group")
-
-    if pkg.package_format == 1:
-        for test_depend in pkg.test_depends:
-            same_build_depends = ["build_depend" for d in pkg.build_depends if d == test_depend]
-            same_run_depends = ["run_depend" for d in pkg.run_depends if d == test_depend]
-            if same_build_depends or same_run_depends:
-                errors.append('The test dependency on "%s" is redundant with: %s' % (test_depend.name, ", ".join(same_build_depends + same_run_depends)))
-
-    # exports
-    export_node = _get_optional_node(root, "export", filename)
-    if export_node is not None:
-        exports = []
-        for node in [n for n in export_node.childNodes if n.nodeType == n.ELEMENT_NODE]:
-            export = Export(str(node.tagName), _get_node_value(node, allow_xml=True))
-            for key, value in node.attributes.items():
-                export.attributes[str(key)] = str(value)
-            exports.append(export)
-        pkg.exports = exports
-
-    # verify that no unsupported tags and attributes are present
-    errors += _check_known_attributes(root, ["format"])
-    depend_attributes = ["version_lt", "version_lte", "version_eq", "version_gte", "version_gt"]
-    if pkg.package_format > 2:
-        depend_attributes.append("condition")
-    known = {
-        "name": [],
-        "version": ["compatibility"],
-        "description": [],
-        "maintainer": ["email"],
-        "license": [],
-        "url": ["type"],
-        "author": ["email"],
-        "build_depend": depend_attributes,
-        "buildtool_depend": depend_attributes,
-        "test_depend": depend_attributes,
-        "conflict": depend_attributes,
-        "replace": depend_attributes,
-        "export": [],
-    }
-    if pkg.package_format == 1:
-        known.update({
-            "run_depend": depend_attributes,
-        })
-    if pkg.package_format != 1:
-        known.update({
-            "build_export_depend": depend_attributes,
-            "buildtool_export_depend": depend_attributes,
-            "depend": depend_attributes,
-            "exec_depend": depend_attributes,
-            "doc_depend": depend_attributes,
-        })
-    if pkg.package_format > 2:
-        known.update({
-            "group_depend": ["condition"],
-            "member_of_group": ["condition"],
-        })
-    if pkg.package_format > 2:
-        known.update({
-            "license": ["file"],
-        })
-    nodes = [n for n in root.childNodes if n.nodeType == n.ELEMENT_NODE]
-    unknown_tags = set([n.tagName for n in nodes if n.tagName not in known.keys()])
-    if unknown_tags:
-        errors.append('The manifest of package "%s" (with format version %d) must not contain the following tags: %s' % (pkg.name, pkg.package_format, ", ".join(unknown_tags)))
-    if "run_depend" in unknown_tags and pkg.package_format >= 2:
-        errors.append("Please replace <run_depend> tags with <exec_depend> tags.")
-    elif "exec_depend" in unknown_tags and pkg.package_format < 2:
-        errors.append("Either update to a newer format or replace <exec_depend> tags with <run_depend> tags.")
-    for node in [n for n in nodes if n.tagName in known.keys()]:
-        errors += _check_known_attributes(node, known[node.tagName])
-        if node.tagName not in ["description", "export"]:
-            subnodes = [n for n in node.childNodes if n.nodeType == n.ELEMENT_NODE]
-            if subnodes:
-                errors.append('The "%s" tag must not contain the following children: %s' % (node.tagName, ", ".join([n.tagName for n in subnodes])))
-
-    if errors:
-        raise InvalidPackage("Error(s):%s" % ("".join(["\n- %s" % e for e in errors])), filename)
-
-    pkg.validate(warnings=warnings)
-
-    return pkg
-
-
-def _get_nodes(parent, tagname):
-    return [n for n in parent.childNodes if n.nodeType == n.ELEMENT_NODE and n.tagName == tagname]
-
-
-def _get_node(parent, tagname, filename):
-    nodes = _get_nodes(parent, tagname)
-    if len(nodes) != 1:
-        raise InvalidPackage('The manifest must contain exactly one "%s" tag' % tagname, filename)
-    return nodes[0]
-
-
-def _get_optional_node(parent, tagname, filename):
-    nodes = _get_nodes(parent, tagname)
-    if len(nodes) > 1:
-        raise InvalidPackage('The manifest must not contain more than one "%s" tags' % tagname, filename)
-    return nodes[0] if nodes else None
-
-
-def _get_node_value(node, allow_xml=False, apply_str=True):
-    if allow_xml:
-        value = ("".join([n.toxml() for n in node.childNodes])).strip(" \n\r\t")
-    else:
-        value = ("".join([n.data for n in node.childNodes if n.nodeType == n.TEXT_NODE])).strip(" \n\r\t")
-    if apply_str:
-        value = str(value)
-    return value
-
-
-def _get_node_attr(node, attr, default: t.Any=False):
-    """:param default: False means value is required."""
-    if node.hasAttribute(attr):
-        return str(node.getAttribute(attr))
-    if default is False:
-        raise InvalidPackage('The "%s" tag must have the attribute "%s"' % (node.tagName, attr))
-    return default
-
-
-def _get_dependencies(parent, tagname):
-    depends = []
-    for node in _get_nodes(parent, tagname):
-        depend = Dependency(_get_node_value(node))
-        for attr in ("version_lt", "version_lte", "version_eq", "version_gte", "version_gt", "condition"):
-            setattr(depend, attr, _get_node_attr(node, attr, None))
-        depends.append(depend)
-    return depends
-
-
-def _get_group_dependencies(parent, tagname):
-    from .group_dependency import GroupDependency
-    depends = []
-    for node in _get_nodes(parent, tagname):
-        depends.append(
-            GroupDependency(
-                _get_node_value(node),
-                condition=_get_node_attr(node, "condition", default=None)))
-    return depends
-
-
-def _get_group_memberships(parent, tagname):
-    from .group_membership import GroupMembership
-    memberships = []
-    for node in _get_nodes(parent, tagname):
-        memberships.append(
-            GroupMembership(
-                _get_node_value(node),
-                condition=_get_node_attr(node, "condition", default=None)))
-    return memberships
+    from .reader import read_package_xml_string
+    return read_package_xml_string(data, filename, strict=True, warnings=warnings)
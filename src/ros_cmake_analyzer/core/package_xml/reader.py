@@ -0,0 +1,367 @@
+"""A streaming reader for package.xml manifests.
+
+:func:`read_package_xml` parses a manifest in a single pass with expat, building a
+:class:`~ros_cmake_analyzer.core.package_xml.package.PackageDefinition` as each top-level element is closed,
+and discarding the element afterwards. No DOM of the manifest is ever built. As with defusedxml, manifests that
+declare entities or refer to external resources are rejected. defusedxml's own ``iterparse`` is not used, as
+it runs on the pure-Python ElementTree and is slower than the minidom parser that this replaces.
+
+:func:`load_package_xml` adds a process-wide cache, keyed on the path of the manifest and validated by its size and
+modification time, so that repeated lookups of the same package are free. The cached definitions are shared, and
+must not be modified by callers.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "load_package_xml",
+    "read_package_xml",
+    "read_package_xml_string",
+)
+
+import functools
+import io
+import os
+import threading
+import typing as t
+from pathlib import Path
+from xml.etree.ElementTree import Element, TreeBuilder, tostring
+from xml.parsers import expat as pyexpat
+
+from defusedxml import DefusedXmlException, EntitiesForbidden, ExternalReferenceForbidden
+
+from .package import Dependency, Export, InvalidPackage, License, PackageDefinition, Person, Url
+
+# The first format that has exec_depend tags, and the first that has conditions and license files
+_EXEC_DEPEND_FORMAT = 2
+_CONDITION_FORMAT = 3
+
+_DEPENDENCY_ATTRIBUTES = ("version_lt", "version_lte", "version_eq", "version_gte", "version_gt", "condition")
+
+# The PackageDefinition list that each kind of dependency tag is read into
+_DEPENDENCY_TAGS = {
+    "build_depend": "build_depends",
+    "buildtool_depend": "buildtool_depends",
+    "build_export_depend": "build_export_depends",
+    "buildtool_export_depend": "buildtool_export_depends",
+    "exec_depend": "exec_depends",
+    "test_depend": "test_depends",
+    "doc_depend": "doc_depends",
+    "conflict": "conflicts",
+    "replace": "replaces",
+}
+
+
+def _text(element: Element) -> str:
+    return "".join(element.itertext()).strip(" \n\r\t")
+
+
+def _inner_xml(element: Element) -> str:
+    parts = [element.text or ""]
+    parts.extend(tostring(child, encoding="unicode") for child in element)
+    return "".join(parts).strip(" \n\r\t")
+
+
+def _new_dependency(name: str, get: t.Callable[[str], str | None]) -> Dependency:
+    # Dependency.__init__ checks its keyword arguments, which is a large part of the cost of reading a manifest
+    dependency = Dependency.__new__(Dependency)
+    dependency.name = name
+    dependency.evaluated_condition = None
+    for attr in _DEPENDENCY_ATTRIBUTES:
+        setattr(dependency, attr, get(attr))
+    return dependency
+
+
+def _dependency(element: Element) -> Dependency:
+    return _new_dependency(_text(element), element.attrib.get)
+
+
+def _copy(dependency: Dependency) -> Dependency:
+    # The attributes of a dependency are all strings, so a shallow copy is as good as deepcopy, and much cheaper
+    return _new_dependency(dependency.name, functools.partial(getattr, dependency))
+
+
+def _known_tags(package_format: int) -> dict[str, list[str]]:
+    depend_attributes = ["version_lt", "version_lte", "version_eq", "version_gte", "version_gt"]
+    if package_format >= _CONDITION_FORMAT:
+        depend_attributes.append("condition")
+    known = {
+        "name": [],
+        "version": ["compatibility"],
+        "description": [],
+        "maintainer": ["email"],
+        "license": ["file"] if package_format >= _CONDITION_FORMAT else [],
+        "url": ["type"],
+        "author": ["email"],
+        "build_depend": depend_attributes,
+        "buildtool_depend": depend_attributes,
+        "test_depend": depend_attributes,
+        "conflict": depend_attributes,
+        "replace": depend_attributes,
+        "export": [],
+    }
+    if package_format == 1:
+        known["run_depend"] = depend_attributes
+    else:
+        known.update({
+            "build_export_depend": depend_attributes,
+            "buildtool_export_depend": depend_attributes,
+            "depend": depend_attributes,
+            "exec_depend": depend_attributes,
+            "doc_depend": depend_attributes,
+        })
+    if package_format >= _CONDITION_FORMAT:
+        known.update({
+            "group_depend": ["condition"],
+            "member_of_group": ["condition"],
+        })
+    return known
+
+
+def _unknown_attributes(tag: str, attributes: t.Iterable[str], known: t.Collection[str]) -> list[str]:
+    # colon is the namespace separator in attributes, xmlns can be added to any tag
+    unknown = [attr for attr in attributes if not (attr in known or attr == "xmlns" or ":" in attr)]
+    if unknown:
+        return [f'The "{tag}" tag must not have the following attributes: {", ".join(unknown)}']
+    return []
+
+
+class _ManifestBuilder:
+    """Builds a PackageDefinition from the top-level elements of a manifest as they are parsed."""
+
+    def __init__(self, filename: str | None) -> None:
+        self.filename = filename
+        self.package = PackageDefinition(filename)
+        self.counts: dict[str, int] = {}
+        self.depends: list[Dependency] = []
+        self.run_depends: list[Dependency] = []
+        self.root_attributes: list[str] = []
+        # The tag, attributes, and child tags of each top-level element, which are only kept for validation
+        self.elements: list[tuple[str, list[str], list[str]]] = []
+
+    def start(self, root: Element) -> None:
+        if root.tag != "package":
+            raise InvalidPackage('The manifest must contain a single "package" root tag', self.filename)
+        self.root_attributes = list(root.attrib)
+        try:
+            self.package.package_format = int(root.attrib.get("format", 1))
+        except ValueError:
+            raise InvalidPackage('The "format" attribute of the package must be an integer', self.filename) from None
+
+    def add(self, element: Element) -> None:
+        tag = element.tag
+        self.counts[tag] = self.counts.get(tag, 0) + 1
+        self.elements.append((tag, list(element.attrib), [child.tag for child in element]))
+        package = self.package
+        attrib = element.attrib
+        if tag in _DEPENDENCY_TAGS:
+            getattr(package, _DEPENDENCY_TAGS[tag]).append(_dependency(element))
+        elif tag == "depend":
+            self.depends.append(_dependency(element))
+        elif tag == "run_depend":
+            self.run_depends.append(_dependency(element))
+        elif tag == "name":
+            package.name = _text(element)
+        elif tag == "version":
+            package.version = _text(element)
+            package.version_compatibility = attrib.get("compatibility")
+        elif tag == "description":
+            package.description = _inner_xml(element)
+        elif tag == "maintainer":
+            package.maintainers.append(Person(_text(element), attrib.get("email")))
+        elif tag == "author":
+            package.authors.append(Person(_text(element), attrib.get("email")))
+        elif tag == "url":
+            package.urls.append(Url(_text(element), attrib.get("type", "website")))
+        elif tag == "license":
+            package.licenses.append(License(_text(element), attrib.get("file")))
+        elif tag in ("group_depend", "member_of_group"):
+            from .group_dependency import GroupDependency
+            from .group_membership import GroupMembership
+            cls = GroupDependency if tag == "group_depend" else GroupMembership
+            target = package.group_depends if tag == "group_depend" else package.member_of_groups
+            target.append(cls(_text(element), condition=attrib.get("condition")))
+        elif tag == "export":
+            for child in element:
+                if isinstance(child.tag, str):
+                    export = Export(child.tag, _inner_xml(child))
+                    export.attributes.update(child.attrib)
+                    package.exports.append(export)
+
+    def finish(self, strict: bool) -> list[str]:
+        """Merges the generic dependencies into the specific kinds, and returns any errors in the manifest."""
+        package = self.package
+        errors: list[str] = []
+        if package.package_format == 1:
+            for dependency in self.run_depends:
+                package.build_export_depends.append(_copy(dependency))
+                package.exec_depends.append(_copy(dependency))
+        else:
+            for dependency in self.depends:
+                same = [
+                    kind for kind, depends in (("build_depend", package.build_depends),
+                                               ("build_export_depend", package.build_export_depends),
+                                               ("exec_depend", package.exec_depends))
+                    if dependency in depends
+                ]
+                if same:
+                    errors.append(f"The generic dependency on '{dependency.name}' is redundant with: {', '.join(same)}")
+                for depends in (package.build_depends, package.build_export_depends, package.exec_depends):
+                    if dependency not in depends:
+                        depends.append(_copy(dependency))
+        if not strict:
+            return errors
+
+        errors.extend(f'The manifest must contain exactly one "{tag}" tag'
+                      for tag in ("name", "version", "description") if self.counts.get(tag, 0) != 1)
+        if self.counts.get("export", 0) > 1:
+            errors.append('The manifest must not contain more than one "export" tags')
+        if package.package_format not in (1, 2, 3):
+            errors.append(f"Unable to handle package.xml format version '{package.package_format}'")
+        if package.package_format == 1:
+            for test_depend in package.test_depends:
+                same = ["build_depend" for d in package.build_depends if d == test_depend]
+                same += ["run_depend" for d in self.run_depends if d == test_depend]
+                if same:
+                    errors.append(f'The test dependency on "{test_depend.name}" is redundant with: {", ".join(same)}')
+
+        errors += _unknown_attributes("package", self.root_attributes, ["format"])
+        known = _known_tags(package.package_format)
+        unknown_tags = sorted({tag for tag, _, _ in self.elements if tag not in known})
+        if unknown_tags:
+            errors.append(f'The manifest of package "{package.name}" (with format version {package.package_format}) '
+                          f'must not contain the following tags: {", ".join(unknown_tags)}')
+        if "run_depend" in unknown_tags and package.package_format >= _EXEC_DEPEND_FORMAT:
+            errors.append("Please replace <run_depend> tags with <exec_depend> tags.")
+        elif "exec_depend" in unknown_tags and package.package_format < _EXEC_DEPEND_FORMAT:
+            errors.append("Either update to a newer format or replace <exec_depend> tags with <run_depend> tags.")
+        for tag, attributes, children in self.elements:
+            if tag not in known:
+                continue
+            errors += _unknown_attributes(tag, attributes, known[tag])
+            if tag not in ("description", "export") and children:
+                errors.append(f'The "{tag}" tag must not contain the following children: {", ".join(children)}')
+        return errors
+
+
+class _Handler:
+    """Receives parser events, and hands each top-level element to the builder as soon as it is closed."""
+
+    def __init__(self, builder: _ManifestBuilder) -> None:
+        self.builder = builder
+        self.tree = TreeBuilder()
+        self.depth = 0
+
+    def start(self, tag: str, attrib: dict[str, str]) -> None:
+        element = self.tree.start(tag, attrib)
+        if self.depth == 0:
+            self.builder.start(element)
+        self.depth += 1
+
+    def end(self, tag: str) -> None:
+        element = self.tree.end(tag)
+        self.depth -= 1
+        if self.depth == 1:
+            self.builder.add(element)
+            element.clear()
+
+
+def _forbid_entities(name: str, *args: object) -> t.NoReturn:
+    raise EntitiesForbidden(name, None, None, None, None, None)
+
+
+def _forbid_external_references(context: str, base: str | None, sysid: str, pubid: str | None) -> t.NoReturn:
+    raise ExternalReferenceForbidden(context, base, sysid, pubid)
+
+
+def read_package_xml(
+        source: str | os.PathLike[str] | t.BinaryIO,
+        filename: str | None = None,
+        *,
+        strict: bool = False,
+        warnings: list[str] | None = None,
+) -> PackageDefinition:
+    """Reads a package.xml manifest.
+
+    Parameters
+    ----------
+    source: str | os.PathLike[str] | BinaryIO
+        The path of the manifest, or a binary file object to read it from
+    filename: str | None
+        The name of the manifest to use in error messages, if source is a file object
+    strict: bool
+        If True, the manifest must follow the package.xml specification, as checked by catkin_pkg. Otherwise,
+        only the structure of the manifest is checked, so that real-world manifests with missing or unknown
+        elements can still be analyzed.
+    warnings: list[str] | None
+        In strict mode, the list that any warnings are added to. If None, they are printed instead.
+
+    Raises
+    ------
+    InvalidPackage
+        if the manifest is not well-formed, or if strict and the manifest does not follow the specification
+
+    """
+    if filename is None and isinstance(source, str | os.PathLike):
+        filename = os.fspath(source)
+    builder = _ManifestBuilder(filename)
+    handler = _Handler(builder)
+    parser = pyexpat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.tree.data
+    # As in defusedxml, entity declarations and external references are rejected
+    parser.EntityDeclHandler = _forbid_entities
+    parser.UnparsedEntityDeclHandler = _forbid_entities
+    parser.ExternalEntityRefHandler = _forbid_external_references
+    try:
+        if isinstance(source, str | os.PathLike):
+            with open(source, "rb") as f:  # noqa: PTH123
+                parser.ParseFile(f)
+        else:
+            parser.ParseFile(source)
+    except pyexpat.ExpatError as e:
+        raise InvalidPackage(f"The manifest contains invalid XML:\n{e}", filename) from e
+    except DefusedXmlException as e:
+        raise InvalidPackage(f"The manifest contains forbidden XML:\n{e}", filename) from e
+    errors = builder.finish(strict)
+    if strict:
+        if errors:
+            message = "Error(s):" + "".join(f"\n- {e}" for e in errors)
+            raise InvalidPackage(message, filename)
+        builder.package.validate(warnings=warnings)
+    return builder.package
+
+
+def read_package_xml_string(data: str | bytes, filename: str | None = None, *, strict: bool = False,
+                            warnings: list[str] | None = None) -> PackageDefinition:
+    """Reads a package.xml manifest from its contents. See :func:`read_package_xml`."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return read_package_xml(io.BytesIO(data), filename, strict=strict, warnings=warnings)
+
+
+_cache: dict[str, tuple[int, int, PackageDefinition]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_package_xml(path: str | os.PathLike[str]) -> PackageDefinition:
+    """Returns the definition in a package.xml manifest, which is only read again if the file has changed.
+
+    Raises
+    ------
+    OSError
+        if the manifest cannot be read
+    InvalidPackage
+        if the manifest is not well-formed
+
+    """
+    filename = os.fspath(path)
+    stat = Path(filename).stat()
+    cached = _cache.get(filename)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    definition = read_package_xml(filename)
+    with _cache_lock:
+        _cache[filename] = (stat.st_mtime_ns, stat.st_size, definition)
+    return definition
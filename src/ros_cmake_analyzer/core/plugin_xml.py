@@ -0,0 +1,296 @@
+"""Reads the plugin description files that are used by pluginlib and nodelet.
+
+A plugin description file lists the classes in each library of a package that can be loaded as plugins::
+
+    <library path="lib/libmy_nodelets">
+      <class name="my_pkg/MyNodelet" type="my_pkg::MyNodelet" base_class_type="nodelet::Nodelet">
+        <description>...</description>
+      </class>
+    </library>
+
+Files are parsed incrementally, and the classes that they declare are cached for the lifetime of the process,
+keyed on the path of the file and validated by its size and modification time. A description file is therefore
+only parsed once, however many times it is referenced across a workspace.
+
+:class:`PluginIndex` collects the plugin classes that each package exports, either through an export in its
+package.xml (ROS 1, e.g. ``<nodelet plugin="${prefix}/nodelet_plugins.xml"/>``) or through
+``pluginlib_export_plugin_description_file`` in its CMakeLists.txt (ROS 2).
+"""
+from __future__ import annotations
+
+__all__ = (
+    "PluginClass",
+    "PluginDeclaration",
+    "PluginIndex",
+    "parse_plugin_description",
+    "plugin_description_files",
+    "read_plugin_description",
+)
+
+import os
+import threading
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+from xml.etree.ElementTree import ParseError
+
+from ros_cmake_analyzer import trace
+from ros_cmake_analyzer.diagnostics import Level, Message, diagnostics
+
+if t.TYPE_CHECKING:
+    from ros_cmake_analyzer.model import CMakeInfo, CMakePluginReference
+
+    from .package import Package
+
+NODELET_BASE_CLASS = "nodelet::Nodelet"
+
+
+@dataclass(frozen=True, slots=True)
+class PluginClass:
+    """A class that is declared in a plugin description file.
+
+    Attributes
+    ----------
+    library: str
+        The path of the library that contains the class, as given in the file
+    name: str
+        The name by which the class is loaded. Defaults to the type of the class.
+    type_: str
+        The fully qualified C++ type of the class
+    base_class_type: str | None
+        The fully qualified C++ type of the base class of the plugin
+
+    """
+
+    library: str
+    name: str
+    type_: str
+    base_class_type: str | None
+
+    @property
+    def is_nodelet(self) -> bool:
+        return self.base_class_type == NODELET_BASE_CLASS
+
+
+@dataclass(frozen=True, slots=True)
+class PluginDeclaration:
+    """A plugin class that is exported by a package.
+
+    Attributes
+    ----------
+    package: str
+        The name of the package that exports the class
+    base_class_package: str
+        The name of the package that defines the plugin base class
+    description_file: Path
+        The plugin description file that declares the class
+    plugin: PluginClass
+        The class itself
+
+    """
+
+    package: str
+    base_class_package: str
+    description_file: Path
+    plugin: PluginClass
+
+
+class _WrappedDocument:
+    """Presents the contents of a binary file wrapped in a single root element.
+
+    Plugin description files commonly contain several top-level <library> elements, which is not well-formed XML
+    on its own. Any XML declaration at the start of the file is dropped, as it cannot follow the root element.
+    """
+
+    def __init__(self, source: t.BinaryIO) -> None:
+        self._source = source
+        self._head = b"<plugins>"
+        self._started = False
+        self._finished = False
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._started:
+            self._started = True
+            start = self._source.read(max(size, 1024))
+            stripped = start.lstrip(b"\xef\xbb\xbf \t\r\n")
+            if stripped.startswith(b"<?xml"):
+                end = stripped.find(b"?>")
+                while end < 0:
+                    more = self._source.read(1024)
+                    if not more:
+                        break
+                    stripped += more
+                    end = stripped.find(b"?>")
+                start = stripped[end + 2:] if end >= 0 else stripped
+            return self._head + start
+        if self._finished:
+            return b""
+        data = self._source.read(size)
+        if not data:
+            self._finished = True
+            return b"</plugins>"
+        return data
+
+
+def parse_plugin_description(source: t.BinaryIO) -> tuple[PluginClass, ...]:
+    """Parses the plugin classes from the contents of a plugin description file.
+
+    Raises
+    ------
+    ParseError
+        if the contents are not well-formed XML
+
+    """
+    from defusedxml.ElementTree import iterparse
+    classes: list[PluginClass] = []
+    library = ""
+    for event, element in iterparse(_WrappedDocument(source), events=("start", "end")):
+        if element.tag == "library":
+            if event == "start":
+                library = element.attrib.get("path", "")
+            else:
+                element.clear()
+        elif element.tag == "class" and event == "start":
+            type_ = element.attrib.get("type")
+            if type_ is None:
+                diagnostics.emit(Message(Level.WARNING, "Plugin class in library '{}' has no type", (library,)))
+                continue
+            name = element.attrib.get("name") or type_
+            classes.append(PluginClass(library, name, type_, element.attrib.get("base_class_type")))
+    return tuple(classes)
+
+
+_cache: dict[str, tuple[int, int, tuple[PluginClass, ...]]] = {}
+_cache_lock = threading.Lock()
+
+
+def read_plugin_description(path: str | os.PathLike[str]) -> tuple[PluginClass, ...]:
+    """Returns the plugin classes declared in a plugin description file.
+
+    Files that do not exist, or cannot be parsed, declare no classes.
+    """
+    filename = os.fspath(path)
+    try:
+        stat = Path(filename).stat()
+    except OSError:
+        return ()
+    cached = _cache.get(filename)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    diagnostics.emit(Message(Level.DEBUG, "Reading plugin information from {}", (filename,)))
+    try:
+        with open(filename, "rb") as f, trace.span("plugin_xml", "plugin_xml", {"path": filename}):  # noqa: PTH123
+            classes = parse_plugin_description(f)
+    except (OSError, ParseError) as e:
+        diagnostics.emit(Message(Level.WARNING, "Unable to read plugin description {}: {}", (filename, e)))
+        return ()
+    with _cache_lock:
+        _cache[filename] = (stat.st_mtime_ns, stat.st_size, classes)
+    return classes
+
+
+def plugin_description_files(package: Package) -> list[tuple[str, Path]]:
+    """Returns the plugin description files that are exported in the package.xml of a package.
+
+    Each file is returned along with the name of the package that defines the plugin base class, which is the
+    tag of the export.
+    """
+    files: list[tuple[str, Path]] = []
+    for export in package.exports:
+        plugin = export.attributes.get("plugin")
+        if plugin is not None:
+            relative = plugin.replace("${prefix}", "").lstrip("/")
+            files.append((export.tagname, package.path / relative))
+    return files
+
+
+class PluginIndex:
+    """Indexes the plugin classes that are exported by the packages of a workspace.
+
+    The index is a :class:`ros_cmake_analyzer.batch.ResultSink`: adding the result of analyzing a package
+    indexes both the plugin description files that are exported in its package.xml, and those that are
+    referenced in its CMakeLists.txt. Adding a package that is already in the index replaces its previous entries.
+    """
+
+    def __init__(self) -> None:
+        self._by_package: dict[str, list[PluginDeclaration]] = {}
+        self._by_base_class: dict[str, list[PluginDeclaration]] = {}
+        self._by_base_class_package: dict[str, list[PluginDeclaration]] = {}
+        self._by_name: dict[str, list[PluginDeclaration]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(declarations) for declarations in self._by_package.values())
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self.add_package(package, info.plugin_references)
+
+    def add_package(self, package: Package, references: t.Iterable[CMakePluginReference] = ()) -> None:
+        """Indexes the plugin description files of a package.
+
+        Parameters
+        ----------
+        package: Package
+            The package, whose package.xml exports are indexed
+        references: Iterable[CMakePluginReference]
+            The plugin description files that are referenced by the CMakeLists.txt of the package
+
+        """
+        files = plugin_description_files(package)
+        for reference in references:
+            files.append((reference.base_class_package,
+                          Path(reference.cmakelists_file).parent / reference.plugin_xml))
+        self.remove(package.name)
+        declarations: list[PluginDeclaration] = []
+        for base_class_package, path in dict.fromkeys(files):
+            for plugin in read_plugin_description(path):
+                declaration = PluginDeclaration(package.name, base_class_package, path, plugin)
+                declarations.append(declaration)
+                if plugin.base_class_type is not None:
+                    self._by_base_class.setdefault(plugin.base_class_type, []).append(declaration)
+                self._by_base_class_package.setdefault(base_class_package, []).append(declaration)
+                self._by_name.setdefault(plugin.name, []).append(declaration)
+                if plugin.type_ != plugin.name:
+                    self._by_name.setdefault(plugin.type_, []).append(declaration)
+        self._by_package[package.name] = declarations
+
+    def remove(self, package_name: str) -> None:
+        """Removes the plugin classes of a package from the index."""
+        declarations = self._by_package.pop(package_name, None)
+        if not declarations:
+            return
+        for declaration in declarations:
+            plugin = declaration.plugin
+            keys = [(self._by_base_class_package, declaration.base_class_package), (self._by_name, plugin.name),
+                    (self._by_name, plugin.type_)]
+            if plugin.base_class_type is not None:
+                keys.append((self._by_base_class, plugin.base_class_type))
+            for mapping, key in keys:
+                remaining = [d for d in mapping.get(key, ()) if d.package != package_name]
+                if remaining:
+                    mapping[key] = remaining
+                else:
+                    mapping.pop(key, None)
+
+    def packages(self) -> list[str]:
+        return list(self._by_package)
+
+    def classes_for_package(self, package_name: str) -> list[PluginDeclaration]:
+        """Returns the plugin classes that a package exports."""
+        return list(self._by_package.get(package_name, ()))
+
+    def classes_for_base_class(self, base_class_type: str) -> list[PluginDeclaration]:
+        """Returns the plugin classes that derive from a given base class, such as 'nodelet::Nodelet'."""
+        return list(self._by_base_class.get(base_class_type, ()))
+
+    def classes_for_base_class_package(self, base_class_package: str) -> list[PluginDeclaration]:
+        """Returns the plugin classes that are exported to a given package, such as 'nodelet' or 'rviz'."""
+        return list(self._by_base_class_package.get(base_class_package, ()))
+
+    def classes_named(self, name: str) -> list[PluginDeclaration]:
+        """Returns the plugin classes with a given name or C++ type."""
+        return list(self._by_name.get(name, ()))
+
+    def nodelets(self, package_name: str) -> list[PluginDeclaration]:
+        """Returns the nodelets that a package exports."""
+        return [declaration for declaration in self._by_package.get(package_name, ())
+                if declaration.plugin.is_nodelet or declaration.base_class_package == "nodelet"]
@@ -0,0 +1,284 @@
+"""An index of the C++ classes that are defined and exported by the sources of each target.
+
+Nodelets and ROS 2 components are loaded by class name, so resolving them to the target that builds them means
+finding the source file that exports the class. :func:`scan_source` reads a source file (memory-mapped) and
+records the classes that it defines, qualified by their enclosing namespaces and classes, along with the classes
+that it exports through ``PLUGINLIB_EXPORT_CLASS``, ``CLASS_LOADER_REGISTER_CLASS`` or
+``RCLCPP_COMPONENTS_REGISTER_NODE``. The results of scanning the last :data:`CACHE_SIZE` files are cached, and
+each is reused for as long as the size and modification time of the file are unchanged.
+
+:class:`ClassIndex` maps fully qualified class names to the files and targets that define or export them::
+
+    classes = ClassIndex()
+    BatchAnalyzer("ros1", sinks=[classes]).run(find_packages(workspace))
+    for ref in classes.targets_exporting("my_pkg::MyNodelet"):
+        ...
+"""
+from __future__ import annotations
+
+__all__ = (
+    "ClassExport",
+    "ClassIndex",
+    "SourceSymbols",
+    "scan_source",
+)
+
+import functools
+import mmap
+import os
+import re
+import threading
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+from .index import TargetRef
+from .model import SourceLanguage
+
+if t.TYPE_CHECKING:
+    from .core.package import Package
+    from .model import CMakeInfo, CMakeTarget
+
+COMPONENT_BASE_CLASS = "rclcpp_components::NodeFactory"
+
+
+# Compiling the pattern is comparatively slow, so it is compiled when the first file is scanned
+@functools.cache
+def _tokens() -> re.Pattern[bytes]:
+    return re.compile(rb"""
+    (?P<skip>//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|\benum\s+(?:class|struct)\b)
+  | \b(?:PLUGINLIB_EXPORT_CLASS|CLASS_LOADER_REGISTER_CLASS)\s*\(\s*(?P<export>[\w:]+)\s*,\s*(?P<base>[\w:]+)\s*\)
+  | \bRCLCPP_COMPONENTS_REGISTER_NODE\s*\(\s*(?P<component>[\w:]+)\s*\)
+  | \bnamespace\s+(?P<namespace>[\w:]*)\s*\{
+  | \b(?:class|struct)\s+(?:\w+\s+)*?(?P<class>\w+)\s*(?:final\s*)?(?::[^;{}()]*)?\{
+  | (?P<open>\{)
+  | (?P<close>\})
+""", re.VERBOSE | re.DOTALL)
+
+
+_CXX_SUFFIXES = frozenset((".c", ".cc", ".cpp", ".cxx", ".c++", ".h", ".hh", ".hpp", ".hxx", ".h++", ".ipp"))
+
+
+@dataclass(frozen=True, slots=True)
+class ClassExport:
+    """A class that a source file makes loadable as a plugin.
+
+    Attributes
+    ----------
+    class_name: str
+        The fully qualified name of the exported class, without a leading '::'
+    base_class: str
+        The fully qualified name of the plugin base class. Components are given the base class
+        'rclcpp_components::NodeFactory'.
+
+    """
+
+    class_name: str
+    base_class: str
+
+
+@dataclass(frozen=True, slots=True)
+class SourceSymbols:
+    """The classes that are defined and exported by a single source file."""
+
+    classes: tuple[str, ...] = ()
+    exports: tuple[ClassExport, ...] = ()
+
+
+def _name(token: bytes) -> str:
+    return token.decode("ascii", "replace").lstrip(":")
+
+
+def _qualify(scopes: list[str | None], name: str) -> str:
+    if "::" in name:
+        return name
+    return "::".join([scope for scope in scopes if scope] + [name])
+
+
+def _scan(data: bytes | mmap.mmap) -> SourceSymbols:
+    classes: list[str] = []
+    exports: list[ClassExport] = []
+    # The name of the namespace or class that each enclosing brace opens, or None for any other block
+    scopes: list[str | None] = []
+    for match in _tokens().finditer(data):
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        if kind == "open":
+            scopes.append(None)
+        elif kind == "close":
+            if scopes:
+                scopes.pop()
+        elif kind == "class":
+            name = _qualify(scopes, _name(match["class"]))
+            classes.append(name)
+            scopes.append(name.rsplit("::", 1)[-1])
+        elif kind == "namespace":
+            scopes.append(_name(match["namespace"]))
+        elif kind == "base":
+            exports.append(ClassExport(_qualify(scopes, _name(match["export"])), _name(match["base"])))
+        elif kind == "component":
+            exports.append(ClassExport(_qualify(scopes, _name(match["component"])), COMPONENT_BASE_CLASS))
+    return SourceSymbols(tuple(classes), tuple(exports))
+
+
+# The number of files whose symbols are cached. Once it is reached, the file that was scanned least recently is
+# forgotten, so that long-running batch and server processes do not grow without bound.
+CACHE_SIZE = 16384
+
+_cache: dict[str, tuple[int, int, SourceSymbols]] = {}
+_cache_lock = threading.Lock()
+
+
+def scan_source(path: str | os.PathLike[str]) -> SourceSymbols:
+    """Returns the classes that a C or C++ source file defines and exports.
+
+    Files that do not exist, or cannot be read, define nothing.
+    """
+    filename = os.fspath(path)
+    try:
+        stat = Path(filename).stat()
+    except OSError:
+        return SourceSymbols()
+    cached = _cache.get(filename)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    try:
+        with open(filename, "rb") as f:  # noqa: PTH123
+            if stat.st_size == 0:
+                symbols = SourceSymbols()
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    symbols = _scan(data)
+    except (OSError, ValueError):
+        return SourceSymbols()
+    with _cache_lock:
+        _cache.pop(filename, None)
+        while len(_cache) >= CACHE_SIZE:
+            del _cache[next(iter(_cache))]
+        _cache[filename] = (stat.st_mtime_ns, stat.st_size, symbols)
+    return symbols
+
+
+class ClassIndex:
+    """Maps fully qualified C++ class names to the source files and targets that define or export them.
+
+    Only the sources of C++ targets are scanned, and sources that are shared by several targets are scanned once.
+    Lookups are dictionary lookups. Adding a package that is already in the index replaces its previous entries,
+    and rescans any of its sources that have changed since they were last scanned.
+    """
+
+    def __init__(self) -> None:
+        self._symbols: dict[Path, SourceSymbols] = {}
+        self._files_defining: dict[str, list[Path]] = {}
+        self._files_exporting: dict[str, list[Path]] = {}
+        self._defining: dict[str, list[TargetRef]] = {}
+        self._exporting: dict[str, list[TargetRef]] = {}
+        self._targets_by_package: dict[Path, list[TargetRef]] = {}
+        self._sources_by_package: dict[Path, list[Path]] = {}
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self.add_targets(package.name, package.path, info.targets)
+
+    def add_targets(self, package_name: str, package_path: Path, targets: t.Mapping[str, CMakeTarget]) -> None:
+        """Indexes the sources of the targets of a package, given as a mapping of keys to targets."""
+        package_path = package_path.resolve()
+        self.remove(package_path)
+        sources: dict[str, list[Path]] = {}
+        for key, target in targets.items():
+            if target.language == SourceLanguage.CXX:
+                sources[key] = [package_path / source for source in target.sources
+                                if source.suffix.lower() in _CXX_SUFFIXES]
+        package_sources = list(dict.fromkeys(path for paths in sources.values() for path in paths))
+        self.scan(package_sources)
+        self._sources_by_package[package_path] = package_sources
+
+        refs: list[TargetRef] = []
+        for key, paths in sources.items():
+            ref = TargetRef(package_name, package_path, key, targets[key])
+            refs.append(ref)
+            defined: set[str] = set()
+            exported: set[str] = set()
+            for path in paths:
+                symbols = self._symbols[path]
+                defined.update(symbols.classes)
+                exported.update(export.class_name for export in symbols.exports)
+            for name in defined:
+                self._defining.setdefault(name, []).append(ref)
+            for name in exported:
+                self._exporting.setdefault(name, []).append(ref)
+        self._targets_by_package[package_path] = refs
+
+    def remove(self, package_path: str | os.PathLike[str]) -> None:
+        """Removes all the targets of a package, and the sources that they compile, from the index."""
+        package_path = Path(package_path).resolve()
+        for path in self._sources_by_package.pop(package_path, ()):
+            symbols = self._symbols.pop(path, None)
+            if symbols is not None:
+                self._forget(path, symbols)
+        refs = self._targets_by_package.pop(package_path, None)
+        if not refs:
+            return
+        removed = {id(ref) for ref in refs}
+        for mapping in (self._defining, self._exporting):
+            for name in [name for name, owners in mapping.items() if any(id(ref) in removed for ref in owners)]:
+                owners = [ref for ref in mapping[name] if id(ref) not in removed]
+                if owners:
+                    mapping[name] = owners
+                else:
+                    del mapping[name]
+
+    def scan(self, paths: t.Iterable[Path]) -> None:
+        """Scans the given source files, other than those that are unchanged since they were last scanned."""
+        for path in dict.fromkeys(paths):
+            self._record(path, scan_source(path))
+
+    def _record(self, path: Path, symbols: SourceSymbols) -> None:
+        previous = self._symbols.get(path)
+        # scan_source returns the same symbols for as long as the file is unchanged
+        if previous is symbols:
+            return
+        if previous is not None:
+            self._forget(path, previous)
+        self._symbols[path] = symbols
+        for name in dict.fromkeys(symbols.classes):
+            self._files_defining.setdefault(name, []).append(path)
+        for name in dict.fromkeys(export.class_name for export in symbols.exports):
+            self._files_exporting.setdefault(name, []).append(path)
+
+    def _forget(self, path: Path, symbols: SourceSymbols) -> None:
+        """Removes a source file from the class names that it was recorded as defining and exporting."""
+        for mapping, names in ((self._files_defining, symbols.classes),
+                               (self._files_exporting, [export.class_name for export in symbols.exports])):
+            for name in dict.fromkeys(names):
+                paths = [other for other in mapping.get(name, ()) if other != path]
+                if paths:
+                    mapping[name] = paths
+                else:
+                    mapping.pop(name, None)
+
+    def symbols(self, path: str | os.PathLike[str]) -> SourceSymbols:
+        """Returns the classes that a source file defines and exports, scanning it again if it has changed."""
+        path = Path(path)
+        self._record(path, scan_source(path))
+        return self._symbols[path]
+
+    def files_defining(self, class_name: str) -> list[Path]:
+        """Returns the scanned source files that define a class."""
+        return list(self._files_defining.get(class_name.lstrip(":"), ()))
+
+    def files_exporting(self, class_name: str) -> list[Path]:
+        """Returns the scanned source files that export a class as a plugin."""
+        return list(self._files_exporting.get(class_name.lstrip(":"), ()))
+
+    def targets_defining(self, class_name: str) -> list[TargetRef]:
+        """Returns the targets that compile a definition of a class."""
+        return list(self._defining.get(class_name.lstrip(":"), ()))
+
+    def targets_exporting(self, class_name: str) -> list[TargetRef]:
+        """Returns the targets that export a class as a plugin."""
+        return list(self._exporting.get(class_name.lstrip(":"), ()))
+
+    def resolve(self, class_name: str) -> list[TargetRef]:
+        """Returns the targets that provide a plugin class: those that export it or, failing that, define it."""
+        return self.targets_exporting(class_name) or self.targets_defining(class_name)
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
 import abc
+import time
 import typing as t
 
+from . import trace
+
+if t.TYPE_CHECKING:
+    from .stats import AnalysisStats
+
 
 class CommandHandlerType(type, abc.ABC):
     """A metaclass that stores CMake command handlers.
@@ -16,6 +22,48 @@ class CommandHandlerType(type, abc.ABC):
             if hasattr(method, "commands"):
                 for command in method.commands:
                     cls._handlers[command] = method
+        # The handlers of this class and its bases, with those of subclasses taking precedence
+        cls._all_handlers = {}
+        for base in reversed(cls.__mro__):
+            cls._all_handlers.update(getattr(base, "_handlers", {}))
+
+    def dispatch(
+            cls,
+            extractor: t.Any,  # noqa: ANN401
+            command: str,
+            cmake_env: dict[str, t.Any],
+            raw_args: list[str],
+            stats: AnalysisStats | None = None,
+    ) -> bool:
+        """Calls the handler of a command, if there is one, and records the time that it takes.
+
+        The time is added to stats, if given, and the call is traced if a tracer is active and the call takes at
+        least as long as the threshold of the tracer.
+
+        Returns
+        -------
+        bool
+            True if the command has a handler, or False if it is not handled
+
+        """
+        handler = cls._all_handlers.get(command)
+        if handler is None:
+            return False
+        tracer = trace.current
+        if stats is None and tracer is None:
+            handler(extractor, cmake_env, raw_args)
+            return True
+        start = time.perf_counter_ns()
+        try:
+            handler(extractor, cmake_env, raw_args)
+        finally:
+            end = time.perf_counter_ns()
+            if stats is not None:
+                stats.record_handler(command, (end - start) / 1e9)
+            if tracer is not None and end - start >= tracer.handler_threshold_ns:
+                tracer.complete(command, "handler", start, end, {"cmakelists": cmake_env.get("cmakelists"),
+                                                                 "line": cmake_env.get("cmakelists_line")})
+        return True
 
 
 TCMakeFunction = t.Callable[[t.Any, dict[str, t.Any], list[str]], None]  # TODO: Self?
@@ -0,0 +1,315 @@
+"""Records what happened while analyzing packages as typed events, rather than as formatted log messages.
+
+Anything that the extractors want to report, such as a source file that cannot be found or a command that is not
+handled, is emitted as a :class:`Diagnostic` through the process-wide :data:`diagnostics` dispatcher. An event is
+a small immutable record, and is only turned into text when a sink calls its :meth:`~Diagnostic.message`, so
+events that are filtered out by their level, or never written anywhere, cost next to nothing::
+
+    from ros_cmake_analyzer.diagnostics import DiagnosticsCollector, Level, UnresolvedFile, diagnostics
+
+    collector = DiagnosticsCollector()
+    diagnostics.add_sink(collector)
+    diagnostics.level = Level.DEBUG
+    ...
+    for event in collector.of_type(UnresolvedFile):
+        print(event.file.filename, event.file.cmake_file)
+
+By default, events at INFO and above are forwarded to loguru by a :class:`LoguruSink`. Events are dispatched in the
+process that emits them, so sinks added in the parent of a parallel :class:`ros_cmake_analyzer.batch.BatchAnalyzer`
+do not see the events of its workers. :meth:`Diagnostics.silence` turns the layer off entirely: events are then
+discarded before they are even constructed at the call sites that check :meth:`Diagnostics.enabled`.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "AnalysisTruncated",
+    "CommandFailed",
+    "Diagnostic",
+    "DiagnosticSink",
+    "Diagnostics",
+    "DiagnosticsCollector",
+    "GlobExpansion",
+    "Level",
+    "LoguruSink",
+    "Message",
+    "PackageFailed",
+    "SyntaxErrorSkipped",
+    "UnhandledCommand",
+    "UnresolvedFile",
+    "UnsupportedCommand",
+    "diagnostics",
+)
+
+import contextlib
+import enum
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+from .log import logger
+
+if t.TYPE_CHECKING:
+    from .model import CommandInformation, FileInformation
+
+D = t.TypeVar("D")
+
+
+class Level(enum.IntEnum):
+    """The severity of a diagnostic. The values match those of the levels of loguru and logging."""
+
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+class Diagnostic(t.Protocol):
+    """An event that is reported while analyzing a package."""
+
+    @property
+    def level(self) -> Level:
+        ...
+
+    def message(self) -> str:
+        """Describes the event. This is only called once a sink consumes the event."""
+        ...
+
+
+class DiagnosticSink(t.Protocol):
+    """Consumes the diagnostics that pass the level of the dispatcher."""
+
+    def handle(self, event: Diagnostic) -> None:
+        ...
+
+
+class _Event:
+    """The base of the diagnostics of this module, which are converted to strings by formatting their message."""
+
+    __slots__ = ()
+
+    def message(self) -> str:
+        raise NotImplementedError
+
+    def __str__(self) -> str:
+        return self.message()
+
+
+@dataclass(frozen=True, slots=True)
+class Message(_Event):
+    """A free-form diagnostic, whose text is only formatted from its template and arguments on demand."""
+
+    level: Level
+    template: str
+    args: tuple[t.Any, ...] = ()
+
+    def message(self) -> str:
+        return self.template.format(*self.args) if self.args else self.template
+
+
+@dataclass(frozen=True, slots=True)
+class UnhandledCommand(_Event):
+    """A command in a CMakeLists.txt file that the extractor has no handler for."""
+
+    level: t.ClassVar[Level] = Level.DEBUG
+    command: CommandInformation
+
+    def message(self) -> str:
+        return (f"{self.command.cmake_file}:{self.command.cmake_line_no}: "
+                f"'{self.command.command}' is not handled")
+
+
+@dataclass(frozen=True, slots=True)
+class CommandFailed(_Event):
+    """A command in a CMakeLists.txt file whose handler raised an exception."""
+
+    level: t.ClassVar[Level] = Level.ERROR
+    command: CommandInformation
+
+    def message(self) -> str:
+        return (f"Error processing {self.command.command}({self.command.args}) in "
+                f"{self.command.cmake_file}:{self.command.cmake_line_no}: {self.command.reason}")
+
+
+@dataclass(frozen=True, slots=True)
+class SyntaxErrorSkipped(_Event):
+    """Text in a CMakeLists.txt file that was skipped to recover from a syntax error, when parsing resiliently."""
+
+    level: t.ClassVar[Level] = Level.WARNING
+    command: CommandInformation
+
+    def message(self) -> str:
+        return f"{self.command.cmake_file}:{self.command.cmake_line_no}: {self.command.reason}"
+
+
+@dataclass(frozen=True, slots=True)
+class UnsupportedCommand(_Event):
+    """A command that is handled, but not in the form in which it is used."""
+
+    level: t.ClassVar[Level] = Level.WARNING
+    command: str
+    args: tuple[str, ...]
+    reason: str
+
+    def message(self) -> str:
+        return f"Cannot process {self.command}({' '.join(self.args)}): {self.reason}"
+
+
+@dataclass(frozen=True, slots=True)
+class UnresolvedFile(_Event):
+    """A source file that is referenced by a CMakeLists.txt file, but does not match exactly one file on disk.
+
+    Attributes
+    ----------
+    file: FileInformation
+        The file as it is referenced, along with the location of the reference
+    candidates: tuple[Path, ...]
+        The files whose names start with the name of the referenced file
+
+    """
+
+    level: t.ClassVar[Level] = Level.WARNING
+    file: FileInformation
+    candidates: tuple[Path, ...] = ()
+
+    def message(self) -> str:
+        return (f"{self.file.cmake_file}:{self.file.cmake_line_no}: '{self.file.filename}' did not resolve to a "
+                f"real file ({len(self.candidates)} candidates: {[str(c) for c in self.candidates]})")
+
+
+@dataclass(frozen=True, slots=True)
+class GlobExpansion(_Event):
+    """The files that a glob in a file(GLOB ...) or file(GLOB_RECURSE ...) command expanded to."""
+
+    level: t.ClassVar[Level] = Level.DEBUG
+    pattern: str
+    directory: Path
+    matches: tuple[str, ...]
+
+    def message(self) -> str:
+        return f"Found the following matches to {self.pattern} in {self.directory}: {list(self.matches)}"
+
+
+@dataclass(frozen=True, slots=True)
+class PackageFailed(_Event):
+    """A package that could not be analyzed at all."""
+
+    level: t.ClassVar[Level] = Level.ERROR
+    path: Path
+    reason: str
+
+    def message(self) -> str:
+        return f"Failed to analyze {self.path}: {self.reason}"
+
+
+@dataclass(frozen=True, slots=True)
+class AnalysisTruncated(_Event):
+    """A package whose analysis was stopped part way through, as it exceeded a limit of its budget."""
+
+    level: t.ClassVar[Level] = Level.WARNING
+    path: Path
+    limit: str
+    value: float
+
+    def message(self) -> str:
+        return f"Stopped analyzing {self.path} after it exceeded {self.limit}={self.value}; the result is partial"
+
+
+class LoguruSink:
+    """Forwards diagnostics to loguru.
+
+    Each event is passed to loguru as the argument of a "{}" message, so it is only formatted if loguru is
+    enabled for this package and has a handler that accepts its level.
+    """
+
+    def handle(self, event: Diagnostic) -> None:
+        # Attributes the message to the code that emitted the event, rather than to the dispatcher
+        logger.opt(depth=2).log(event.level.name, "{}", event)
+
+
+class DiagnosticsCollector:
+    """Keeps every diagnostic that it is given, in the order in which they were emitted."""
+
+    def __init__(self) -> None:
+        self.events: list[Diagnostic] = []
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def handle(self, event: Diagnostic) -> None:
+        self.events.append(event)
+
+    def of_type(self, kind: type[D]) -> list[D]:
+        return [event for event in self.events if isinstance(event, kind)]
+
+    def clear(self) -> None:
+        self.events.clear()
+
+
+# Above any level, so that nothing is enabled
+_SILENT = Level.ERROR + 1
+
+
+class Diagnostics:
+    """Dispatches diagnostics to a set of sinks, dropping any below a minimum level.
+
+    Call sites that would do real work to construct an event, such as copying a list of matches, should first check
+    :meth:`enabled`. In silent mode, or without any sinks, nothing is enabled.
+    """
+
+    def __init__(self, sinks: t.Iterable[DiagnosticSink] = (), level: Level = Level.INFO) -> None:
+        self._sinks = list(sinks)
+        self._level = level
+        self._silent = False
+        self._threshold: int = level
+        self._update()
+
+    def _update(self) -> None:
+        self._threshold = _SILENT if self._silent or not self._sinks else self._level
+
+    @property
+    def level(self) -> Level:
+        return self._level
+
+    @level.setter
+    def level(self, level: Level) -> None:
+        self._level = level
+        self._update()
+
+    @property
+    def sinks(self) -> list[DiagnosticSink]:
+        return list(self._sinks)
+
+    def add_sink(self, sink: DiagnosticSink) -> None:
+        self._sinks.append(sink)
+        self._update()
+
+    def remove_sink(self, sink: DiagnosticSink) -> None:
+        self._sinks.remove(sink)
+        self._update()
+
+    def silence(self, *, silent: bool = True) -> None:
+        """Turns silent mode on or off. In silent mode, every diagnostic is discarded."""
+        self._silent = silent
+        self._update()
+
+    @contextlib.contextmanager
+    def silenced(self) -> t.Iterator[None]:
+        """Discards every diagnostic for the duration of the block."""
+        previous = self._silent
+        self.silence()
+        try:
+            yield
+        finally:
+            self.silence(silent=previous)
+
+    def enabled(self, level: Level) -> bool:
+        return level >= self._threshold
+
+    def emit(self, event: Diagnostic) -> None:
+        if event.level < self._threshold:
+            return
+        for sink in self._sinks:
+            sink.handle(event)
+
+
+diagnostics = Diagnostics([LoguruSink()])
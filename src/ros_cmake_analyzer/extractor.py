@@ -1,18 +1,32 @@
 from __future__ import annotations
 
 import abc
-from charset_normalizer import from_path
+import copy
+import dataclasses
 import re
+import time
 import typing as t
 from pathlib import Path
 
-from loguru import logger
-
-from .cmake_parser.parser import ParserContext
+from . import trace
+from .budget import BudgetExceeded
+from .cmake_parser.parser import ParserContext, _parse_commands
 from .cmake_parser.parser import argparse as cmake_argparse
-from .core.nodelets_xml import NodeletsInfo, NodeletLibrary
 from .core.package import Package
 from .decorator import aliased_cmake_command, TCMakeFunction, CommandHandlerType, cmake_command
+from .diagnostics import (
+    AnalysisTruncated,
+    CommandFailed,
+    DiagnosticsCollector,
+    GlobExpansion,
+    Level,
+    Message,
+    SyntaxErrorSkipped,
+    UnhandledCommand,
+    UnresolvedFile,
+    UnsupportedCommand,
+    diagnostics,
+)
 from .model import (
     CMakeBinaryTarget,
     CMakeInfo,
@@ -23,23 +37,92 @@ from .model import (
 )
 from .utils import has_python_shebang, key_val_list_to_dict
 
+if t.TYPE_CHECKING:
+    from .budget import Budget, BudgetTracker
+    from .cmake_parser.parser import SkippedRegion
+    from .core.nodelets_xml import NodeletLibrary
+    from .diagnostics import Diagnostic
+    from .prelude import PreludeCache, PreludeSnapshot
+    from .stats import AnalysisStats, FileStats
+
 __all__ = ("CMakeExtractor",)
 
+TCommand = tuple[str, list[str], list[tuple[str, str]], tuple[str, int, int]]
+
+
+def _timed_commands(commands: t.Iterator[TCommand], stats: FileStats) -> t.Iterator[TCommand]:
+    """Yields the commands of a file, adding the time taken to produce each of them to its expansion time.
+
+    The time taken to produce the first command includes lexing and parsing the file, which are subtracted once
+    all the commands have been produced.
+    """
+    lex_and_parse = stats.lex_seconds + stats.parse_seconds
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                command = next(commands)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield command
+    finally:
+        stats.expand_seconds += elapsed - (stats.lex_seconds + stats.parse_seconds - lex_and_parse)
+
 
 class CMakeExtractor(metaclass=CommandHandlerType):
-    _files_generated_by_cmake: t.ClassVar[set[str]] = set()
-    _files_not_resolved: t.ClassVar[list[FileInformation]] = []
-    _commands_not_process: t.ClassVar[list[CommandInformation]] = []
 
-    def __init__(self, package_dir: str | Path) -> None:
+    def __init__(
+            self,
+            package_dir: str | Path,
+            *,
+            collect_stats: bool = False,
+            budget: Budget | None = None,
+            resilient: bool = False,
+            preludes: PreludeCache | None = None,
+    ) -> None:
         package_path = Path(package_dir) if isinstance(package_dir, str) else package_dir
         self.package = Package.from_dir(package_path)
+        self._stats: AnalysisStats | None = None
+        if collect_stats:
+            from .stats import AnalysisStats
+            self._stats = AnalysisStats()
+        self.budget = budget
+        # Whether syntax errors are skipped, and recorded as unprocessed commands, rather than failing the package
+        self.resilient = resilient
+        # Snapshots of the preludes of top-level CMakeLists.txt files, which may be shared with other extractors
+        self.preludes = preludes
+        # Started afresh each time the package is processed, by _info_from_cmakelists
+        self._budget_tracker: BudgetTracker | None = None
+        # Results that are shared by the extractors of all subdirectories of the package
+        self._files_generated_by_cmake: set[str] = set()
+        self._files_not_resolved: list[FileInformation] = []
+        self._commands_not_process: list[CommandInformation] = []
+
+    def _for_subdirectory(self) -> t.Self:
+        """Returns an extractor for a subdirectory that reports into the same results as this one."""
+        return copy.copy(self)
 
     def command_for(self, command: str) -> TCMakeFunction | None:
-        for h in type(self).__mro__:
-            if hasattr(h, "_handlers") and command in h._handlers:
-                return h._handlers[command]
-        return None
+        return type(self)._all_handlers.get(command)
+
+    def _count(self, operation: str) -> None:
+        """Records a filesystem operation, if statistics are being collected."""
+        if self._stats is not None:
+            self._stats.count(operation)
+
+    def _glob_results(self, matches: t.Iterable[Path]) -> t.Iterable[Path]:
+        """Counts the matches of a glob against the budget, if there is one."""
+        if self._budget_tracker is not None:
+            return self._budget_tracker.glob(matches)
+        return matches
+
+    def _record_read(self, path: Path) -> None:
+        if self._stats is not None:
+            self._stats.count("read")
+            self._stats.file(str(path)).bytes_read += path.stat().st_size
 
     @abc.abstractmethod
     def package_paths(self) -> set[Path]:
@@ -54,9 +137,16 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         ...
 
     def _hook_libraries_into_executables(self, info: CMakeInfo) -> None:
+        # Targets are immutable, so each target that links libraries is replaced under every key that refers to it
+        replacements: dict[int, CMakeTarget] = {}
         for name, target in info.targets.items():
-            if name in self.libraries_for:
-                target.libraries.extend(self.libraries_for[name] if self.libraries_for[name] is not None else [])
+            libraries = self.libraries_for.get(name)
+            if libraries:
+                current = replacements.get(id(target), target)
+                replacements[id(target)] = dataclasses.replace(current, libraries=(*current.libraries, *libraries))
+        for name, target in list(info.targets.items()):
+            if id(target) in replacements:
+                info.targets[name] = replacements[id(target)]
 
     def get_nodelet_entrypoints(self) -> t.Mapping[str, NodeletLibrary]:
         """Returns the potential nodelet entrypoints and classname for the package.
@@ -72,24 +162,17 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             A mapping of nodelet names to NodeletInfo
 
         """
+        from .core.nodelets_xml import NodeletsInfo
+        from .core.plugin_xml import plugin_description_files
         nodelets_xml_path = self.package.path / "nodelet_plugins.xml"
         if not nodelets_xml_path.exists():
             # Read from package
-            for export in self.package.exports:
-                logger.debug("Looking for export in package.xml")
-                if export.tagname == "nodelet" and "plugin" in export.attributes:
-                    plugin = export.attributes["plugin"]
-                    plugin = plugin.replace("${prefix}", "")
-                    nodelets_xml_path = self.package.path / plugin
-                    if nodelets_xml_path.exists():
-                        logger.debug(f"Reading plugin information from {nodelets_xml_path!s}")
-                        break
+            for base_class_package, path in plugin_description_files(self.package):
+                if base_class_package == "nodelet" and path.exists():
+                    nodelets_xml_path = path
+                    break
         if nodelets_xml_path.exists():
-            logger.debug(f"Reading plugin information from {nodelets_xml_path}")
-            with nodelets_xml_path.open("r") as f:
-                contents = f.read()
-            logger.debug(f"Contents of that file: {contents}")
-            nodelet_info = NodeletsInfo.from_nodelet_xml(contents)
+            nodelet_info = NodeletsInfo.from_file(nodelets_xml_path)
             # If the name is of the form package/nodelet then just return it keyed by nodelete
             # otherwise key by the full name
             entrypoints = {info.name.split("/")[1]: info for info in nodelet_info.libraries if "/" in info.name}
@@ -101,9 +184,16 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         path = self.package.path / "CMakeLists.txt"
         # with path.open(encoding="utf_8") as f:
         #     contents = "".join(f.readlines())
+        from charset_normalizer import from_path  # Imported on first use, as it is slow to import
         contents = str(from_path(path).best())
+        self._record_read(path)
         env: dict[str, str] = {"cmakelists": str(path)}
-        return self._process_cmake_contents(contents, env)
+        self._budget_tracker = self.budget.tracker() if self.budget is not None else None
+        info = self._process_cmake_contents(contents, env)
+        if info.truncated and self._budget_tracker is not None and self._budget_tracker.exceeded is not None:
+            diagnostics.emit(AnalysisTruncated(self.package.path, self._budget_tracker.exceeded.limit,
+                                               self._budget_tracker.exceeded.value))
+        return info
 
     def _cmake_argparse(self, args, opts):   # noqa: ANN202, ANN001
         return cmake_argparse(args, opts)
@@ -134,46 +224,188 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             Information about the targets in CMakeLists.txt
 
         """
-        pc = ParserContext(parent)
+        with trace.span(Path(cmake_env["cmakelists"]).name, "cmake", {"path": cmake_env["cmakelists"]}):
+            return self._process_cmake_commands(file_contents, cmake_env, parent)
+
+    def _process_cmake_commands(
+            self,
+            file_contents: str,
+            cmake_env: dict[str, str],
+            parent: ParserContext | None,
+    ) -> CMakeInfo:
+        pc = ParserContext(parent, self._budget_tracker)
         self.parser_context = pc
-        context = pc.parse(file_contents, skip_callable=False, var=cmake_env)
+        stats = self._stats
+        syntax_errors: list[SkippedRegion] | None = [] if self.resilient else None
+        file_stats = stats.file(cmake_env["cmakelists"]) if stats is not None else None
         self.executables: dict[str, CMakeTarget] = {}
         self.libraries: dict[str, CMakeTarget] = {}
         self.libraries_for: dict[str, list[str]] = {}
         self.plugin_references: list[CMakePluginReference] = []
+        truncated = False
+        try:
+            if parent is None and self.preludes is not None:
+                self._process_with_prelude(pc, file_contents, cmake_env, file_stats, syntax_errors)
+            else:
+                self._dispatch_commands(pc.parse(file_contents, skip_callable=False, var=cmake_env, stats=file_stats,
+                                                 errors=syntax_errors),
+                                        cmake_env, file_stats)
+        except BudgetExceeded:
+            # What has been gathered so far is kept, and the files that include this one stop processing in turn
+            truncated = True
+        if syntax_errors:
+            self._record_syntax_errors(syntax_errors, Path(cmake_env["cmakelists"]))
+        return CMakeInfo(Path(cmake_env["cmakelists"]), self.executables,
+                         plugin_references=tuple(self.plugin_references),
+                         generated_sources=self._files_generated_by_cmake,
+                         unprocessed_commands=self._commands_not_process,
+                         unresolved_files=self._files_not_resolved,
+                         stats=stats,
+                         truncated=truncated)
+
+    def _dispatch_commands(
+            self,
+            context: t.Iterator[TCommand],
+            cmake_env: dict[str, t.Any],
+            file_stats: FileStats | None,
+    ) -> None:
+        stats = self._stats
+        if file_stats is not None:
+            context = _timed_commands(context, file_stats)
         for cmd, raw_args, _arg_tokens, (_fname, line, _column) in context:
             cmake_env["cmakelists_line"] = line
             try:
                 cmd = cmd.lower()    # noqa: PLW2901
-                command = self.command_for(cmd)
-                if command:
-                    command(self, cmake_env, raw_args)
-                else:
-                    self._commands_not_process.append(CommandInformation(cmd,
-                                                                         raw_args,
-                                                                         "Command not handled",
-                                                                         Path(cmake_env["cmakelists"]),
-                                                                         int(line)))
+                if not type(self).dispatch(self, cmd, cmake_env, raw_args, stats):
+                    unhandled = CommandInformation(cmd,
+                                                   raw_args,
+                                                   "Command not handled",
+                                                   Path(cmake_env["cmakelists"]),
+                                                   int(line))
+                    self._commands_not_process.append(unhandled)
+                    if diagnostics.enabled(UnhandledCommand.level):
+                        diagnostics.emit(UnhandledCommand(unhandled))
+            except BudgetExceeded:
+                raise
             except BaseException as e:  # noqa:BLE001  Don't want to crash, just want to report
-                logger.error(f"Error processing {cmd}({raw_args}) in "
-                             f"{cmake_env['cmakelists'] if 'cmakelists' in cmake_env else 'unknown'}:{line}")
                 # print(traceback.format_exc())
-                self._commands_not_process.append(CommandInformation(cmd,
-                                                                     raw_args,
-                                                                     str(e),
-                                                                     Path(cmake_env["cmakelists"]),
-                                                                     int(line)))
-        return CMakeInfo(Path(cmake_env["cmakelists"]), self.executables,
-                         plugin_references=tuple(self.plugin_references),
-                         generated_sources=self._files_generated_by_cmake,
-                         unprocessed_commands=self._commands_not_process,
-                         unresolved_files=self._files_not_resolved)
+                failed = CommandInformation(cmd,
+                                            raw_args,
+                                            str(e),
+                                            Path(cmake_env["cmakelists"]),
+                                            int(line))
+                self._commands_not_process.append(failed)
+                diagnostics.emit(CommandFailed(failed))
+
+    def _process_with_prelude(
+            self,
+            pc: ParserContext,
+            file_contents: str,
+            cmake_env: dict[str, t.Any],
+            file_stats: FileStats | None,
+            syntax_errors: list[SkippedRegion] | None,
+    ) -> None:
+        """Processes a top-level CMakeLists.txt file, starting from the snapshot of its prelude if there is one."""
+        preludes = t.cast("PreludeCache", self.preludes)
+        found = preludes.find(type(self), file_contents)
+        if found is not None:
+            snapshot, rest = found
+            self._restore_prelude(snapshot, pc, cmake_env)
+            self._dispatch_commands(pc.parse(rest, skip_callable=False, var=cmake_env, stats=file_stats,
+                                             errors=syntax_errors),
+                                    cmake_env, file_stats)
+            return
+        line_starts: list[int] = []
+        commands = _parse_commands(file_contents, "<inline>", file_stats, syntax_errors, line_starts)
+        split = preludes.split(type(self), file_contents, commands, line_starts, syntax_errors)
+        if split is None:
+            self._dispatch_commands(pc.execute(commands, var=cmake_env), cmake_env, file_stats)
+            return
+        key, length, count = split
+        unprocessed = len(self._commands_not_process)
+        collector = DiagnosticsCollector()
+        diagnostics.add_sink(collector)
+        try:
+            self._dispatch_commands(pc.execute(commands[:count], var=cmake_env), cmake_env, file_stats)
+        finally:
+            diagnostics.remove_sink(collector)
+        preludes.store(key, file_contents[:length], commands[count].line - 1,
+                       self._snapshot_prelude(pc, cmake_env, unprocessed, collector.events))
+        self._dispatch_commands(pc.execute(commands[count:], var=cmake_env), cmake_env, file_stats)
+
+    def _snapshot_prelude(
+            self,
+            pc: ParserContext,
+            cmake_env: dict[str, t.Any],
+            unprocessed: int,
+            events: list[Diagnostic],
+    ) -> PreludeSnapshot | None:
+        """Returns the state that the prelude of the top-level CMakeLists.txt file has left behind.
+
+        Returns None if that state depends on this package.
+        """
+        from .prelude import PreludeSnapshot
+        if (self.executables or self.libraries or self.libraries_for or self.plugin_references
+                or self._files_generated_by_cmake or self._files_not_resolved):
+            return None
+        package = str(self.package.path)
+        cmake_file = Path(cmake_env["cmakelists"])
+        commands = self._commands_not_process[unprocessed:]
+        variables = {name: value for name, value in cmake_env.items() if name != "cmakelists"}
+        if (any(command.cmake_file != cmake_file or package in str(command.args) for command in commands)
+                or any(package in str(value) for value in variables.values())):
+            return None
+        replayed: list[tuple[Diagnostic, int | None]] = []
+        for event in events:
+            command = getattr(event, "command", None)
+            if isinstance(command, CommandInformation):
+                index = next((i for i, other in enumerate(commands) if other is command), None)
+                if index is None:
+                    return None
+                replayed.append((event, index))
+            elif isinstance(event, Message | UnsupportedCommand) and package not in str(event):
+                replayed.append((event, None))
+            else:
+                return None
+        return PreludeSnapshot(
+            {name: list(value) if isinstance(value, list) else value for name, value in variables.items()},
+            dict(pc.callable),
+            tuple((command.command, tuple(command.args), command.reason, command.cmake_line_no)
+                  for command in commands),
+            tuple(replayed),
+        )
+
+    def _restore_prelude(self, snapshot: PreludeSnapshot, pc: ParserContext, cmake_env: dict[str, t.Any]) -> None:
+        # Lists are appended to in place by list(APPEND), so each package gets its own copies
+        cmake_env.update({name: list(value) if isinstance(value, list) else value
+                          for name, value in snapshot.variables.items()})
+        pc.callable.update(snapshot.callables)
+        cmake_file = Path(cmake_env["cmakelists"])
+        restored = [CommandInformation(command, list(args), reason, cmake_file, line)
+                    for command, args, reason, line in snapshot.commands]
+        self._commands_not_process.extend(restored)
+        for event, index in snapshot.events:
+            diagnostics.emit(event if index is None else dataclasses.replace(event, command=restored[index]))
+
+    def _record_syntax_errors(self, regions: list[SkippedRegion], cmake_file: Path) -> None:
+        for region in regions:
+            if region.end_line > region.line:
+                lines = f"lines {region.line}-{region.end_line}"
+            else:
+                lines = f"line {region.line}"
+            skipped = CommandInformation(region.command or "",
+                                         region.args,
+                                         f"{region.message}; skipped {lines}",
+                                         cmake_file,
+                                         region.line)
+            self._commands_not_process.append(skipped)
+            diagnostics.emit(SyntaxErrorSkipped(skipped))
 
     @cmake_command
     def project(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
         opts, args = self._cmake_argparse(raw_args, {})
         cmake_env["PROJECT_NAME"] = args[0]
-        logger.info(f"Setting PROJECT_NAME={args[0]}")
+        diagnostics.emit(Message(Level.INFO, "Setting PROJECT_NAME={}", (args[0],)))
 
     @cmake_command
     def set_target_properties(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
@@ -185,13 +417,13 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             if var_match:
                 args[0] = var_match.group(1) + cmake_env[var_match.group(2)] + var_match.group(3)
             if args[0] in self.executables:
-                object.__setattr__(self.executables[args[0]], "name", properties["OUTPUT_NAME"])
-                logger.info(f"Changed the name of the executable to {properties['OUTPUT_NAME']}")
-                # self.executables[args[0]].name = properties["OUTPUT_NAME"]
-                # self.executables[properties["OUTPUT_NAME"]] = self.executables[args[0]]
-                # del self.executables[args[0]]
+                # Targets are immutable, so the renamed target replaces the original under the same key
+                self.executables[args[0]] = dataclasses.replace(self.executables[args[0]],
+                                                                name=properties["OUTPUT_NAME"])
+                diagnostics.emit(Message(Level.INFO, "Changed the name of the executable to {}",
+                                         (properties["OUTPUT_NAME"],)))
             else:
-                logger.error(f"{args[0]} is not in the list of targets")
+                diagnostics.emit(Message(Level.ERROR, "{} is not in the list of targets", (args[0],)))
 
     @cmake_command
     def set(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
@@ -219,6 +451,7 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         var_name = raw_args[1]
         dir_name = Path(raw_args[0])
         path = self.package.path / cmake_env["cwd"] / dir_name if "cwd" in cmake_env else self.package.path / dir_name
+        self._count("glob")
         values = ";".join(str(dir_name / f) for f in path.glob("*"))
         cmake_env[var_name] = values
 
@@ -228,10 +461,9 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             cmake_env: dict[str, t.Any],
             raw_args: list[str],
     ) -> None:
-        logger.info(f"Processing list directive: {raw_args}")
         opts, args = self._cmake_argparse(raw_args, {"APPEND": "-"})
         if not opts["APPEND"]:
-            logger.warning(f"Cannot process list({args[0]} ...)")
+            diagnostics.emit(UnsupportedCommand("list", tuple(raw_args), "only APPEND is supported"))
             return
         append_to = cmake_env.setdefault(args[0], [])
         if isinstance(append_to, str):
@@ -243,7 +475,8 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         elif isinstance(append_to, list) and len(args) > 1:
             append_to.append(args[1])
         else:
-            logger.error(f"Don't know how to append_to append append_to type: {type(append_to)}")
+            diagnostics.emit(Message(Level.ERROR, "Don't know how to append to a value of type {}",
+                                     (type(append_to),)))
 
     @cmake_command
     def file(
@@ -251,7 +484,6 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             cmake_env: dict[str, t.Any],
             raw_args: list[str],
     ) -> None:
-        logger.debug(f"Processing file directive: {raw_args}")
         opts, args = self._cmake_argparse(raw_args, {"FOLLOW_SYMLINKS": "-",
                                                "LIST_DIRECTORIES": "?",
                                                "RELATIVE": "?",
@@ -259,22 +491,24 @@ class CMakeExtractor(metaclass=CommandHandlerType):
                                                "GLOB": "-",
                                                })
         if not opts["GLOB_RECURSE"] and not opts["GLOB"]:
-            logger.warning(f"Cannot process file({args[0]} ...")
+            diagnostics.emit(UnsupportedCommand("file", tuple(raw_args), "only GLOB and GLOB_RECURSE are supported"))
             return
         path = self.package.path / cmake_env["cwd"] if "cwd" in cmake_env else self.package.path
         matches = []
         for arg in args[1:]:
-            finds = [self._trim_and_unquote(str(f)) for f in path.rglob(arg)]
+            self._count("rglob")
+            finds = [self._trim_and_unquote(str(f)) for f in self._glob_results(path.rglob(arg))]
             if len(finds) == 0:
-                finds = [self._trim_and_unquote(str(f)) for f in self.package.path.rglob(arg)]
-            logger.debug(f"Found the following matches to {arg} in {path}: {finds}")
+                self._count("rglob")
+                finds = [self._trim_and_unquote(str(f)) for f in self._glob_results(self.package.path.rglob(arg))]
+            if diagnostics.enabled(GlobExpansion.level):
+                diagnostics.emit(GlobExpansion(arg, path, tuple(finds)))
             matches.extend(finds)
         if opts["RELATIVE"]:
             # convert path to be relative
             relative = self.package.path / opts["RELATIVE"]
             matches = [str(Path(m).relative_to(relative)) for m in matches]
         cmake_env[args[0]] = ";".join(matches)
-        logger.debug(f"Set {args[0]} to {cmake_env[args[0]]}")
 
     @cmake_command
     def get_filename_component(
@@ -331,14 +565,18 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         new_env["CMAKE_CURRENT_SOURCE_DIR"] = new_env["cwd"]
         cmakelists_path = self.package.path / new_env["cwd"] / "CMakeLists.txt"
         new_env["cmakelists"] = str(cmakelists_path)
-        logger.info(f"Processing {cmakelists_path!s}")
-        with cmakelists_path.open() as f:
-            contents = f.read()
-        sub_cmake = self.__class__(self.package.path)
-        included_pacakge_instances = sub_cmake._process_cmake_contents(contents, new_env, self.parser_context)
+        diagnostics.emit(Message(Level.INFO, "Processing {}", (cmakelists_path,)))
+        with trace.span(f"add_subdirectory({args[0]})", "subdirectory", {"path": new_env["cwd"]}):
+            with cmakelists_path.open() as f:
+                contents = f.read()
+            self._record_read(cmakelists_path)
+            sub_cmake = self._for_subdirectory()
+            included_pacakge_instances = sub_cmake._process_cmake_contents(contents, new_env, self.parser_context)
         self.libraries_for.update(sub_cmake.libraries_for)
         self.executables.update(
             **{s: included_pacakge_instances.targets[s] for s in included_pacakge_instances.targets})
+        if included_pacakge_instances.truncated and self._budget_tracker is not None:
+            self._budget_tracker.check()
 
     @aliased_cmake_command("add_executable", "cuda_add_executable", "add_node")
     def add_executable(
@@ -361,14 +599,11 @@ class CMakeExtractor(metaclass=CommandHandlerType):
                 real_src = self._resolve_to_real_file(source, self.package.path, cmake_env)
                 if real_src:
                     sources.add(real_src)
-                else:
-                    logger.warning(f"'{source} did not resolve to a real file.")
-        logger.debug(f"Adding C++ sources for {name}")
         self.executables[name] = CMakeBinaryTarget(
             name=name,
             language=SourceLanguage.CXX,
             sources=sources,
-            includes=cmake_env["INCLUDE_DIRECTORIES"].split(" ") if "INCLUDE_DIRECTORIES" in cmake_env else [],
+            includes=self._include_directories(cmake_env),
             libraries=[],
             restrict_to_paths=self.package_paths(),
             cmakelists_file=cmake_env["cmakelists"],
@@ -379,7 +614,7 @@ class CMakeExtractor(metaclass=CommandHandlerType):
     def target_link_libraries(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
         opts, args = self._cmake_argparse(raw_args, {})
         if len(args) < 2:
-            logger.warning(f"target_link_libraries({raw_args}) has too few arguments")
+            diagnostics.emit(UnsupportedCommand("target_link_libraries", tuple(raw_args), "too few arguments"))
             return
         executable = args[0]
         libraries = args[1:]
@@ -400,7 +635,8 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         paths_to_include = [dir_ for dir_ in args if not Path(dir_).is_absolute()]
         if len(paths_to_include) > 0:
             if opts["AFTER"] or opts["BEFORE"] or opts["SYSTEM"]:
-                logger.warning("include_directors AFTER, BEFORE, SYSTEM not supported")
+                diagnostics.emit(UnsupportedCommand("include_directories", tuple(raw_args),
+                                                    "AFTER, BEFORE and SYSTEM are not supported"))
             if "INCLUDE_DIRECTORIES" not in cmake_env:
                 cmake_env["INCLUDE_DIRECTORIES"] = ""
             cmake_env["INCLUDE_DIRECTORIES"] = " ".join(
@@ -443,14 +679,11 @@ class CMakeExtractor(metaclass=CommandHandlerType):
                 real_src = self._resolve_to_real_file(source, self.package.path, cmake_env)
                 if real_src:
                     sources.add(real_src)
-                else:
-                    logger.warning(f"'{source} did not resolve to a real file.")
-        logger.debug(f"Adding C++ library {name}")
         self.executables[name] = IncompleteCMakeLibraryTarget(
             name,
             SourceLanguage.CXX,
             sources,
-            cmake_env["INCLUDE_DIRECTORIES"].split(" ") if "INCLUDE_DIRECTORIES" in cmake_env else [],
+            self._include_directories(cmake_env),
             self.package_paths(),
             cmakelists_file=cmake_env["cmakelists"],
             cmakelists_line=cmake_env["cmakelists_line"],
@@ -479,7 +712,10 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             self._files_generated_by_cmake.union(args)
         else:
             # We warn because we ignore generated files
-            logger.warning(f"'{cmake_env['cmakelists']}' has no target for 'configure_fle({rawargs})")
+            diagnostics.emit(UnsupportedCommand("configure_file", tuple(rawargs), "there is no output file"))
+
+    def _include_directories(self, cmake_env: dict[str, t.Any]) -> list[str]:
+        return [dir_ for dir_ in cmake_env.get("INCLUDE_DIRECTORIES", "").split(" ") if dir_]
 
     def _trim_and_unquote(self, s: str) -> str:
         s = s.strip()
@@ -500,24 +736,24 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         real_filename = Path(filename)
         if "cwd" in cmake_env:
             real_filename = Path(cmake_env["cwd"]) / filename
+        self._count("is_file")
         if not (package / real_filename).is_file():
             parent = real_filename.parent
             try:
+                self._count("glob")
                 all_files = (package / parent).glob("*")
                 matching_files = [f for f in all_files if str(f).startswith(str(real_filename.name))]
                 if len(matching_files) != 1:
-                    logger.error(f"Only one file should match '{real_filename!s}'. "
-                                 f"Currently {len(matching_files)} files do: {matching_files}")
-                    self._files_not_resolved.append(FileInformation(filename=filename,
-                                                                    cmake_file=Path(cmake_env["cmakelists"]),
-                                                                    cmake_line_no=int(cmake_env["cmakelists_line"])))
+                    unresolved = FileInformation(filename=filename,
+                                                 cmake_file=Path(cmake_env["cmakelists"]),
+                                                 cmake_line_no=int(cmake_env["cmakelists_line"]))
+                    self._files_not_resolved.append(unresolved)
+                    diagnostics.emit(UnresolvedFile(unresolved, tuple(matching_files)))
                     return None
                 real_filename = parent / matching_files[0]
-            except Exception:
-                logger.error(
-                    f"Error finding real file matching {real_filename} "
-                    f"in {package / parent!s}")
-                logger.error(cmake_env)
+            except Exception as e:
+                # The command that is being processed is reported as having failed
+                e.add_note(f"while finding a real file matching {real_filename} in {package / parent!s}")
                 raise
         return real_filename
 
@@ -527,7 +763,7 @@ class CMakeExtractor(metaclass=CommandHandlerType):
         _opts, args = self._cmake_argparse(raw_args, {})
         self.plugin_references.append(CMakePluginReference(
             base_class_package=args[0],
-            plugin_xml=args[1],
+            plugin_xml=Path(args[1]),
             cmakelists_file=cmake_env["cmakelists"],
             cmakelists_line=int(cmake_env["cmakelists_line"])
         ))
@@ -554,17 +790,15 @@ class CMakeExtractor(metaclass=CommandHandlerType):
             if check_python:
                 if program_path.suffix == ".py":
                     is_python = True
-                elif has_python_shebang(Path(cmake_env['cmakelists']).parent / program_path):
-                    is_python = True
                 else:
-                    is_python = False
+                    self._count("has_python_shebang")
+                    is_python = has_python_shebang(Path(cmake_env['cmakelists']).parent / program_path)
             if not is_python:
                 continue
             name = rename if rename else program_path.name
             sources: set[Path] = set()
             if source := self._resolve_to_real_file(program, self.package.path, cmake_env):
                 sources.add(source)
-            logger.debug(f"Adding Python sources for {name}")
             self.executables[name] = CMakeBinaryTarget(
                 name=name,
                 language=SourceLanguage.PYTHON,
@@ -0,0 +1,143 @@
+"""A reverse index from source files to the targets that compile them.
+
+The index is a :class:`ros_cmake_analyzer.batch.ResultSink`, so it can be built while a workspace is analyzed::
+
+    index = SourceIndex()
+    BatchAnalyzer("ros1", sinks=[index]).run(find_packages(workspace))
+    for target in index.targets_for(workspace / "my_pkg" / "src" / "foo.cpp"):
+        ...
+"""
+from __future__ import annotations
+
+__all__ = ("SourceIndex", "TargetRef")
+
+import bisect
+import os
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+from .paths import PathTable
+
+if t.TYPE_CHECKING:
+    from .core.package import Package
+    from .model import CMakeInfo, CMakeTarget
+
+
+@dataclass(frozen=True, slots=True)
+class TargetRef:
+    """Identifies a target in the result of analyzing a package.
+
+    Attributes
+    ----------
+    package: str
+        The name of the package that defines the target
+    package_path: Path
+        The absolute path of the directory of the package
+    key: str
+        The key of the target in CMakeInfo.targets
+    target: CMakeTarget
+        The target itself
+
+    """
+
+    package: str
+    package_path: Path
+    key: str
+    target: CMakeTarget
+
+
+class SourceIndex:
+    """Maps the absolute paths of source files to the targets that compile them.
+
+    Source paths are interned in a :class:`PathTable`, and each target is given an integer id, so that the index
+    is a mapping of integers to sets of integers. Looking up a single file is a dictionary lookup. Prefix and
+    directory queries use a sorted list of the indexed paths that is rebuilt lazily after the index changes.
+
+    Adding a package that is already in the index replaces its previous entries.
+    """
+
+    def __init__(self, paths: PathTable | None = None) -> None:
+        self.paths = paths if paths is not None else PathTable()
+        self._targets: list[TargetRef | None] = []
+        self._free_target_ids: list[int] = []
+        self._targets_by_path: dict[int, set[int]] = {}
+        self._paths_by_target: dict[int, tuple[int, ...]] = {}
+        self._targets_by_package: dict[Path, list[int]] = {}
+        self._sorted_paths: list[str] | None = None
+
+    def __len__(self) -> int:
+        """Returns the number of targets in the index."""
+        return len(self._targets) - len(self._free_target_ids)
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        package_path = package.path.resolve()
+        self.remove(package_path)
+        target_ids: list[int] = []
+        for key, target in info.targets.items():
+            ref = TargetRef(package.name, package_path, key, target)
+            if self._free_target_ids:
+                target_id = self._free_target_ids.pop()
+                self._targets[target_id] = ref
+            else:
+                target_id = len(self._targets)
+                self._targets.append(ref)
+            path_ids = tuple({self.paths.intern(package_path / source) for source in target.sources})
+            for path_id in path_ids:
+                owners = self._targets_by_path.get(path_id)
+                if owners is None:
+                    self._targets_by_path[path_id] = {target_id}
+                    self._sorted_paths = None
+                else:
+                    owners.add(target_id)
+            self._paths_by_target[target_id] = path_ids
+            target_ids.append(target_id)
+        self._targets_by_package[package_path] = target_ids
+
+    def remove(self, package_path: str | os.PathLike[str]) -> None:
+        """Removes all the targets of a package from the index."""
+        target_ids = self._targets_by_package.pop(Path(package_path).resolve(), None)
+        if target_ids is None:
+            return
+        for target_id in target_ids:
+            for path_id in self._paths_by_target.pop(target_id):
+                owners = self._targets_by_path[path_id]
+                owners.discard(target_id)
+                if not owners:
+                    del self._targets_by_path[path_id]
+                    self._sorted_paths = None
+            self._targets[target_id] = None
+            self._free_target_ids.append(target_id)
+
+    def packages(self) -> list[Path]:
+        return list(self._targets_by_package)
+
+    def _refs(self, target_ids: t.Iterable[int]) -> list[TargetRef]:
+        return [t.cast(TargetRef, self._targets[target_id]) for target_id in sorted(target_ids)]
+
+    def targets_for(self, source: str | os.PathLike[str]) -> list[TargetRef]:
+        """Returns the targets that compile a source file, given its absolute path."""
+        path_id = self.paths.get(source)
+        if path_id is None:
+            return []
+        return self._refs(self._targets_by_path.get(path_id, ()))
+
+    def _paths_with_prefix(self, prefix: str) -> list[str]:
+        if self._sorted_paths is None:
+            self._sorted_paths = sorted(str(self.paths.path(path_id)) for path_id in self._targets_by_path)
+        start = bisect.bisect_left(self._sorted_paths, prefix)
+        end = start
+        while end < len(self._sorted_paths) and self._sorted_paths[end].startswith(prefix):
+            end += 1
+        return self._sorted_paths[start:end]
+
+    def targets_with_prefix(self, prefix: str) -> list[TargetRef]:
+        """Returns the targets that compile any source file whose path starts with a given string."""
+        target_ids: set[int] = set()
+        for path in self._paths_with_prefix(prefix):
+            target_ids.update(self._targets_by_path[t.cast(int, self.paths.get(path))])
+        return self._refs(target_ids)
+
+    def targets_under(self, directory: str | os.PathLike[str]) -> list[TargetRef]:
+        """Returns the targets that compile any source file inside a given directory or its subdirectories."""
+        return self.targets_with_prefix(os.path.join(PathTable.key(directory), ""))
@@ -0,0 +1,36 @@
+"""Provides the logger used throughout the package, without importing loguru until something is logged.
+
+Importing loguru costs more than the rest of the package put together, so modules log through the :data:`logger`
+proxy defined here instead. On first use, the proxy imports loguru and disables logging from this package, as
+libraries using loguru should, unless the application has already enabled or disabled it explicitly.
+"""
+from __future__ import annotations
+
+__all__ = ("logger",)
+
+import typing as t
+
+if t.TYPE_CHECKING:
+    import loguru
+
+_PACKAGE = "ros_cmake_analyzer"
+
+
+class _LazyLogger:
+    """Forwards every attribute to the loguru logger, which is imported the first time that one is accessed."""
+
+    def _load(self) -> loguru.Logger:
+        from loguru import logger
+        configured = any(name.startswith(f"{_PACKAGE}.") for name, _ in logger._core.activation_list)  # type: ignore
+        if not configured:
+            logger.disable(_PACKAGE)
+        return logger
+
+    def __getattr__(self, name: str) -> t.Any:  # noqa: ANN401
+        value = getattr(self._load(), name)
+        # Later lookups of the same attribute bypass __getattr__ entirely
+        setattr(self, name, value)
+        return value
+
+
+logger: loguru.Logger = t.cast("loguru.Logger", _LazyLogger())
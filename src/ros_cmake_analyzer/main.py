@@ -1,9 +1,6 @@
 import sys
 from argparse import ArgumentParser
 
-from loguru import logger
-from ros1 import ROS1CMakeExtractor
-
 
 def main(arguments: list[str]) -> None:
     parser = ArgumentParser()
@@ -12,12 +9,14 @@ def main(arguments: list[str]) -> None:
     parser.add_argument("dir", type=str, help="The directory to get the cmake")
     args = parser.parse_args(arguments)
 
+    # The extractors are only imported once the arguments are known to be valid, so that --help is quick
     if args.ros == "ros1":
-        cmake = ROS1CMakeExtractor(args.dir)
+        from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor as Extractor
     else:
-        raise ValueError("ROS2 is not supported yet")
+        from ros_cmake_analyzer.ros2 import ROS2CMakeExtractor as Extractor
+    from ros_cmake_analyzer.log import logger
 
-    info = cmake.get_cmake_info()
+    info = Extractor(args.dir).get_cmake_info()
     for target in info.targets:
         logger.info(f"Target '{target}' has sources: {info.targets[target]}")
     logger.info("Done")
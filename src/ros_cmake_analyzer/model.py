@@ -3,9 +3,12 @@ from __future__ import annotations
 import enum
 import typing as t
 from dataclasses import dataclass, field
+from pathlib import Path
+
+from .paths import PathSequence, PathSet
 
 if t.TYPE_CHECKING:
-    from pathlib import Path
+    from .stats import AnalysisStats
 
 DUMMY_VALUE = "__dummy_property_value__"  # A dummy value used as a stand in for properties we don't need
 
@@ -15,14 +18,25 @@ class SourceLanguage(enum.Enum):
     PYTHON = "python"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FileInformation:
     filename: str
     cmake_file: Path
     cmake_line_no: int
 
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "filename": self.filename,
+            "cmake_file": str(self.cmake_file),
+            "cmake_line_no": self.cmake_line_no,
+        }
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> FileInformation:
+        return FileInformation(info["filename"], Path(info["cmake_file"]), info["cmake_line_no"])
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CommandInformation:
     command: str
     args: list[str]
@@ -30,76 +44,127 @@ class CommandInformation:
     cmake_file: Path
     cmake_line_no: int
 
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "command": self.command,
+            "args": list(self.args),
+            "reason": self.reason,
+            "cmake_file": str(self.cmake_file),
+            "cmake_line_no": self.cmake_line_no,
+        }
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> CommandInformation:
+        return CommandInformation(info["command"],
+                                  list(info["args"]),
+                                  info["reason"],
+                                  Path(info["cmake_file"]),
+                                  info["cmake_line_no"])
+
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CMakeTarget:
+    """A target that is built from a set of sources.
+
+    Targets are immutable and hashable. Paths are interned in the session :class:`PathTable`, so the many targets
+    that refer to the same files share a single copy of each path: `sources` and `restrict_to_paths` are stored
+    as :class:`PathSet` and `includes` as a :class:`PathSequence`, all of which can be used as ordinary collections
+    of paths. Any collection of paths that is passed to the constructor is converted.
+    """
+
+    kind: t.ClassVar[str] = "target"
+
     name: str
     language: SourceLanguage
-    sources: set[Path]
-    includes: list[Path]
-    restrict_to_paths: set[Path]
+    sources: PathSet
+    includes: PathSequence
+    restrict_to_paths: PathSet
     cmakelists_file: str
     cmakelists_line: int
-    libraries: list[str] = field(default_factory=list)
+    libraries: tuple[str, ...] = ()
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "sources", PathSet.of(self.sources))
+        object.__setattr__(self, "includes", PathSequence.of(self.includes))
+        object.__setattr__(self, "restrict_to_paths", PathSet.of(self.restrict_to_paths))
+        if not isinstance(self.libraries, tuple):
+            object.__setattr__(self, "libraries", tuple(self.libraries))
 
     def to_dict(self) -> dict[str, t.Any]:
         return {
+            "kind": self.kind,
             "name": self.name,
             "language": self.language.value,
-            "sources": list(self.sources),
-            "includes": self.includes,
-            "path_restrictions": list(self.restrict_to_paths),
+            # Sets of paths are listed in order, as the order of their ids depends on when the paths were interned
+            "sources": sorted(str(source) for source in self.sources),
+            "includes": [str(include) for include in self.includes],
+            "path_restrictions": sorted(str(path) for path in self.restrict_to_paths),
             "cmakelists_file": self.cmakelists_file,
             "cmakelists_line": self.cmakelists_line,
+            "libraries": list(self.libraries),
         }
 
     @classmethod
     def from_dict(cls, info: dict[str, t.Any]) -> CMakeTarget:
-        return CMakeTarget(
-            info["name"],
-            SourceLanguage(info["language"]),
-            set(info["sources"]),
-            list(info["includes"]),
-            set(info["path_restrictions"]),
-            info["cmakelists_file"],
-            info["cmakelists_line"],
-        )
+        """Creates a target from its dictionary form.
+
+        The class of the target is determined by its "kind", so that CMakeTarget.from_dict can read any target.
+        """
+        target_class = TARGET_CLASSES[info["kind"]] if "kind" in info else cls
+        args: dict[str, t.Any] = {
+            "name": info["name"],
+            "language": SourceLanguage(info["language"]),
+            "sources": info["sources"],
+            "includes": info["includes"],
+            "restrict_to_paths": info["path_restrictions"],
+            "cmakelists_file": info["cmakelists_file"],
+            "cmakelists_line": info["cmakelists_line"],
+            "libraries": tuple(info.get("libraries", ())),
+        }
+        if issubclass(target_class, CMakeBinaryTarget):
+            args["_entrypoint"] = info.get("entrypoint")
+        return target_class(**args)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CMakeBinaryTarget(CMakeTarget):
+    kind: t.ClassVar[str] = "binary"
+
     _entrypoint: str | None = None
 
-    @property
-    def entrypoint(self) -> str | None:
+    def __post_init__(self) -> None:
+        CMakeTarget.__post_init__(self)
+        # An entrypoint that is the same as the default is not stored, so that equal targets compare equal
+        if self._entrypoint is not None and self._entrypoint == self._default_entrypoint():
+            object.__setattr__(self, "_entrypoint", None)
+
+    def _default_entrypoint(self) -> str | None:
         if self.language == SourceLanguage.CXX:
             return "main"
         return None
 
+    @property
+    def entrypoint(self) -> str | None:
+        if self._entrypoint is not None:
+            return self._entrypoint
+        return self._default_entrypoint()
+
     def to_dict(self) -> dict[str, t.Any]:
-        d = super().to_dict()
-        if self.entrypoint:
+        # zero-argument super() does not work in slotted dataclasses
+        d = CMakeTarget.to_dict(self)
+        if self.entrypoint is not None:
             d["entrypoint"] = self.entrypoint
         return d
 
-    @classmethod
-    def from_dict(cls, info: dict[str, t.Any]) -> CMakeBinaryTarget:
-        return CMakeBinaryTarget(info["name"],
-                                 SourceLanguage(info["language"]),
-                                 set(info["sources"]),
-                                 list(info["includes"]),
-                                 set(info["path_restrictions"]),
-                                 info["cmakelists_file"],
-                                 info["cmakelists_line"],
-                                 info.get("entrypoint", None))
-
-
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class CMakeLibraryTarget(CMakeBinaryTarget):
-    _entrypoint: str
+    kind: t.ClassVar[str] = "library"
+
+    _entrypoint: str | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CMakeInfo:
     """Summarizes the source generating parts of a CMakeFile.
 
@@ -115,6 +180,12 @@ class CMakeInfo:
         Files that were unresolved, along with their location
     unprocessed_commands: list[CommandInformation]
         Commands that were not processed
+    stats: AnalysisStats | None
+        Measurements of the analysis, if the extractor was asked to collect them. These are not part of the
+        binary format of :mod:`ros_cmake_analyzer.serialization`, and are ignored when comparing results.
+    truncated: bool
+        Whether the analysis was stopped part way through, as it exceeded its budget (see
+        :mod:`ros_cmake_analyzer.budget`), in which case the rest of the information is partial.
 
     """
 
@@ -124,6 +195,56 @@ class CMakeInfo:
     generated_sources: t.Collection[str]
     unresolved_files: list[FileInformation]
     unprocessed_commands: list[CommandInformation]
+    stats: AnalysisStats | None = field(default=None, compare=False)
+    truncated: bool = False
+
+    def to_dict(self) -> dict[str, t.Any]:
+        """Returns a JSON-compatible dictionary that can be turned back into an equal CMakeInfo by from_dict.
+
+        Targets that are stored under several keys (e.g., nodelets that are also keyed by their class name) are
+        written once, and "target_keys" maps each key to the index of its target in "targets".
+        """
+        indices: dict[int, int] = {}
+        targets: list[dict[str, t.Any]] = []
+        target_keys: dict[str, int] = {}
+        for key, target in self.targets.items():
+            index = indices.get(id(target))
+            if index is None:
+                index = indices[id(target)] = len(targets)
+                targets.append(target.to_dict())
+            target_keys[key] = index
+        info: dict[str, t.Any] = {
+            "cmake_file": str(self.cmake_file),
+            "targets": targets,
+            "target_keys": target_keys,
+            "plugin_references": [reference.to_dict() for reference in self.plugin_references],
+            "generated_sources": sorted(self.generated_sources),
+            "unresolved_files": [file.to_dict() for file in self.unresolved_files],
+            "unprocessed_commands": [command.to_dict() for command in self.unprocessed_commands],
+        }
+        if self.stats is not None:
+            info["stats"] = self.stats.to_dict()
+        if self.truncated:
+            info["truncated"] = True
+        return info
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> CMakeInfo:
+        targets = [CMakeTarget.from_dict(target) for target in info["targets"]]
+        stats = None
+        if "stats" in info:
+            from .stats import AnalysisStats
+            stats = AnalysisStats.from_dict(info["stats"])
+        return CMakeInfo(
+            cmake_file=Path(info["cmake_file"]),
+            targets={key: targets[index] for key, index in info["target_keys"].items()},
+            plugin_references=tuple(CMakePluginReference.from_dict(ref) for ref in info["plugin_references"]),
+            generated_sources=set(info["generated_sources"]),
+            unresolved_files=[FileInformation.from_dict(file) for file in info["unresolved_files"]],
+            unprocessed_commands=[CommandInformation.from_dict(command) for command in info["unprocessed_commands"]],
+            stats=stats,
+            truncated=info.get("truncated", False),
+        )
 
     def destroy(self) -> None:
         self.targets.clear()
@@ -131,7 +252,7 @@ class CMakeInfo:
         self.unprocessed_commands.clear()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class NodeletLibrary:
     """Represents a piece of information found in the nodelet_plygin.xml file.
 
@@ -152,8 +273,9 @@ class NodeletLibrary:
         return self.type_ + "::onInit"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IncompleteCMakeLibraryTarget(CMakeTarget):
+    kind: t.ClassVar[str] = "incomplete_library"
 
     def complete(self, entrypoint: str) -> CMakeLibraryTarget:
         return CMakeLibraryTarget(name=self.name,
@@ -163,12 +285,34 @@ class IncompleteCMakeLibraryTarget(CMakeTarget):
                                   restrict_to_paths=self.restrict_to_paths,
                                   cmakelists_file=self.cmakelists_file,
                                   cmakelists_line=self.cmakelists_line,
+                                  libraries=self.libraries,
                                   _entrypoint=entrypoint)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CMakePluginReference:
     plugin_xml: Path
     base_class_package: str
     cmakelists_file: str
     cmakelists_line: int
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "plugin_xml": str(self.plugin_xml),
+            "base_class_package": self.base_class_package,
+            "cmakelists_file": self.cmakelists_file,
+            "cmakelists_line": self.cmakelists_line,
+        }
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> CMakePluginReference:
+        return CMakePluginReference(Path(info["plugin_xml"]),
+                                    info["base_class_package"],
+                                    info["cmakelists_file"],
+                                    info["cmakelists_line"])
+
+
+TARGET_CLASSES: dict[str, type[CMakeTarget]] = {
+    target_class.kind: target_class
+    for target_class in (CMakeTarget, CMakeBinaryTarget, CMakeLibraryTarget, IncompleteCMakeLibraryTarget)
+}
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+__all__ = (
+    "PathSequence",
+    "PathSet",
+    "PathTable",
+    "path_session",
+    "session_table",
+)
+
+import bisect
+import contextlib
+import os
+import typing as t
+from array import array
+from collections import abc
+from contextvars import ContextVar
+from pathlib import Path, PurePath
+
+
+class PathTable:
+    """Interns paths so that each distinct path is stored once and can be referred to by an integer id.
+
+    Ids are allocated densely from zero in the order that paths are first seen, and are only meaningful
+    within the table that allocated them.
+    """
+
+    __slots__ = ("_ids", "_paths")
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._paths: list[Path] = []
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str | os.PathLike) and _key(path) in self._ids
+
+    @staticmethod
+    def key(path: str | os.PathLike[str]) -> str:
+        """Returns the normalized string form of a path that is used to intern it."""
+        return _key(path)
+
+    def intern(self, path: str | os.PathLike[str]) -> int:
+        key = _key(path)
+        id_ = self._ids.get(key)
+        if id_ is None:
+            id_ = len(self._paths)
+            self._ids[key] = id_
+            self._paths.append(path if isinstance(path, Path) else Path(key))
+        return id_
+
+    def get(self, path: str | os.PathLike[str]) -> int | None:
+        """Returns the id of a path, or None if the path has not been interned."""
+        return self._ids.get(_key(path))
+
+    def path(self, id_: int) -> Path:
+        return self._paths[id_]
+
+
+def _key(path: str | os.PathLike[str]) -> str:
+    if isinstance(path, PurePath):
+        return str(path)
+    return str(PurePath(path))
+
+
+# The table that paths are interned in outside of a session
+_process_table = PathTable()
+_session_table: ContextVar[PathTable] = ContextVar("session_table")
+
+
+def session_table() -> PathTable:
+    """Returns the path table of the current session, in which paths are interned by default."""
+    return _session_table.get(_process_table)
+
+
+@contextlib.contextmanager
+def path_session() -> t.Iterator[PathTable]:
+    """Interns paths in a new table for the duration of the block.
+
+    The table lives for as long as the path collections that were created in it, so paths that are interned while
+    analyzing one package do not accumulate over the packages of a batch run.
+    """
+    table = PathTable()
+    token = _session_table.set(table)
+    try:
+        yield table
+    finally:
+        _session_table.reset(token)
+
+
+class PathSet(abc.Set[Path]):
+    """An immutable, hashable set of paths that is stored as a sorted array of ids in a :class:`PathTable`.
+
+    Iterating over the set yields the interned :class:`Path` objects from the table, so that a PathSet can be
+    used anywhere that a set of paths is expected. By default, paths are interned in the session table.
+    """
+
+    __slots__ = ("_ids", "_table")
+
+    def __init__(self, paths: t.Iterable[str | os.PathLike[str]] = (), table: PathTable | None = None) -> None:
+        self._table = table if table is not None else session_table()
+        self._ids = array("I", sorted({self._table.intern(path) for path in paths}))
+
+    @classmethod
+    def of(cls, paths: t.Iterable[str | os.PathLike[str]], table: PathTable | None = None) -> PathSet:
+        """Returns paths as a PathSet, reusing it if it already is one that belongs to the table.
+
+        If no table is given, a PathSet is reused whichever table it belongs to.
+        """
+        if isinstance(paths, PathSet) and (table is None or paths._table is table):
+            return paths
+        table = table if table is not None else session_table()
+        return cls(paths, table)
+
+    @classmethod
+    def from_ids(cls, ids: t.Iterable[int], table: PathTable | None = None) -> PathSet:
+        path_set = cls.__new__(cls)
+        path_set._table = table if table is not None else session_table()
+        path_set._ids = array("I", sorted(set(ids)))
+        return path_set
+
+    @property
+    def ids(self) -> array[int]:
+        return self._ids
+
+    @property
+    def table(self) -> PathTable:
+        return self._table
+
+    def __contains__(self, path: object) -> bool:
+        if not isinstance(path, str | os.PathLike):
+            return False
+        id_ = self._table.get(path)
+        if id_ is None:
+            return False
+        i = bisect.bisect_left(self._ids, id_)
+        return i < len(self._ids) and self._ids[i] == id_
+
+    def __iter__(self) -> t.Iterator[Path]:
+        path = self._table.path
+        return (path(id_) for id_ in self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PathSet) and other._table is self._table:
+            return self._ids == other._ids
+        return super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return self._hash()
+
+    def __reduce__(self) -> tuple[t.Any, ...]:
+        # Ids are only meaningful within a table, so paths are re-interned by the receiver
+        return PathSet, ([str(path) for path in self],)
+
+    def __repr__(self) -> str:
+        return f"PathSet({sorted(str(path) for path in self)!r})"
+
+
+class PathSequence(abc.Sequence[Path]):
+    """An immutable, hashable sequence of paths that is stored as an array of ids in a :class:`PathTable`."""
+
+    __slots__ = ("_ids", "_table")
+
+    def __init__(self, paths: t.Iterable[str | os.PathLike[str]] = (), table: PathTable | None = None) -> None:
+        self._table = table if table is not None else session_table()
+        self._ids = array("I", [self._table.intern(path) for path in paths])
+
+    @classmethod
+    def of(cls, paths: t.Iterable[str | os.PathLike[str]], table: PathTable | None = None) -> PathSequence:
+        """Returns paths as a PathSequence, reusing it if it already is one that belongs to the table.
+
+        If no table is given, a PathSequence is reused whichever table it belongs to.
+        """
+        if isinstance(paths, PathSequence) and (table is None or paths._table is table):
+            return paths
+        table = table if table is not None else session_table()
+        return cls(paths, table)
+
+    @classmethod
+    def from_ids(cls, ids: t.Iterable[int], table: PathTable | None = None) -> PathSequence:
+        sequence = cls.__new__(cls)
+        sequence._table = table if table is not None else session_table()
+        sequence._ids = array("I", ids)
+        return sequence
+
+    @property
+    def ids(self) -> array[int]:
+        return self._ids
+
+    @t.overload
+    def __getitem__(self, index: int) -> Path:
+        ...
+
+    @t.overload
+    def __getitem__(self, index: slice) -> PathSequence:
+        ...
+
+    def __getitem__(self, index: int | slice) -> Path | PathSequence:
+        if isinstance(index, slice):
+            return PathSequence.from_ids(self._ids[index], self._table)
+        return self._table.path(self._ids[index])
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PathSequence):
+            if other._table is self._table:
+                return self._ids == other._ids
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __reduce__(self) -> tuple[t.Any, ...]:
+        return PathSequence, ([str(path) for path in self],)
+
+    def __repr__(self) -> str:
+        return f"PathSequence({[str(path) for path in self]!r})"
@@ -0,0 +1,230 @@
+"""Reuses the state of the parser and extractor after a prelude that the CMakeLists.txt files of packages share.
+
+Many packages start their top-level CMakeLists.txt with the same commands: ``cmake_minimum_required``, ``project``,
+``find_package``, and the definitions of a library of macros. The prelude of a file is its longest run of leading
+commands that only set variables or define macros and functions (see :data:`PRELUDE_COMMANDS`), up to the start of
+the line of the first command that does anything else. The second time that a :class:`PreludeCache` sees the same
+prelude, keyed by a hash of its text, it keeps a :class:`PreludeSnapshot` of the variables, macros and functions,
+and unhandled commands that it leaves behind. Any later file that starts with the same text restores the snapshot,
+and only lexes, parses and runs the rest of the file::
+
+    preludes = PreludeCache()
+    for package_dir in package_dirs:
+        ROS1CMakeExtractor(package_dir, preludes=preludes).get_cmake_info()
+
+A prelude is only kept if its snapshot does not depend on the package that it was taken from: it may not add any
+targets or refer to the path of the package. Commands that are restored from a snapshot are not counted against
+the budget of a package, and are not timed in its statistics.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "PRELUDE_COMMANDS",
+    "PreludeCache",
+    "PreludeSnapshot",
+)
+
+import hashlib
+import re
+import typing as t
+from dataclasses import dataclass
+
+from .cmake_parser.parser import CMakeSyntaxError, _parse_commands
+from .diagnostics import Level, diagnostics
+
+if t.TYPE_CHECKING:
+    from .cmake_parser.parser import Command, SkippedRegion
+    from .diagnostics import Diagnostic
+
+# The commands that may be part of a prelude, as well as the definitions of macros and functions. Each of them only
+# sets variables, if it is handled at all.
+PRELUDE_COMMANDS = frozenset({
+    "add_compile_options",
+    "add_definitions",
+    "catkin_package",
+    "cmake_minimum_required",
+    "cmake_policy",
+    "find_package",
+    "include_directories",
+    "list",
+    "message",
+    "option",
+    "project",
+    "set",
+    "unset",
+})
+_DEFINITIONS = ("macro", "function")
+
+_open_bracket = re.compile(r"\[(=*)\[")
+
+PreludeKey = tuple[type, tuple[bool, ...], bytes]
+
+
+@dataclass(frozen=True, slots=True)
+class PreludeSnapshot:
+    """The state that running a prelude leaves behind, which does not depend on the file that it was taken from.
+
+    Attributes
+    ----------
+    variables: dict[str, t.Any]
+        The variables after the prelude, other than the path of the file
+    callables: dict[str, t.Any]
+        The macros and functions that the prelude defines, keyed by their lower-case names
+    commands: tuple[tuple[str, tuple[str, ...], str, int], ...]
+        The command, arguments, reason and line of each command of the prelude that was not processed
+    events: tuple[tuple[Diagnostic, int | None], ...]
+        The diagnostics that the prelude emitted, each with the index in commands of the command that it is about
+
+    """
+
+    variables: dict[str, t.Any]
+    callables: dict[str, t.Any]
+    commands: tuple[tuple[str, tuple[str, ...], str, int], ...]
+    events: tuple[tuple[Diagnostic, int | None], ...]
+
+
+def _block_end(commands: list[Command], start: int, name: str) -> int | None:
+    """Returns the index of the command that ends the macro or function that starts at an index.
+
+    The end is found as _parse_block finds it.
+    """
+    nesting = 1
+    for index in range(start + 1, len(commands)):
+        other = commands[index].name.lower()
+        if other == name:
+            nesting += 1
+        elif other == f"end{name}":
+            nesting -= 1
+            if nesting == 0:
+                return index
+    return None
+
+
+def prelude_length(commands: list[Command]) -> int:
+    """Returns the number of leading commands that make up the prelude of a file."""
+    defined: set[str] = set()
+    index = 0
+    while index < len(commands):
+        name = commands[index].name.lower()
+        if name in _DEFINITIONS:
+            args = commands[index].args
+            end = _block_end(commands, index, name)
+            if not args or end is None or "$" in args[0][1]:
+                break
+            defined.add(args[0][1].lower())
+            index = end + 1
+        # A command that the prelude redefines as a macro or function could do anything
+        elif name in PRELUDE_COMMANDS and name not in defined:
+            index += 1
+        else:
+            break
+    return index
+
+
+def _has_unterminated_bracket(text: str) -> bool:
+    return any(text.find(f"]{match.group(1)}]", match.end()) < 0 for match in _open_bracket.finditer(text))
+
+
+def _same_commands(first: list[Command], second: list[Command]) -> bool:
+    return ([(c.name, c.args, c.line, c.column) for c in first]
+            == [(c.name, c.args, c.line, c.column) for c in second])
+
+
+class PreludeCache:
+    """Keeps snapshots of the preludes that are shared by the CMakeLists.txt files of packages.
+
+    Snapshots are kept for each extractor class, and for the levels of diagnostics that are enabled, as the
+    diagnostics of a prelude are replayed when it is restored. Only the first ``max_snapshots`` preludes that are
+    seen twice are kept.
+    """
+
+    def __init__(self, max_snapshots: int = 64) -> None:
+        self.max_snapshots = max_snapshots
+        self.hits = 0
+        self._snapshots: dict[PreludeKey, tuple[PreludeSnapshot, int, str]] = {}
+        # The lengths of the preludes that have snapshots, longest first
+        self._lengths: list[int] = []
+        self._seen: set[PreludeKey] = set()
+        # The preludes that a snapshot cannot be taken of
+        self._rejected: set[PreludeKey] = set()
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    @staticmethod
+    def _key(extractor_class: type, prelude: str) -> PreludeKey:
+        levels = tuple(diagnostics.enabled(level) for level in Level)
+        return extractor_class, levels, hashlib.blake2b(prelude.encode("utf-8"), digest_size=16).digest()
+
+    def find(self, extractor_class: type, contents: str) -> tuple[PreludeSnapshot, str] | None:
+        """Returns the snapshot of the prelude that a file starts with, if there is one, and the rest of the file.
+
+        The prelude is replaced by as many line breaks as the lexer counts in it, so that the commands of the rest
+        of the file keep their lines.
+        """
+        for length in self._lengths:
+            if length <= len(contents):
+                entry = self._snapshots.get(self._key(extractor_class, contents[:length]))
+                if entry is not None:
+                    self.hits += 1
+                    snapshot, _, line_breaks = entry
+                    return snapshot, line_breaks + contents[length:]
+        return None
+
+    def split(
+            self,
+            extractor_class: type,
+            contents: str,
+            commands: list[Command],
+            line_starts: list[int],
+            errors: list[SkippedRegion] | None = None,
+    ) -> tuple[PreludeKey, int, int] | None:
+        """Finds the prelude of a parsed file, if a snapshot should be taken of it now.
+
+        The line starts are those that the lexer found as it parsed the file.
+
+        Returns
+        -------
+        tuple[PreludeKey, int, int] | None
+            The key of the prelude, the length of its text, and its number of commands, if this is the second time
+            that the prelude has been seen, or None if there is no prelude worth taking a snapshot of
+
+        """
+        count = prelude_length(commands)
+        if count == 0 or count == len(commands) or len(self._snapshots) >= self.max_snapshots:
+            return None
+        first = commands[count]
+        length = line_starts[first.line - 2] if first.line > 1 else 0
+        prelude = contents[:length]
+        # The prelude must end before the line on which the rest of the file starts, and must be lexed the same
+        # whatever text follows it
+        if (contents[length:length + first.column - 1].strip() or "$<" in prelude
+                or _has_unterminated_bracket(prelude)
+                or (errors and any(region.line < first.line for region in errors))):
+            return None
+        key = self._key(extractor_class, prelude)
+        if key in self._rejected:
+            return None
+        if key not in self._seen:
+            self._seen.add(key)
+            return None
+        try:
+            alone = _parse_commands(prelude, commands[0].filename)
+        except CMakeSyntaxError:
+            alone = []
+        if not _same_commands(alone, commands[:count]):
+            self._rejected.add(key)
+            return None
+        return key, length, count
+
+    def store(self, key: PreludeKey, prelude: str, prelude_lines: int, snapshot: PreludeSnapshot | None) -> None:
+        """Keeps the snapshot of a prelude that split returned.
+
+        The prelude spans a number of lines as the lexer counts them. The snapshot is None if the prelude depends on
+        its package.
+        """
+        if snapshot is None:
+            self._rejected.add(key)
+            return
+        self._snapshots[key] = (snapshot, len(prelude), "\n" * prelude_lines)
+        self._lengths = sorted({length for _, length, _ in self._snapshots.values()}, reverse=True)
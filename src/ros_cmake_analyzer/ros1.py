@@ -1,22 +1,38 @@
 # ruff: noqa: ERA001
+from __future__ import annotations
+
 import typing as t
 from pathlib import Path
 
-from loguru import logger
-
 from .decorator import cmake_command
+from .diagnostics import Level, Message, diagnostics
 from .extractor import CMakeExtractor
 from .model import (
-    CMakeInfo,
     DUMMY_VALUE,
+    CMakeInfo,
     IncompleteCMakeLibraryTarget,
 )
+from .paths import path_session
+
+if t.TYPE_CHECKING:
+    from .budget import Budget
+    from .cpp_index import ClassIndex
+    from .prelude import PreludeCache
 
 
 class ROS1CMakeExtractor(CMakeExtractor):
 
-    def __init__(self, package_dir: str | Path) -> None:
-        super().__init__(package_dir)
+    def __init__(
+            self,
+            package_dir: str | Path,
+            *,
+            collect_stats: bool = False,
+            budget: Budget | None = None,
+            resilient: bool = False,
+            preludes: PreludeCache | None = None,
+    ) -> None:
+        super().__init__(package_dir, collect_stats=collect_stats, budget=budget, resilient=resilient,
+                         preludes=preludes)
 
     def get_cmake_info(self) -> CMakeInfo:
         cmakelists_path = self.package.path / "CMakeLists.txt"
@@ -24,41 +40,42 @@ class ROS1CMakeExtractor(CMakeExtractor):
             msg = f"No `CMakeLists.txt' in {self.package.name}"
             raise ValueError(msg)
 
-        info = self._info_from_cmakelists()
-        self._add_nodelet_information(info)
-        self._hook_libraries_into_executables(info)
+        # The paths of the package are interned in a table of their own, which is freed along with the result
+        with path_session():
+            info = self._info_from_cmakelists()
+            self._add_nodelet_information(info)
+            self._hook_libraries_into_executables(info)
         return info
 
     def _add_nodelet_information(self, info: CMakeInfo) -> None:
         nodelet_libraries = self.get_nodelet_entrypoints()
-        # Add in classname as a name that can be referenced in loading nodelets
+        if not nodelet_libraries:
+            return
+        classes: ClassIndex | None = None
         for nodelet, library in nodelet_libraries.items():
             if nodelet in info.targets:
-                info.targets[library.name] = info.targets[nodelet]
+                key = nodelet
             else:
-                # This is a hack. What really needs to be done is to look through all
-                # the source files in info.targets to find which info.target defines the
-                # class in library.name or library.type, then add that target keyed by
-                # the type as well. This is needed because nodelets can be loaded into
-                # managers by their class name.
-                # TODO: Fix post paper
-                potential_matches = [key for key in info.targets if key in library.path or key in library.name]
-                if potential_matches:
-                    info.targets[library.name.split("/")[-1]] = info.targets[potential_matches[0].split("/")[-1]]
-
-        for nodelet, library in nodelet_libraries.items():
-            if nodelet not in info.targets:
-                logger.warning(f"info.targets={info.targets}")
-                logger.warning(f"Package {self.package.name}: '{nodelet}' "
-                               f"is referenced in nodelet_plugins.xml but not in "
-                               f"CMakeLists.txt.")
+                # Nodelets can be loaded into managers by their class name, so find the target that
+                # exports (or failing that, defines) the class
+                if classes is None:
+                    from .cpp_index import ClassIndex
+                    classes = ClassIndex()
+                    classes.add_targets(self.package.name, self.package.path, info.targets)
+                refs = classes.resolve(library.type_)
+                if not refs:
+                    diagnostics.emit(Message(Level.WARNING, "Package {}: '{}' is referenced in nodelet_plugins.xml "
+                                                            "but not in CMakeLists.txt.", (self.package.name, nodelet)))
+                    continue
+                key = refs[0].key
+            target = info.targets[key]
+            if isinstance(target, IncompleteCMakeLibraryTarget):
+                target = target.complete(entrypoint=library.entrypoint)
             else:
-                target = info.targets[nodelet]
-                if isinstance(target, IncompleteCMakeLibraryTarget):
-                    info.targets[nodelet] = target.complete(entrypoint=library.entrypoint)
-                else:
-                    logger.warning(f"'{nodelet} target '{target.name}' "
-                                   f"trying to set entrypoint on {type(target)}'")
+                diagnostics.emit(Message(Level.WARNING, "'{}' target '{}' trying to set entrypoint on {}",
+                                         (nodelet, target.name, type(target))))
+            for alias in (key, nodelet, library.name):
+                info.targets[alias] = target
 
     def package_paths(self) -> set[Path]:
         paths: set[Path] = {self.package.path}
@@ -1,5 +1,6 @@
+from __future__ import annotations
+
 import typing as t
-from loguru import logger
 from pathlib import Path
 
 from ros_cmake_analyzer import CMakeExtractor
@@ -7,16 +8,40 @@ from ros_cmake_analyzer.decorator import (
     aliased_cmake_command,
     cmake_command,
 )
+from ros_cmake_analyzer.diagnostics import Level, Message, diagnostics
 from ros_cmake_analyzer.model import (
-    CMakeBinaryTarget, CMakeInfo,
-    DUMMY_VALUE, IncompleteCMakeLibraryTarget, SourceLanguage,
+    DUMMY_VALUE,
+    CMakeBinaryTarget,
+    CMakeInfo,
+    IncompleteCMakeLibraryTarget,
+    SourceLanguage,
 )
+from ros_cmake_analyzer.paths import path_session
+
+if t.TYPE_CHECKING:
+    from ros_cmake_analyzer.budget import Budget
+    from ros_cmake_analyzer.prelude import PreludeCache
+
+
+def _component_entrypoint(class_name: str) -> str:
+    """Returns the entrypoint of a component, which is the constructor of its class."""
+    class_name = class_name.removeprefix("::")
+    return f"{class_name}::{class_name.rsplit('::', 1)[-1]}"
 
 
 class ROS2CMakeExtractor(CMakeExtractor):
 
-    def __init__(self, package_dir: str | Path) -> None:
-        super().__init__(package_dir)
+    def __init__(
+            self,
+            package_dir: str | Path,
+            *,
+            collect_stats: bool = False,
+            budget: Budget | None = None,
+            resilient: bool = False,
+            preludes: PreludeCache | None = None,
+    ) -> None:
+        super().__init__(package_dir, collect_stats=collect_stats, budget=budget, resilient=resilient,
+                         preludes=preludes)
 
     def package_paths(self) -> set[Path]:
         return {self.package.path}
@@ -27,8 +52,10 @@ class ROS2CMakeExtractor(CMakeExtractor):
             msg = f"No `CMakeLists.txt' in {self.package.name}"
             raise ValueError(msg)
 
-        info = self._info_from_cmakelists()
-        self._hook_libraries_into_executables(info)
+        # The paths of the package are interned in a table of their own, which is freed along with the result
+        with path_session():
+            info = self._info_from_cmakelists()
+            self._hook_libraries_into_executables(info)
         return info
 
     def _get_global_cmake_variables(self) -> dict[str, str]:
@@ -54,8 +81,10 @@ class ROS2CMakeExtractor(CMakeExtractor):
         directory = self.package.path / directory
         if not directory.is_dir():
             raise FileNotFoundError(f"Directory {directory!s} does not exist")
+        self._count("is_file")
         if not (directory / "__init__.py").is_file():
             raise FileNotFoundError(f"Directory {directory!s} does not contain __init__.py")
+        self._count("glob")
         sources = [file for file in directory.glob("*.py") if file.name != "__init__.py"]
         self.executables[name] = IncompleteCMakeLibraryTarget(
             name,
@@ -67,6 +96,40 @@ class ROS2CMakeExtractor(CMakeExtractor):
             cmakelists_line=cmake_env["cmakelists_line"],
         )
 
+    def _find_components(self, library: str, class_names: list[str]) -> dict[str, set[Path]] | None:
+        """Returns the sources of a component library that export or define each of the given component classes.
+
+        Returns None if the library is not a target.
+        """
+        if library not in self.executables:
+            diagnostics.emit(Message(Level.WARNING, "Components are registered for '{}', which is not a target",
+                                     (library,)))
+            return None
+        sources = {self.package.path / source: source for source in self.executables[library].sources}
+        from ros_cmake_analyzer.cpp_index import ClassIndex
+        classes = ClassIndex()
+        classes.scan(sources)
+        found: dict[str, set[Path]] = {}
+        for class_name in class_names:
+            paths = classes.files_exporting(class_name) or classes.files_defining(class_name)
+            if not paths:
+                diagnostics.emit(Message(Level.WARNING, "Component class '{}' was not found in the sources of '{}'",
+                                         (class_name, library)))
+                continue
+            found[class_name] = {sources[path] for path in paths}
+        return found
+
+    def _component_sources(self, library: str, class_names: list[str]) -> set[Path]:
+        """Returns the sources of a component library that export or define the given component classes.
+
+        If none of the classes can be found, all the sources of the library are returned.
+        """
+        found = self._find_components(library, class_names)
+        if found is None:
+            return set()
+        sources = set().union(*found.values())
+        return sources or set(self.executables[library].sources)
+
     @cmake_command
     def rclcpp_components_register_node(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
         opts, args = self._cmake_argparse(raw_args, {
@@ -75,14 +138,13 @@ class ROS2CMakeExtractor(CMakeExtractor):
             "RESOURCE_INDEX": "*",
         })
         if "PLUGIN" not in opts or "EXECUTABLE" not in opts:
-            logger.error("Need PLUGIN and EXECUTABLE arguments")
             raise ValueError("Need PLUGIN and EXECUTABLE arguments")
         self.executables[opts.get("EXECUTABLE")[0]] = CMakeBinaryTarget(
             name=opts.get("EXECUTABLE")[0],
             language=SourceLanguage.CXX,
-            sources=set(opts.get("PLUGIN")),
-            includes=cmake_env["INCLUDE_DIRECTORIES"].split(" ") if "INCLUDE_DIRECTORIES" in cmake_env else [],
-            libraries=[],
+            sources=self._component_sources(args[0], opts.get("PLUGIN")),
+            includes=self._include_directories(cmake_env),
+            libraries=[args[0]],
             restrict_to_paths=self.package_paths(),
             cmakelists_file=cmake_env["cmakelists"],
             cmakelists_line=cmake_env["cmakelists_line"],
@@ -91,16 +153,17 @@ class ROS2CMakeExtractor(CMakeExtractor):
     @cmake_command
     def rclcpp_components_register_nodes(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
         opts, args = self._cmake_argparse(raw_args, {"RESOURCE_INDEX": "*"})
-        self.executables[args[0]] = CMakeBinaryTarget(
-            name=args[0],
-            language=SourceLanguage.CXX,
-            sources=set(args[1:]),
-            includes=cmake_env["INCLUDE_DIRECTORIES"].split(" ") if "INCLUDE_DIRECTORIES" in cmake_env else [],
-            libraries=[],
-            restrict_to_paths=self.package_paths(),
-            cmakelists_file=cmake_env["cmakelists"],
-            cmakelists_line=cmake_env["cmakelists_line"],
-        )
+        # The components are loaded from the library itself, which keeps all of its sources, so the library is
+        # only given the entrypoint of its first component that can be found
+        found = self._find_components(args[0], args[1:])
+        if not found:
+            return
+        library = self.executables[args[0]]
+        if isinstance(library, IncompleteCMakeLibraryTarget):
+            self.executables[args[0]] = library.complete(entrypoint=_component_entrypoint(next(iter(found))))
+        else:
+            diagnostics.emit(Message(Level.WARNING, "Components are registered for '{}', which is a {}",
+                                     (args[0], type(library).__name__)))
 
     @cmake_command
     def ament_create_node(self, cmake_env: dict[str, t.Any], raw_args: list[str]) -> None:
@@ -114,13 +177,11 @@ class ROS2CMakeExtractor(CMakeExtractor):
                 real_src = self._resolve_to_real_file(source, self.package.path, cmake_env)
                 if real_src:
                     sources.add(real_src)
-                else:
-                    logger.warning(f"'{source} did not resolve to a real file.")
         self.executables[args[0]] = CMakeBinaryTarget(
             name=name,
             language=SourceLanguage.CXX,
             sources=sources,
-            includes=cmake_env["INCLUDE_DIRECTORIES"].split(" ") if "INCLUDE_DIRECTORIES" in cmake_env else [],
+            includes=self._include_directories(cmake_env),
             libraries=[],
             restrict_to_paths=self.package_paths(),
             cmakelists_file=cmake_env["cmakelists"],
@@ -0,0 +1,145 @@
+"""Orders the packages of a batch run so that the most expensive ones are analyzed first.
+
+In a parallel run, the time until the last package is finished is dominated by the largest packages if they
+happen to be started last, while the other workers sit idle. Starting the longest tasks first (the LPT rule) avoids
+this, given an estimate of how long each package takes, which a :class:`CostHistory` provides. It records the wall
+time taken by each package, keyed by its path along with a fingerprint of its CMake files, and the number of bytes
+of CMake that the package has. A package whose CMake files are unchanged is expected to take as long as it did
+before, and any other package is expected to take time in proportion to its bytes of CMake, at the average rate
+of the packages in the history::
+
+    history = CostHistory.load(Path("costs.json"))
+    BatchAnalyzer("ros1", workers=8, cost_history=history).run(package_dirs)
+    history.save(Path("costs.json"))
+
+The fingerprint is made from the relative path, size and modification time of each CMake file of the package,
+which are found without reading any of the files.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "CostHistory",
+    "PackageCost",
+    "measure",
+)
+
+import hashlib
+import json
+import os
+import typing as t
+from dataclasses import dataclass
+
+if t.TYPE_CHECKING:
+    from pathlib import Path
+
+# The seconds per byte of CMake assumed for packages that are not in an empty history
+DEFAULT_SECONDS_PER_BYTE = 1e-6
+# The weight of the latest measurement in the cost of a package whose CMake files are unchanged
+SMOOTHING = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class PackageCost:
+    """The time taken to analyze a package, along with the fingerprint and bytes of its CMake files at the time."""
+
+    fingerprint: str
+    seconds: float
+    size_bytes: int
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {"fingerprint": self.fingerprint, "seconds": self.seconds, "size_bytes": self.size_bytes}
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> PackageCost:
+        return PackageCost(info["fingerprint"], info["seconds"], info["size_bytes"])
+
+
+def _is_cmake_file(name: str) -> bool:
+    return name == "CMakeLists.txt" or name.endswith(".cmake")
+
+
+def measure(package_dir: Path) -> tuple[str, int]:
+    """Returns the fingerprint of the CMake files of a package, and their total size in bytes.
+
+    Hidden directories are skipped, as find_packages does.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(package_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if _is_cmake_file(name):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)  # noqa: PTH116
+                except OSError:
+                    continue
+                total += stat.st_size
+                digest.update(f"{os.path.relpath(path, package_dir)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest(), total
+
+
+class CostHistory:
+    """The cost of each package that has been analyzed, keyed by the path of the package."""
+
+    def __init__(self, costs: dict[str, PackageCost] | None = None) -> None:
+        self.costs = costs if costs is not None else {}
+        # The measurements of the packages that have been estimated, so that recording them does not walk them again
+        self._measured: dict[str, tuple[str, int]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> CostHistory:
+        """Reads a history that was saved to a file, or returns an empty one if there is no such file."""
+        try:
+            with path.open(encoding="utf-8") as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls({package: PackageCost.from_dict(cost) for package, cost in info["packages"].items()})
+
+    def save(self, path: Path) -> None:
+        """Writes the history to a file, replacing it atomically."""
+        temporary = path.with_name(path.name + ".tmp")
+        with temporary.open("w", encoding="utf-8") as f:
+            json.dump({"packages": {package: cost.to_dict() for package, cost in self.costs.items()}}, f)
+        temporary.replace(path)
+
+    def _measure(self, package_dir: Path) -> tuple[str, int]:
+        key = str(package_dir)
+        measured = self._measured.get(key)
+        if measured is None:
+            measured = self._measured[key] = measure(package_dir)
+        return measured
+
+    def seconds_per_byte(self) -> float:
+        total_bytes = sum(cost.size_bytes for cost in self.costs.values())
+        if total_bytes == 0:
+            return DEFAULT_SECONDS_PER_BYTE
+        return sum(cost.seconds for cost in self.costs.values()) / total_bytes
+
+    def estimate(self, package_dir: Path, seconds_per_byte: float | None = None) -> float:
+        """Returns the expected time, in seconds, to analyze a package."""
+        fingerprint, size = self._measure(package_dir)
+        cost = self.costs.get(str(package_dir))
+        if cost is not None:
+            if cost.fingerprint == fingerprint:
+                return cost.seconds
+            if cost.size_bytes > 0:
+                return cost.seconds * size / cost.size_bytes
+        if seconds_per_byte is None:
+            seconds_per_byte = self.seconds_per_byte()
+        return size * seconds_per_byte
+
+    def schedule(self, package_dirs: t.Iterable[Path]) -> list[Path]:
+        """Returns the packages in decreasing order of their expected cost."""
+        seconds_per_byte = self.seconds_per_byte()
+        estimates = {package_dir: self.estimate(package_dir, seconds_per_byte) for package_dir in package_dirs}
+        return sorted(estimates, key=estimates.__getitem__, reverse=True)
+
+    def record(self, package_dir: Path, seconds: float) -> None:
+        """Records the time taken to analyze a package."""
+        fingerprint, size = self._measure(package_dir)
+        previous = self.costs.get(str(package_dir))
+        if previous is not None and previous.fingerprint == fingerprint:
+            seconds = SMOOTHING * seconds + (1 - SMOOTHING) * previous.seconds
+        self.costs[str(package_dir)] = PackageCost(fingerprint, seconds, size)
@@ -0,0 +1,338 @@
+"""Serializes CMakeInfo so that results can be cached, or passed between processes, without repeating the analysis.
+
+Two versioned formats are provided:
+
+* JSON, via :func:`write_json`/:func:`read_json`, which is written incrementally so that a large result is never
+  held in memory as a single string. :class:`JSONLinesWriter` streams the results of a batch run, one package
+  per line.
+* A compact binary encoding, via :func:`encode`/:func:`decode`. Every string (names, paths, arguments) is stored
+  once in a shared string table, and the structure of the result is a flat array of 32-bit integers that refer
+  to it. :func:`decode` reads from any buffer, including a memoryview of shared memory or an mmap, without
+  copying it first.
+
+Both formats round-trip exactly: ``decode(encode(info)) == info``.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "BINARY_VERSION",
+    "JSON_VERSION",
+    "JSONLinesWriter",
+    "UnsupportedFormatError",
+    "decode",
+    "encode",
+    "read_json",
+    "write_json",
+)
+
+import json
+import struct
+import sys
+import typing as t
+from array import array
+from itertools import accumulate
+from pathlib import Path
+
+from .model import (
+    TARGET_CLASSES,
+    CMakeBinaryTarget,
+    CMakeInfo,
+    CMakePluginReference,
+    CMakeTarget,
+    CommandInformation,
+    FileInformation,
+    SourceLanguage,
+)
+from .paths import PathSequence, PathSet, PathTable, path_session
+
+if t.TYPE_CHECKING:
+    from .core.package import Package
+
+JSON_FORMAT = "ros-cmake-analyzer/cmake-info"
+JSON_VERSION = 1
+
+BINARY_MAGIC = b"RCAI"
+BINARY_VERSION = 2
+# magic, version, number of strings, length of the UTF-8 text in bytes, number of words
+_HEADER = struct.Struct("<4sHxxIII")
+
+_KINDS = list(TARGET_CLASSES)
+_KIND_CODES = {kind: code for code, kind in enumerate(_KINDS)}
+_LANGUAGES = list(SourceLanguage)
+_LANGUAGE_CODES = {language: code for code, language in enumerate(_LANGUAGES)}
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when serialized data is not in a format, or a version of a format, that can be read."""
+
+
+def write_json(info: CMakeInfo, fp: t.TextIO) -> None:
+    """Writes a CMakeInfo as a JSON document, one target at a time."""
+    d = info.to_dict()
+    targets = d.pop("targets")
+    fp.write(f'{{"format": "{JSON_FORMAT}", "version": {JSON_VERSION}, "targets": [')
+    for i, target in enumerate(targets):
+        if i:
+            fp.write(", ")
+        fp.write(json.dumps(target))
+    fp.write("]")
+    for key, value in d.items():
+        fp.write(f", {json.dumps(key)}: ")
+        fp.write(json.dumps(value))
+    fp.write("}")
+
+
+def _from_json_dict(d: dict[str, t.Any]) -> CMakeInfo:
+    if d.get("format") != JSON_FORMAT:
+        raise UnsupportedFormatError(f"not a serialized CMakeInfo: {d.get('format')!r}")
+    if d.get("version") != JSON_VERSION:
+        raise UnsupportedFormatError(f"unsupported version {d.get('version')!r} (expected {JSON_VERSION})")
+    with path_session():
+        return CMakeInfo.from_dict(d)
+
+
+def read_json(fp: t.TextIO) -> CMakeInfo:
+    return _from_json_dict(json.load(fp))
+
+
+class JSONLinesWriter:
+    """A batch sink that streams results to a JSON Lines file, one package per line.
+
+    Each line is an object with the "package" name, its "path", and the "info" document written by
+    :func:`write_json`.
+    """
+
+    def __init__(self, fp: t.TextIO) -> None:
+        self._fp = fp
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self._fp.write(f'{{"package": {json.dumps(package.name)}, "path": {json.dumps(str(package.path))}, "info": ')
+        write_json(info, self._fp)
+        self._fp.write("}\n")
+
+    @staticmethod
+    def read(fp: t.TextIO) -> t.Iterator[tuple[str, Path, CMakeInfo]]:
+        for line in fp:
+            if line.strip():
+                d = json.loads(line)
+                yield d["package"], Path(d["path"]), _from_json_dict(d["info"])
+
+
+class _Encoder:
+    def __init__(self) -> None:
+        self.strings: list[str] = []
+        self.string_ids: dict[str, int] = {}
+        self.words = array("I")
+
+    def string(self, s: str) -> None:
+        id_ = self.string_ids.get(s)
+        if id_ is None:
+            id_ = self.string_ids[s] = len(self.strings)
+            self.strings.append(s)
+        self.words.append(id_)
+
+    def optional_string(self, s: str | None) -> None:
+        if s is None:
+            self.words.append(0)
+        else:
+            self.words.append(1)
+            self.string(s)
+
+    def strings_of(self, items: t.Collection[t.Any]) -> None:
+        self.words.append(len(items))
+        for item in items:
+            self.string(str(item))
+
+    def target(self, target: CMakeTarget) -> None:
+        words = self.words
+        words.append(_KIND_CODES[target.kind])
+        words.append(_LANGUAGE_CODES[target.language])
+        self.string(target.name)
+        self.strings_of(target.sources)
+        self.strings_of(target.includes)
+        self.strings_of(target.restrict_to_paths)
+        self.string(target.cmakelists_file)
+        words.append(target.cmakelists_line)
+        self.strings_of(target.libraries)
+        self.optional_string(target._entrypoint if isinstance(target, CMakeBinaryTarget) else None)
+
+    def info(self, info: CMakeInfo) -> None:
+        words = self.words
+        self.string(str(info.cmake_file))
+
+        indices: dict[int, int] = {}
+        targets: list[CMakeTarget] = []
+        for target in info.targets.values():
+            if id(target) not in indices:
+                indices[id(target)] = len(targets)
+                targets.append(target)
+        words.append(len(targets))
+        for target in targets:
+            self.target(target)
+        words.append(len(info.targets))
+        for key, target in info.targets.items():
+            self.string(key)
+            words.append(indices[id(target)])
+
+        words.append(len(info.plugin_references))
+        for reference in info.plugin_references:
+            self.string(str(reference.plugin_xml))
+            self.string(reference.base_class_package)
+            self.string(reference.cmakelists_file)
+            words.append(reference.cmakelists_line)
+
+        self.strings_of(sorted(info.generated_sources))
+
+        words.append(len(info.unresolved_files))
+        for file in info.unresolved_files:
+            self.string(file.filename)
+            self.string(str(file.cmake_file))
+            words.append(file.cmake_line_no)
+
+        words.append(len(info.unprocessed_commands))
+        for command in info.unprocessed_commands:
+            self.string(command.command)
+            self.strings_of(command.args)
+            self.string(command.reason)
+            self.string(str(command.cmake_file))
+            words.append(command.cmake_line_no)
+
+        words.append(info.truncated)
+
+
+def encode(info: CMakeInfo) -> bytes:
+    """Encodes a CMakeInfo in the compact binary format.
+
+    The layout is a fixed header, followed by the length (in characters) of each string in the string table,
+    the UTF-8 text of all the strings (padded to a multiple of four bytes), and the words that describe the
+    structure of the result. All integers are unsigned, 32-bit, and little-endian.
+    """
+    encoder = _Encoder()
+    encoder.info(info)
+    lengths = array("I", [len(s) for s in encoder.strings])
+    text = "".join(encoder.strings).encode("utf-8", "surrogatepass")
+    padding = -len(text) % 4
+    words = encoder.words
+    if sys.byteorder != "little":
+        lengths.byteswap()
+        words.byteswap()
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(lengths), len(text), len(words))
+    return b"".join((header, lengths.tobytes(), text, b"\0" * padding, words.tobytes()))
+
+
+class _Decoder:
+    def __init__(self, strings: list[str], words: t.Sequence[int]) -> None:
+        self.strings = strings
+        self.words = words
+        self.position = 0
+        self._path_ids: list[int | None] = [None] * len(strings)
+        # The paths of each decoded result are interned in a table of their own, which is freed along with it
+        self.table = PathTable()
+
+    def word(self) -> int:
+        word = self.words[self.position]
+        self.position += 1
+        return word
+
+    def string(self) -> str:
+        return self.strings[self.word()]
+
+    def optional_string(self) -> str | None:
+        return self.string() if self.word() else None
+
+    def string_list(self) -> list[str]:
+        n = self.word()
+        strings = self.strings
+        start = self.position
+        self.position += n
+        return [strings[id_] for id_ in self.words[start:self.position]]
+
+    def path_ids(self) -> list[int]:
+        # Each distinct string is interned at most once per decode
+        n = self.word()
+        start = self.position
+        self.position += n
+        path_ids = self._path_ids
+        ids = []
+        for id_ in self.words[start:self.position]:
+            path_id = path_ids[id_]
+            if path_id is None:
+                path_id = path_ids[id_] = self.table.intern(self.strings[id_])
+            ids.append(path_id)
+        return ids
+
+    def target(self) -> CMakeTarget:
+        target_class = TARGET_CLASSES[_KINDS[self.word()]]
+        language = _LANGUAGES[self.word()]
+        name = self.string()
+        sources = PathSet.from_ids(self.path_ids(), self.table)
+        includes = PathSequence.from_ids(self.path_ids(), self.table)
+        restrict_to_paths = PathSet.from_ids(self.path_ids(), self.table)
+        cmakelists_file = self.string()
+        cmakelists_line = self.word()
+        libraries = tuple(self.string_list())
+        entrypoint = self.optional_string()
+        args: dict[str, t.Any] = {}
+        if issubclass(target_class, CMakeBinaryTarget):
+            args["_entrypoint"] = entrypoint
+        return target_class(name, language, sources, includes, restrict_to_paths, cmakelists_file, cmakelists_line,
+                            libraries, **args)
+
+    def info(self) -> CMakeInfo:
+        cmake_file = Path(self.string())
+        targets = [self.target() for _ in range(self.word())]
+        keyed_targets = {}
+        for _ in range(self.word()):
+            key = self.string()
+            keyed_targets[key] = targets[self.word()]
+        plugin_references = tuple(
+            CMakePluginReference(Path(self.string()), self.string(), self.string(), self.word())
+            for _ in range(self.word())
+        )
+        generated_sources = set(self.string_list())
+        unresolved_files = [
+            FileInformation(self.string(), Path(self.string()), self.word())
+            for _ in range(self.word())
+        ]
+        unprocessed_commands = [
+            CommandInformation(self.string(), self.string_list(), self.string(), Path(self.string()), self.word())
+            for _ in range(self.word())
+        ]
+        truncated = bool(self.word())
+        return CMakeInfo(cmake_file, keyed_targets, plugin_references, generated_sources, unresolved_files,
+                         unprocessed_commands, truncated=truncated)
+
+
+def decode(data: bytes | bytearray | memoryview) -> CMakeInfo:
+    """Decodes a CMakeInfo from the binary format produced by :func:`encode`.
+
+    Raises
+    ------
+    UnsupportedFormatError
+        if the data is not in the binary format, or was written by an unsupported version
+
+    """
+    view = memoryview(data)
+    if view.nbytes < _HEADER.size:
+        raise UnsupportedFormatError("data is too short to be an encoded CMakeInfo")
+    magic, version, n_strings, text_length, n_words = _HEADER.unpack_from(view)
+    if magic != BINARY_MAGIC:
+        raise UnsupportedFormatError("data is not an encoded CMakeInfo")
+    if version != BINARY_VERSION:
+        raise UnsupportedFormatError(f"unsupported version {version} (expected {BINARY_VERSION})")
+    offset = _HEADER.size
+    lengths = view[offset:offset + 4 * n_strings].cast("I")
+    offset += 4 * n_strings
+    text = str(view[offset:offset + text_length], "utf-8", "surrogatepass")
+    offset += text_length + (-text_length % 4)
+    words: t.Sequence[int] = view[offset:offset + 4 * n_words].cast("I")
+    if sys.byteorder != "little":
+        swapped_lengths = array("I", lengths)
+        swapped_lengths.byteswap()
+        lengths = memoryview(swapped_lengths)
+        swapped_words = array("I", words)
+        swapped_words.byteswap()
+        words = swapped_words
+    ends = list(accumulate(lengths))
+    strings = [text[end - length:end] for length, end in zip(lengths, ends, strict=True)]
+    return _Decoder(strings, words).info()
@@ -0,0 +1,255 @@
+"""Analyzes packages on request in forked processes, so that each request does not pay for starting Python.
+
+A pipeline that runs the analyzer once per package spends most of each run starting the interpreter, importing the
+extractors and their dependencies, and compiling the regular expressions that they use. A :class:`ForkServer` does
+all of that once: it imports both extractors and analyzes a small package of each ROS version to warm them up,
+freezes the objects that it has made so that the garbage collector does not write to their pages, and then forks a
+child to handle each connection to a Unix domain socket. The child shares the memory of the server until it writes
+to it, and exits once it has answered. From the command line::
+
+    python -m ros_cmake_analyzer.server serve /tmp/ros-cmake-analyzer.sock &
+    python -m ros_cmake_analyzer.server request /tmp/ros-cmake-analyzer.sock ros1 ~/catkin_ws/src/foo
+
+A request is a line of JSON, such as ``{"ros": "ros1", "package": "/abs/path/foo", "resilient": false}``, and the
+response is a single line, which is either the result of the package in the format of
+:class:`ros_cmake_analyzer.serialization.JSONLinesWriter`, or an object with an "error". As the protocol is plain
+text, a pipeline can also talk to the server without starting Python at all, for example with ``socat``.
+
+This module only imports the standard library until a server is started, so that the client is quick to start.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "AnalysisError",
+    "ForkServer",
+    "request",
+)
+
+import json
+import os
+import signal
+import socket
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+# Avoids importing typing, which is a noticeable part of the time taken to start the client
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as t
+    from types import TracebackType
+
+    from .model import CMakeInfo
+
+_WARM_UP_PACKAGE_XML = ('<?xml version="1.0"?>\n<package format="{format}"><name>warm_up</name>'
+                        "<version>0.0.0</version><description>warm up</description>"
+                        "<maintainer email='warm@up.org'>warm up</maintainer><license>BSD</license>"
+                        "<buildtool_depend>{buildtool}</buildtool_depend><depend>roscpp</depend>"
+                        "<export>{export}</export></package>\n")
+_WARM_UP_CMAKELISTS = """\
+cmake_minimum_required(VERSION 3.5)
+project(warm_up)
+{find_package}
+include_directories(include ${{catkin_INCLUDE_DIRS}})
+set(SOURCES src/a.cpp)
+list(APPEND SOURCES src/b.cpp)
+file(GLOB EXTRA src/*.cpp)
+macro(add_tool name)
+  add_executable(${{name}} src/${{name}}.cpp)
+  target_link_libraries(${{name}} ${{catkin_LIBRARIES}})
+endmacro()
+foreach(tool a b)
+  if(tool STREQUAL "a")
+    add_tool(${{tool}})
+  endif()
+endforeach()
+add_library(warm_up_lib ${{SOURCES}})
+set_target_properties(warm_up_lib PROPERTIES OUTPUT_NAME warm_up)
+install(TARGETS warm_up_lib DESTINATION lib)
+{footer}
+"""
+
+
+class AnalysisError(RuntimeError):
+    """Raised by :func:`request` when the server could not analyze a package."""
+
+
+def _warm_up(ros_version: str, directory: Path) -> None:
+    """Analyzes a small package, which imports and initializes everything that the extractor uses."""
+    from .batch import extractor_for
+    if ros_version == "ros1":
+        xml = {"format": 2, "buildtool": "catkin", "export": ""}
+        cmake = {"find_package": "find_package(catkin REQUIRED COMPONENTS roscpp)\ncatkin_package()", "footer": ""}
+    else:
+        xml = {"format": 3, "buildtool": "ament_cmake", "export": "<build_type>ament_cmake</build_type>"}
+        cmake = {"find_package": "find_package(ament_cmake REQUIRED)", "footer": "ament_package()"}
+    package_dir = directory / ros_version
+    (package_dir / "src").mkdir(parents=True)
+    (package_dir / "package.xml").write_text(_WARM_UP_PACKAGE_XML.format(**xml))
+    (package_dir / "CMakeLists.txt").write_text(_WARM_UP_CMAKELISTS.format(**cmake))
+    for source in ("a.cpp", "b.cpp"):
+        (package_dir / "src" / source).write_text("int main() { return 0; }\n")
+    extractor_for(ros_version)(package_dir).get_cmake_info()
+
+
+def _analyze(message: dict[str, t.Any]) -> str:
+    """Returns the response to a request, as a line of JSON Lines."""
+    import io
+
+    from .batch import extractor_for
+    from .serialization import JSONLinesWriter
+    extractor = extractor_for(message["ros"])(Path(message["package"]), resilient=message.get("resilient", False))
+    info = extractor.get_cmake_info()
+    buffer = io.StringIO()
+    JSONLinesWriter(buffer).add(extractor.package, info)
+    return buffer.getvalue()
+
+
+class ForkServer:
+    """Listens on a Unix domain socket, and forks a child from a warmed-up process to answer each request.
+
+    The socket is listening as soon as the server is created, so that clients that connect while it warms up wait
+    for it rather than failing. It is bound to a temporary name and then renamed to the address, so that the
+    address only exists once connections to it are accepted.
+    """
+
+    def __init__(self, address: Path) -> None:
+        self.address = address
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        temporary = address.with_name(f"{address.name}.{os.getpid()}.tmp")
+        try:
+            self._socket.bind(str(temporary))
+            self._socket.listen()
+            temporary.replace(address)
+        except BaseException:
+            self._socket.close()
+            temporary.unlink(missing_ok=True)
+            raise
+
+    def warm_up(self) -> None:
+        import gc
+        import tempfile
+        with tempfile.TemporaryDirectory() as directory:
+            for ros_version in ("ros1", "ros2"):
+                _warm_up(ros_version, Path(directory))
+        # Objects that the garbage collector examines are written to, which would copy their pages into each child
+        gc.collect()
+        gc.freeze()
+
+    def __enter__(self) -> t.Self:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def serve_forever(self) -> None:
+        while True:
+            connection, _ = self._socket.accept()
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    self._socket.close()
+                    self._handle(connection)
+                    status = 0
+                finally:
+                    # The child must never return into the accept loop of the server
+                    os._exit(status)
+            connection.close()
+            self._reap()
+
+    @staticmethod
+    def _reap() -> None:
+        """Collects the exit status of each child that has finished, so that they do not linger as zombies."""
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0] != 0:
+                pass
+        except ChildProcessError:
+            pass
+
+    @staticmethod
+    def _handle(connection: socket.socket) -> None:
+        with connection, connection.makefile("rwb") as f:
+            try:
+                response = _analyze(json.loads(f.readline()))
+            except Exception as e:  # noqa: BLE001  Any failure is reported to the client
+                response = json.dumps({"error": f"{type(e).__name__}: {e}"}) + "\n"
+            f.write(response.encode("utf-8"))
+
+    def close(self) -> None:
+        self._socket.close()
+        self.address.unlink(missing_ok=True)
+
+
+def _request_line(address: Path, ros_version: str, package_dir: str | Path, *, resilient: bool) -> str:
+    message = {"ros": ros_version, "package": os.path.abspath(package_dir), "resilient": resilient}  # noqa: PTH100
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(address))
+        client.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with client.makefile("rb") as f:
+            return f.readline().decode("utf-8")
+
+
+def request(
+        address: Path,
+        ros_version: str,
+        package_dir: str | Path,
+        *,
+        resilient: bool = False,
+) -> tuple[str, Path, CMakeInfo]:
+    """Asks the server listening at an address to analyze a package, and returns its name, path and result.
+
+    Raises
+    ------
+    AnalysisError
+        if the server could not analyze the package
+
+    """
+    line = _request_line(address, ros_version, package_dir, resilient=resilient)
+    if not line:
+        raise AnalysisError(f"{package_dir}: the server closed the connection without a response")
+    if line.startswith('{"error"'):
+        raise AnalysisError(f"{package_dir}: {json.loads(line)['error']}")
+    import io
+
+    from .serialization import JSONLinesWriter
+    return next(JSONLinesWriter.read(io.StringIO(line)))
+
+
+def main(arguments: list[str]) -> None:
+    parser = ArgumentParser(prog="python -m ros_cmake_analyzer.server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Answer requests until terminated")
+    serve.add_argument("address", type=Path, help="The path of the Unix domain socket to listen on")
+    send = subparsers.add_parser("request", help="Ask a server to analyze a package, and print its result")
+    send.add_argument("address", type=Path, help="The path of the Unix domain socket of the server")
+    send.add_argument("ros", type=str, choices=["ros1", "ros2"], help="The ROS major version of the package")
+    send.add_argument("dir", type=str, help="The directory of the package")
+    send.add_argument("--resilient", action="store_true", help="Skip syntax errors rather than failing")
+    args = parser.parse_args(arguments)
+
+    if args.command == "request":
+        line = _request_line(args.address, args.ros, args.dir, resilient=args.resilient)
+        sys.stdout.write(line)
+        if not line or line.startswith('{"error"'):
+            sys.exit(1)
+        return
+
+    # The socket is removed when the server is terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with ForkServer(args.address) as server:
+        try:
+            server.warm_up()
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
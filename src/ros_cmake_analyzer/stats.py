@@ -0,0 +1,152 @@
+"""Opt-in measurements of where the time goes when a package is analyzed.
+
+Statistics are only collected by extractors that are created with ``collect_stats=True``, and are then attached to
+the resulting :class:`ros_cmake_analyzer.model.CMakeInfo` as its ``stats``. They record:
+
+* the time spent lexing, parsing and expanding (evaluating variables, macros and control flow) each CMake file,
+* the number of calls to, and the cumulative time spent in, the handler of each CMake command,
+* the number of filesystem operations of each kind that the handlers perform, and
+* the number of bytes read from CMake files.
+
+The time of a handler includes the time taken by any files that it processes itself, so that of
+``add_subdirectory`` includes the time taken by the CMakeLists.txt of the subdirectory. The statistics of many
+packages are combined with :meth:`AnalysisStats.merge`, as :class:`ros_cmake_analyzer.batch.BatchAnalyzer` does
+when it is created with ``collect_stats=True``.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "AnalysisStats",
+    "FileStats",
+    "HandlerStats",
+)
+
+import typing as t
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class FileStats:
+    """The time spent on each phase of processing a single CMake file, in seconds."""
+
+    lex_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    expand_seconds: float = 0.0
+    bytes_read: int = 0
+
+    @property
+    def seconds(self) -> float:
+        return self.lex_seconds + self.parse_seconds + self.expand_seconds
+
+    def merge(self, other: FileStats) -> None:
+        self.lex_seconds += other.lex_seconds
+        self.parse_seconds += other.parse_seconds
+        self.expand_seconds += other.expand_seconds
+        self.bytes_read += other.bytes_read
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "lex_seconds": self.lex_seconds,
+            "parse_seconds": self.parse_seconds,
+            "expand_seconds": self.expand_seconds,
+            "bytes_read": self.bytes_read,
+        }
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> FileStats:
+        return FileStats(info["lex_seconds"], info["parse_seconds"], info["expand_seconds"], info["bytes_read"])
+
+
+@dataclass(slots=True)
+class HandlerStats:
+    """The number of calls to the handler of a CMake command, and the time spent in them, in seconds."""
+
+    calls: int = 0
+    seconds: float = 0.0
+
+    def merge(self, other: HandlerStats) -> None:
+        self.calls += other.calls
+        self.seconds += other.seconds
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {"calls": self.calls, "seconds": self.seconds}
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> HandlerStats:
+        return HandlerStats(info["calls"], info["seconds"])
+
+
+@dataclass(slots=True)
+class AnalysisStats:
+    """Measurements taken while analyzing one or more packages.
+
+    Attributes
+    ----------
+    files: dict[str, FileStats]
+        The phases of processing each CMake file, keyed by its path
+    handlers: dict[str, HandlerStats]
+        The calls to the handler of each CMake command, keyed by the (lowercase) name of the command
+    filesystem: dict[str, int]
+        The number of filesystem operations of each kind, such as "glob" or "is_file"
+    packages: int
+        The number of packages that the statistics cover
+
+    """
+
+    files: dict[str, FileStats] = field(default_factory=dict)
+    handlers: dict[str, HandlerStats] = field(default_factory=dict)
+    filesystem: dict[str, int] = field(default_factory=dict)
+    packages: int = 1
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(file.bytes_read for file in self.files.values())
+
+    def file(self, filename: str) -> FileStats:
+        """Returns the statistics for a CMake file, which are created on first use."""
+        stats = self.files.get(filename)
+        if stats is None:
+            stats = self.files[filename] = FileStats()
+        return stats
+
+    def record_handler(self, command: str, seconds: float) -> None:
+        stats = self.handlers.get(command)
+        if stats is None:
+            stats = self.handlers[command] = HandlerStats()
+        stats.calls += 1
+        stats.seconds += seconds
+
+    def count(self, operation: str, calls: int = 1) -> None:
+        """Records calls to a filesystem operation."""
+        self.filesystem[operation] = self.filesystem.get(operation, 0) + calls
+
+    def slowest_handlers(self, n: int = 10) -> list[tuple[str, HandlerStats]]:
+        """Returns the n handlers with the greatest cumulative time, slowest first."""
+        return sorted(self.handlers.items(), key=lambda item: item[1].seconds, reverse=True)[:n]
+
+    def merge(self, other: AnalysisStats) -> None:
+        """Adds the statistics of other to these ones."""
+        for filename, stats in other.files.items():
+            self.file(filename).merge(stats)
+        for command, stats in other.handlers.items():
+            self.handlers.setdefault(command, HandlerStats()).merge(stats)
+        for operation, calls in other.filesystem.items():
+            self.count(operation, calls)
+        self.packages += other.packages
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "files": {filename: stats.to_dict() for filename, stats in self.files.items()},
+            "handlers": {command: stats.to_dict() for command, stats in self.handlers.items()},
+            "filesystem": dict(self.filesystem),
+            "packages": self.packages,
+        }
+
+    @classmethod
+    def from_dict(cls, info: dict[str, t.Any]) -> AnalysisStats:
+        return AnalysisStats(
+            files={filename: FileStats.from_dict(stats) for filename, stats in info["files"].items()},
+            handlers={command: HandlerStats.from_dict(stats) for command, stats in info["handlers"].items()},
+            filesystem=dict(info["filesystem"]),
+            packages=info["packages"],
+        )
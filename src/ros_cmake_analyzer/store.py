@@ -0,0 +1,409 @@
+"""Stores the results of analyzing many packages in a single SQLite database.
+
+The database is normalized so that the common questions asked of a workspace, such as which targets compile a
+given source file, or which targets are nodelet libraries, can be answered through indexes rather than by loading
+every result. Source files are interned in a single table of paths and shared between targets.
+
+The store can be used as a sink for a :class:`ros_cmake_analyzer.batch.BatchAnalyzer`, or from the command line::
+
+    python -m ros_cmake_analyzer.store results.db ingest ros1 ~/catkin_ws/src
+    python -m ros_cmake_analyzer.store results.db ingest ros1 ~/catkin_ws/src --workers 8 --trace run.json
+    python -m ros_cmake_analyzer.store results.db sources src/foo.cpp
+    python -m ros_cmake_analyzer.store results.db kind library
+"""
+from __future__ import annotations
+
+__all__ = (
+    "PackageRecord",
+    "ResultStore",
+    "TargetRecord",
+)
+
+import json
+import sqlite3
+import sys
+import typing as t
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from pathlib import Path
+
+if t.TYPE_CHECKING:
+    from types import TracebackType
+
+    from .core.package import Package
+    from .model import CMakeInfo, CMakeTarget
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packages (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    cmake_file TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    relative TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS targets (
+    id INTEGER PRIMARY KEY,
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    language TEXT NOT NULL,
+    entrypoint TEXT,
+    cmakelists_file TEXT NOT NULL,
+    cmakelists_line INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS target_sources (
+    target_id INTEGER NOT NULL REFERENCES targets(id) ON DELETE CASCADE,
+    path_id INTEGER NOT NULL REFERENCES paths(id),
+    PRIMARY KEY (target_id, path_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS target_includes (
+    target_id INTEGER NOT NULL REFERENCES targets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    directory TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS target_libraries (
+    target_id INTEGER NOT NULL REFERENCES targets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    library TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plugin_references (
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    plugin_xml TEXT NOT NULL,
+    base_class_package TEXT NOT NULL,
+    cmakelists_file TEXT NOT NULL,
+    cmakelists_line INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unresolved_files (
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    cmake_file TEXT NOT NULL,
+    cmake_line_no INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unprocessed_commands (
+    package_id INTEGER NOT NULL REFERENCES packages(id) ON DELETE CASCADE,
+    command TEXT NOT NULL,
+    args TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    cmake_file TEXT NOT NULL,
+    cmake_line_no INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paths_relative ON paths(relative);
+CREATE INDEX IF NOT EXISTS targets_package ON targets(package_id);
+CREATE INDEX IF NOT EXISTS targets_name ON targets(name);
+CREATE INDEX IF NOT EXISTS targets_kind ON targets(kind);
+CREATE INDEX IF NOT EXISTS target_sources_path ON target_sources(path_id);
+CREATE INDEX IF NOT EXISTS target_includes_target ON target_includes(target_id);
+CREATE INDEX IF NOT EXISTS target_libraries_target ON target_libraries(target_id);
+CREATE INDEX IF NOT EXISTS target_libraries_library ON target_libraries(library);
+CREATE INDEX IF NOT EXISTS plugin_references_package ON plugin_references(package_id);
+CREATE INDEX IF NOT EXISTS plugin_references_base ON plugin_references(base_class_package);
+CREATE INDEX IF NOT EXISTS unresolved_files_package ON unresolved_files(package_id);
+CREATE INDEX IF NOT EXISTS unprocessed_commands_package ON unprocessed_commands(package_id);
+CREATE INDEX IF NOT EXISTS unprocessed_commands_command ON unprocessed_commands(command);
+"""
+
+_SELECT_TARGETS = """
+SELECT packages.name, packages.path, targets.key, targets.name, targets.kind, targets.language,
+       targets.entrypoint, targets.cmakelists_file, targets.cmakelists_line
+FROM targets JOIN packages ON packages.id = targets.package_id
+"""
+# Selects the targets that compile a source, by its absolute path or by its path relative to its package
+_WHERE_COMPILES_PATH = ("targets.id IN (SELECT target_sources.target_id FROM target_sources JOIN paths"
+                        " ON paths.id = target_sources.path_id WHERE paths.path = ?)")
+_WHERE_COMPILES_RELATIVE = ("targets.id IN (SELECT target_sources.target_id FROM target_sources JOIN paths"
+                            " ON paths.id = target_sources.path_id WHERE paths.relative = ?)")
+
+
+@dataclass(frozen=True)
+class PackageRecord:
+    name: str
+    path: Path
+    cmake_file: Path
+
+
+@dataclass(frozen=True)
+class TargetRecord:
+    """A target as it is stored in the database.
+
+    Attributes
+    ----------
+    package: str
+        The name of the package that defines the target
+    package_path: Path
+        The directory of the package that defines the target
+    key: str
+        The key of the target in CMakeInfo.targets. Nodelets may be stored under several keys.
+    kind: str
+        The kind of the target (see CMakeTarget.kind)
+
+    """
+
+    package: str
+    package_path: Path
+    key: str
+    name: str
+    kind: str
+    language: str
+    entrypoint: str | None
+    cmakelists_file: str
+    cmakelists_line: int
+
+
+class ResultStore:
+    """A SQLite database of the CMakeInfo for many packages.
+
+    Packages are written in batches: each call to :meth:`add` is buffered, and every `batch_size` packages are
+    written to the database in a single transaction. Call :meth:`flush` (or use the store as a context manager)
+    to write any remaining packages. If the block of a context manager raises an exception, the remaining packages
+    are discarded instead. Adding a package that is already in the store replaces it.
+    """
+
+    def __init__(self, filename: str | Path, batch_size: int = 500) -> None:
+        self.filename = Path(filename)
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(self.filename, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+        self._check_schema_version()
+        self._pending: list[tuple[Package, CMakeInfo]] = []
+        self._path_ids: dict[str, int] = {}
+
+    def __enter__(self) -> t.Self:
+        return self
+
+    def __exit__(
+            self,
+            exc_type: type[BaseException] | None,
+            exc_value: BaseException | None,
+            traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is not None:
+            # The packages of an unfinished batch are discarded rather than committed along with a failed run
+            self._pending.clear()
+        self.close()
+
+    def _check_schema_version(self) -> None:
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if row is None:
+            self._connection.execute("INSERT INTO meta (key, value) VALUES ('schema_version', ?)",
+                                     (str(SCHEMA_VERSION),))
+        elif int(row[0]) != SCHEMA_VERSION:
+            raise ValueError(f"{self.filename} uses schema version {row[0]}, but {SCHEMA_VERSION} is required")
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self._pending.append((package, info))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            for package, info in self._pending:
+                self._insert(cursor, package, info)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            # Path ids that were allocated during the failed transaction no longer exist
+            self._path_ids.clear()
+            raise
+        cursor.execute("COMMIT")
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def _path_id(self, cursor: sqlite3.Cursor, path: str, relative: str) -> int:
+        path_id = self._path_ids.get(path)
+        if path_id is None:
+            row = cursor.execute("SELECT id FROM paths WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                cursor.execute("INSERT INTO paths (path, relative) VALUES (?, ?)", (path, relative))
+                path_id = t.cast(int, cursor.lastrowid)
+            else:
+                path_id = row[0]
+            self._path_ids[path] = path_id
+        return path_id
+
+    def _insert(self, cursor: sqlite3.Cursor, package: Package, info: CMakeInfo) -> None:
+        package_path = package.path.resolve()
+        cursor.execute("DELETE FROM packages WHERE path = ?", (str(package_path),))
+        cursor.execute("INSERT INTO packages (name, path, cmake_file) VALUES (?, ?, ?)",
+                       (package.name, str(package_path), str(info.cmake_file)))
+        package_id = cursor.lastrowid
+
+        for key, target in info.targets.items():
+            cursor.execute(
+                "INSERT INTO targets (package_id, key, name, kind, language, entrypoint, cmakelists_file,"
+                " cmakelists_line) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (package_id, key, target.name, target.kind, target.language.value, _entrypoint(target),
+                 str(target.cmakelists_file), int(target.cmakelists_line)),
+            )
+            target_id = cursor.lastrowid
+            path_ids = {
+                self._path_id(cursor, str(package_path / source), str(_relative_to(Path(source), package_path)))
+                for source in target.sources
+            }
+            cursor.executemany("INSERT INTO target_sources (target_id, path_id) VALUES (?, ?)",
+                               [(target_id, path_id) for path_id in path_ids])
+            cursor.executemany("INSERT INTO target_includes (target_id, position, directory) VALUES (?, ?, ?)",
+                               [(target_id, i, str(d)) for i, d in enumerate(target.includes)])
+            cursor.executemany("INSERT INTO target_libraries (target_id, position, library) VALUES (?, ?, ?)",
+                               [(target_id, i, library) for i, library in enumerate(target.libraries)])
+
+        cursor.executemany(
+            "INSERT INTO plugin_references (package_id, plugin_xml, base_class_package, cmakelists_file,"
+            " cmakelists_line) VALUES (?, ?, ?, ?, ?)",
+            [(package_id, str(ref.plugin_xml), ref.base_class_package, str(ref.cmakelists_file),
+              int(ref.cmakelists_line)) for ref in info.plugin_references],
+        )
+        cursor.executemany(
+            "INSERT INTO unresolved_files (package_id, filename, cmake_file, cmake_line_no) VALUES (?, ?, ?, ?)",
+            [(package_id, f.filename, str(f.cmake_file), f.cmake_line_no) for f in info.unresolved_files],
+        )
+        cursor.executemany(
+            "INSERT INTO unprocessed_commands (package_id, command, args, reason, cmake_file, cmake_line_no)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(package_id, c.command, json.dumps(c.args), c.reason, str(c.cmake_file), c.cmake_line_no)
+             for c in info.unprocessed_commands],
+        )
+
+    def _targets(self, where: str, parameters: tuple[t.Any, ...]) -> list[TargetRecord]:
+        self.flush()
+        rows = self._connection.execute(f"{_SELECT_TARGETS} WHERE {where} ORDER BY targets.id", parameters)
+        return [TargetRecord(row[0], Path(row[1]), *row[2:]) for row in rows]
+
+    def packages(self) -> list[PackageRecord]:
+        self.flush()
+        rows = self._connection.execute("SELECT name, path, cmake_file FROM packages ORDER BY name")
+        return [PackageRecord(name, Path(path), Path(cmake_file)) for name, path, cmake_file in rows]
+
+    def targets_compiling(self, source: str | Path) -> list[TargetRecord]:
+        """Returns the targets that compile a given source file.
+
+        An absolute path is matched exactly; a relative path is matched against the path of the source relative
+        to each package, so that "src/foo.cpp" finds the targets in every package with such a file.
+        """
+        source = Path(source)
+        where = _WHERE_COMPILES_PATH if source.is_absolute() else _WHERE_COMPILES_RELATIVE
+        return self._targets(where, (str(source),))
+
+    def targets_of_kind(self, kind: str) -> list[TargetRecord]:
+        return self._targets("targets.kind = ?", (kind,))
+
+    def targets_named(self, name: str) -> list[TargetRecord]:
+        return self._targets("targets.name = ?", (name,))
+
+    def targets_linking(self, library: str) -> list[TargetRecord]:
+        return self._targets(
+            "targets.id IN (SELECT target_id FROM target_libraries WHERE library = ?)",
+            (library,),
+        )
+
+    def sources_of(self, package: str, key: str) -> list[Path]:
+        self.flush()
+        rows = self._connection.execute(
+            "SELECT paths.path FROM target_sources"
+            " JOIN paths ON paths.id = target_sources.path_id"
+            " JOIN targets ON targets.id = target_sources.target_id"
+            " JOIN packages ON packages.id = targets.package_id"
+            " WHERE packages.name = ? AND targets.key = ? ORDER BY paths.path",
+            (package, key),
+        )
+        return [Path(row[0]) for row in rows]
+
+    def unprocessed_command_counts(self) -> list[tuple[str, int]]:
+        """Returns how often each unprocessed command occurs, most frequent first."""
+        self.flush()
+        rows = self._connection.execute(
+            "SELECT command, COUNT(*) AS n FROM unprocessed_commands GROUP BY command ORDER BY n DESC, command",
+        )
+        return [(command, count) for command, count in rows]
+
+
+def _entrypoint(target: CMakeTarget) -> str | None:
+    return t.cast(str | None, getattr(target, "entrypoint", None))
+
+
+def _relative_to(source: Path, package_path: Path) -> Path:
+    if not source.is_absolute():
+        return source
+    try:
+        return source.relative_to(package_path)
+    except ValueError:
+        return source
+
+
+def _print_targets(targets: list[TargetRecord]) -> None:
+    for target in targets:
+        print(f"{target.package}\t{target.key}\t{target.kind}\t{target.cmakelists_file}:{target.cmakelists_line}")
+
+
+def main(arguments: list[str]) -> None:
+    parser = ArgumentParser(prog="python -m ros_cmake_analyzer.store")
+    parser.add_argument("database", type=Path, help="The SQLite database to use")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Analyze packages and add them to the database")
+    ingest.add_argument("ros", type=str, choices=["ros1", "ros2"], help="The ROS major version of the packages")
+    ingest.add_argument("dirs", type=Path, nargs="+", help="Packages, or directories that contain packages")
+    ingest.add_argument("--batch-size", type=int, default=500, help="The number of packages per transaction")
+    ingest.add_argument("--workers", type=int, default=1, help="The number of worker processes to use")
+    ingest.add_argument("--trace", type=Path, help="Write a Chrome trace of the analysis to this file")
+    ingest.add_argument("--trace-threshold", type=float, default=0.001,
+                        help="The shortest command handler call, in seconds, to include in the trace")
+
+    sources = subparsers.add_parser("sources", help="List the targets that compile a source file")
+    sources.add_argument("source", type=str, help="An absolute path, or a path relative to a package")
+
+    kind = subparsers.add_parser("kind", help="List the targets of a given kind")
+    kind.add_argument("kind", type=str, choices=["target", "binary", "library", "incomplete_library"])
+
+    library = subparsers.add_parser("links", help="List the targets that link against a library")
+    library.add_argument("library", type=str)
+
+    subparsers.add_parser("unprocessed", help="Count the commands that were not processed")
+
+    args = parser.parse_args(arguments)
+    with ResultStore(args.database, batch_size=getattr(args, "batch_size", 500)) as store:
+        if args.action == "ingest":
+            from .batch import BatchAnalyzer, find_packages
+            package_dirs = [package for directory in args.dirs for package in find_packages(directory)]
+            tracer = None
+            if args.trace is not None:
+                from .trace import Tracer
+                tracer = Tracer(args.trace_threshold)
+            report = BatchAnalyzer(args.ros, sinks=[store], workers=args.workers, tracer=tracer).run(package_dirs)
+            if tracer is not None:
+                tracer.write(args.trace)
+            print(f"Added {len(report.analyzed)} packages ({len(report.failed)} failed)")
+            for path, reason in report.failed.items():
+                print(f"{path}\t{reason}")
+        elif args.action == "sources":
+            _print_targets(store.targets_compiling(args.source))
+        elif args.action == "kind":
+            _print_targets(store.targets_of_kind(args.kind))
+        elif args.action == "links":
+            _print_targets(store.targets_linking(args.library))
+        elif args.action == "unprocessed":
+            for command, count in store.unprocessed_command_counts():
+                print(f"{count}\t{command}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
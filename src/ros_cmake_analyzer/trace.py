@@ -0,0 +1,129 @@
+"""Records a timeline of an analysis as spans, and writes it in the Chrome trace event format.
+
+While a :class:`Tracer` is active, the analysis records a span for each package, for each CMake file that it
+processes, for each descent into a subdirectory, for each plugin description file that it parses, and for each call
+to a command handler that takes longer than the threshold of the tracer. Spans are written as complete ("X")
+events, so the resulting JSON file can be opened with ``chrome://tracing`` or https://ui.perfetto.dev as is::
+
+    tracer = Tracer(handler_threshold=0.005)
+    BatchAnalyzer("ros1", workers=8, tracer=tracer).run(find_packages(workspace))
+    tracer.write("analysis.trace.json")
+
+Each worker process of a batch run records its own spans and sends them to the parent with each result, so that
+every worker appears as a separate process track, and the gaps between its packages show how long it sat idle.
+Timestamps are taken from :func:`time.perf_counter_ns`, which is shared by all the processes on a machine.
+
+Tracing is off unless a tracer is active, and the instrumentation then reduces to a check of :data:`current`.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "Tracer",
+    "activate",
+    "current",
+    "span",
+)
+
+import contextlib
+import os
+import threading
+import time
+import typing as t
+
+if t.TYPE_CHECKING:
+    from pathlib import Path
+
+# The active tracer, if any
+current: Tracer | None = None
+
+
+class Tracer:
+    """Collects spans as trace events.
+
+    Parameters
+    ----------
+    handler_threshold: float
+        Calls to command handlers that take at least this many seconds are recorded. Other spans are always recorded.
+
+    """
+
+    def __init__(self, handler_threshold: float = 0.001) -> None:
+        self.handler_threshold = handler_threshold
+        self.handler_threshold_ns = int(handler_threshold * 1e9)
+        self.events: list[dict[str, t.Any]] = []
+        self._process_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def complete(
+            self,
+            name: str,
+            category: str,
+            start_ns: int,
+            end_ns: int,
+            args: dict[str, t.Any] | None = None,
+    ) -> None:
+        """Records a span that started and ended at the given times, as given by time.perf_counter_ns."""
+        event: dict[str, t.Any] = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, args: dict[str, t.Any] | None = None) -> t.Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, time.perf_counter_ns(), args)
+
+    def name_process(self, pid: int, name: str) -> None:
+        """Gives the track of a process a name, such as that of a worker."""
+        self._process_names[pid] = name
+
+    def take(self) -> list[dict[str, t.Any]]:
+        """Removes and returns the events that have been recorded so far."""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def extend(self, events: t.Iterable[dict[str, t.Any]]) -> None:
+        """Adds events that were recorded elsewhere, such as by a worker process."""
+        with self._lock:
+            self.events.extend(events)
+
+    def to_json(self) -> dict[str, t.Any]:
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+                    for pid, name in self._process_names.items()]
+        return {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str | Path) -> None:
+        import json
+        with open(path, "w", encoding="utf-8") as f:  # noqa: PTH123
+            json.dump(self.to_json(), f)
+
+
+def activate(tracer: Tracer | None) -> Tracer | None:
+    """Makes a tracer the active one, or turns tracing off if it is None, and returns the tracer that was active."""
+    global current
+    previous, current = current, tracer
+    return previous
+
+
+def span(name: str, category: str, args: dict[str, t.Any] | None = None) -> t.ContextManager[None]:
+    """Records a span with the active tracer, if there is one."""
+    tracer = current
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, category, args)
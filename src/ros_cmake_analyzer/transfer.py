@@ -0,0 +1,120 @@
+"""Moves encoded results from worker processes to the parent without pickling them.
+
+A worker encodes its result with :func:`ros_cmake_analyzer.serialization.encode` and writes it either to a
+:mod:`multiprocessing.shared_memory` segment, or to the end of a spool file that belongs to the worker. Only a
+small handle is sent back over the pipe. The parent maps the data and decodes it in place, and releases it once
+every sink has seen it.
+"""
+from __future__ import annotations
+
+__all__ = (
+    "EncodedResult",
+    "SharedMemoryResult",
+    "SpoolFile",
+    "SpoolResult",
+    "to_shared_memory",
+)
+
+import contextlib
+import mmap
+import os
+import typing as t
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+
+if t.TYPE_CHECKING:
+    from pathlib import Path
+
+TRANSPORTS = ("shm", "spool", "pickle")
+
+
+class EncodedResult(t.Protocol):
+    """A handle to an encoded result that was written by another process."""
+
+    def attach(self) -> t.ContextManager[memoryview]:
+        """Maps the encoded result into this process."""
+        ...
+
+    def discard(self) -> None:
+        """Frees the storage used by the result."""
+        ...
+
+
+@dataclass(frozen=True, slots=True)
+class SharedMemoryResult:
+    name: str
+    size: int
+
+    @contextlib.contextmanager
+    def attach(self) -> t.Iterator[memoryview]:
+        segment = shared_memory.SharedMemory(self.name)
+        data = segment.buf[:self.size]
+        try:
+            yield data
+        finally:
+            data.release()
+            segment.close()
+
+    def discard(self) -> None:
+        segment = shared_memory.SharedMemory(self.name)
+        segment.close()
+        segment.unlink()
+
+
+def to_shared_memory(data: bytes) -> SharedMemoryResult:
+    """Copies data into a new shared memory segment, which the process that receives the handle must discard."""
+    segment = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    segment.buf[:len(data)] = data
+    result = SharedMemoryResult(segment.name, len(data))
+    # The segment now belongs to the receiver, so the resource tracker of this process must not remove it
+    resource_tracker.unregister(segment._name, "shared_memory")  # type: ignore[attr-defined]
+    segment.close()
+    return result
+
+
+@dataclass(frozen=True, slots=True)
+class SpoolResult:
+    path: str
+    offset: int
+    size: int
+
+    @contextlib.contextmanager
+    def attach(self) -> t.Iterator[memoryview]:
+        # mmap offsets must be a multiple of the allocation granularity
+        start = self.offset - self.offset % mmap.ALLOCATIONGRANULARITY
+        with open(self.path, "rb") as f:  # noqa: PTH123
+            mapped = mmap.mmap(f.fileno(), self.offset - start + self.size, access=mmap.ACCESS_READ, offset=start)
+        view = memoryview(mapped)
+        data = view[self.offset - start:]
+        try:
+            yield data
+        finally:
+            data.release()
+            view.release()
+            mapped.close()
+
+    def discard(self) -> None:
+        # The spool file is removed as a whole once the batch has finished
+        pass
+
+
+class SpoolFile:
+    """An append-only file that a single worker writes its encoded results to."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = path.open("ab")
+
+    def write(self, data: bytes) -> SpoolResult:
+        offset = self._file.tell()
+        self._file.write(data)
+        self._file.flush()
+        return SpoolResult(str(self.path), offset, len(data))
+
+    def close(self) -> None:
+        self._file.close()
+
+    def remove(self) -> None:
+        self.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)  # noqa: PTH108
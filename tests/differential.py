@@ -0,0 +1,319 @@
+"""Runs the optimized CMake parser and extractors next to a frozen reference, and reports where they diverge.
+
+The reference is the parser as it was taken from catkin_lint (see reference_parser.py), and the extractors are
+run against it by swapping it in for the optimized parser, with every process-wide cache cleared. Two things are
+compared exactly:
+
+* the expanded command stream that :class:`ParserContext` yields for a CMake source, or the error it raises, and
+* the :class:`ros_cmake_analyzer.model.CMakeInfo` of a package, which the optimized side computes twice: once with
+  cold caches, and once more with the caches that the first run left behind.
+
+Any divergence is minimized, by delta debugging over the lines and then the words of the CMake source, into a
+small reproducer that is written to the output directory. Usage::
+
+    python tests/differential.py fixtures [--output reproducers/]
+    python tests/differential.py synthetic [--packages 20] [--depth 2]
+    python tests/differential.py fuzz [--count 1000] [--seed 0]
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import random
+import shutil
+import sys
+import tempfile
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+import reference_parser
+
+from ros_cmake_analyzer import extractor as extractor_module
+from ros_cmake_analyzer.batch import extractor_for, find_packages
+from ros_cmake_analyzer.cmake_parser import parser as optimized_parser
+from ros_cmake_analyzer.diagnostics import diagnostics
+
+T = t.TypeVar("T")
+
+FIXTURES = Path(__file__).resolve().parent / "test_packages"
+BENCHMARKS = Path(__file__).resolve().parent.parent / "benchmarks"
+
+
+@dataclass(frozen=True)
+class Divergence:
+    """A difference between the results of the reference and of the optimized implementation."""
+
+    subject: str
+    reference: t.Any
+    optimized: t.Any
+
+    def describe(self) -> str:
+        where, expected, actual = _first_difference(self.reference, self.optimized)
+        return f"{self.subject}: {where or 'the result'} is {actual!r}, but should be {expected!r}"
+
+
+def _first_difference(expected: t.Any, actual: t.Any, where: str = "") -> tuple[str, t.Any, t.Any]:
+    """Returns the location of the first difference between two nested structures, and the values there."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in {**expected, **actual}:
+            if expected.get(key) != actual.get(key):
+                return _first_difference(expected.get(key), actual.get(key), f"{where}[{key!r}]")
+    elif isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            if left != right:
+                return _first_difference(left, right, f"{where}[{index}]")
+        if len(expected) != len(actual):
+            return f"{where} length", len(expected), len(actual)
+    return where, expected, actual
+
+
+def _error(e: Exception) -> tuple[str, str]:
+    # The reference exhausts the stack on deeply nested blocks and recursive functions, which is reported as a
+    # CMakeSyntaxError by the optimized parser. This is the only intended difference between them.
+    if isinstance(e, RecursionError) or "nested too deeply" in str(e):
+        return "CMakeSyntaxError", "nested too deeply"
+    return type(e).__name__, str(e)
+
+
+def command_stream(module: t.Any, source: str, var: dict[str, str] | None = None) -> list[t.Any]:
+    """Returns the commands that a parser module yields for a CMake source, or the error that it raises."""
+    try:
+        return [(command, args, [tuple(token) for token in tokens], location)
+                for command, args, tokens, location in module.ParserContext().parse(source, var=dict(var or {}))]
+    except Exception as e:  # noqa: BLE001
+        return [("<error>", *_error(e))]
+
+
+def compare_source(source: str, var: dict[str, str] | None = None) -> Divergence | None:
+    reference = command_stream(reference_parser, source, var)
+    optimized = command_stream(optimized_parser, source, var)
+    if reference != optimized:
+        return Divergence("command stream", reference, optimized)
+    return None
+
+
+def _clear_caches() -> None:
+    from ros_cmake_analyzer import cpp_index
+    from ros_cmake_analyzer.core import plugin_xml
+    from ros_cmake_analyzer.core.package_xml import reader
+    for cache in (cpp_index._cache, plugin_xml._cache, reader._cache):
+        cache.clear()
+
+
+class _ReferenceParserContext(reference_parser.ParserContext):
+    """Accepts the budget, error list and statistics that the extractor gives to the parser, which the reference
+    parser lacks.
+
+    The packages are only compared without budgets or statistics, and without recovering from syntax errors.
+    """
+
+    def __init__(self, parent: t.Any = None, budget: t.Any = None) -> None:
+        super().__init__(parent)
+
+    def parse(self, *args: t.Any, errors: t.Any = None, stats: t.Any = None, **kwargs: t.Any) -> t.Any:
+        return super().parse(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def using_reference_parser() -> t.Iterator[None]:
+    """Makes the extractors use the reference parser for the duration of the block."""
+    saved = extractor_module.ParserContext, extractor_module.cmake_argparse
+    extractor_module.ParserContext = _ReferenceParserContext
+    extractor_module.cmake_argparse = reference_parser.argparse
+    try:
+        yield
+    finally:
+        extractor_module.ParserContext, extractor_module.cmake_argparse = saved
+
+
+def analyze(ros: str, package: Path) -> t.Any:
+    """Returns the CMakeInfo of a package as a dictionary, or the error that analyzing it raises."""
+    try:
+        with diagnostics.silenced():
+            return extractor_for(ros)(package).get_cmake_info().to_dict()
+    except Exception as e:  # noqa: BLE001
+        return "<error> {}: {}".format(*_error(e))
+
+
+def compare_package(ros: str, package: Path) -> Divergence | None:
+    _clear_caches()
+    with using_reference_parser():
+        reference = analyze(ros, package)
+    _clear_caches()
+    for run in ("cold", "warm"):
+        optimized = analyze(ros, package)
+        if reference != optimized:
+            return Divergence(f"CMakeInfo of {package.name} ({run} caches)", reference, optimized)
+    return None
+
+
+def minimize(items: list[T], fails: t.Callable[[list[T]], bool]) -> list[T]:
+    """Returns a subsequence of items, which still fails, and from which no single chunk can be removed (ddmin)."""
+    granularity = 2
+    while len(items) >= 2:
+        size = -(-len(items) // granularity)
+        chunks = [(start, start + size) for start in range(0, len(items), size)]
+        for start, end in chunks:
+            subset, complement = items[start:end], items[:start] + items[end:]
+            if fails(subset):
+                items, granularity = subset, 2
+                break
+            if len(chunks) > 2 and fails(complement):
+                items, granularity = complement, max(granularity - 1, 2)
+                break
+        else:
+            if granularity >= len(items):
+                break
+            granularity = min(granularity * 2, len(items))
+    return items
+
+
+def minimize_source(source: str, fails: t.Callable[[str], bool]) -> str:
+    """Minimizes a CMake source that fails, first by its lines and then by the words on each of them."""
+    lines = minimize(source.splitlines(), lambda candidate: fails("\n".join(candidate) + "\n"))
+    for index in range(len(lines)):
+        words = lines[index].split(" ")
+
+        def line_fails(candidate: list[str], index: int = index) -> bool:
+            return fails("\n".join([*lines[:index], " ".join(candidate), *lines[index + 1:]]) + "\n")
+
+        lines[index] = " ".join(minimize(words, line_fails))
+    return "\n".join(lines) + "\n"
+
+
+def minimize_package(ros: str, package: Path) -> str:
+    """Minimizes the CMakeLists.txt of a package whose CMakeInfo diverges, in a copy of the package."""
+    with tempfile.TemporaryDirectory() as directory:
+        copy = Path(directory) / package.name
+        shutil.copytree(package, copy)
+        cmakelists = copy / "CMakeLists.txt"
+
+        def fails(source: str) -> bool:
+            cmakelists.write_text(source)
+            return compare_package(ros, copy) is not None
+
+        return minimize_source((package / "CMakeLists.txt").read_text(), fails)
+
+
+def write_reproducer(directory: Path, source: str, divergence: Divergence) -> Path:
+    """Writes a reproducer, named after a hash of its contents, along with a description of the divergence."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"divergence-{hashlib.sha1(source.encode()).hexdigest()[:12]}.cmake"  # noqa: S324
+    path.write_text(source)
+    path.with_suffix(".txt").write_text(divergence.describe() + "\n")
+    return path
+
+
+_NAMES = ("A", "B", "LIST", "A_B", "x")
+# The parser does not evaluate set(), so the variables that the random sources refer to are given values up front
+FUZZ_VARIABLES = {"A": "a", "B": "B", "LIST": "x;y;${A}", "A_B": "nested", "BACKSLASH": "\\\\"}
+_WORDS = ("a", "b;c", "${A}", "${B}", "${LIST}", "${A_${B}}", "${BACKSLASH}${A}", "\\${A}", "$ENV{HOME}",
+          "$<BUILD_INTERFACE:inc>", "$<CONFIG:Debug>", '"quoted ${A}"', '"esc\\;aped"', '"tab\\t"',
+          "[[bracket ${A}]]", "[=[x]]=]", "NAME", "ALL", "APPEND", "")
+
+
+def random_source(rng: random.Random, commands: int = 20) -> str:
+    """Generates a random CMake source, from commands that exercise variables, blocks and calls."""
+    lines: list[str] = []
+    open_blocks: list[str] = []
+
+    def words() -> str:
+        return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(0, 4)))
+
+    for _ in range(commands):
+        choice = rng.random()
+        if choice < 0.3:
+            lines.append(f"set({rng.choice(_NAMES)} {words()})")
+        elif choice < 0.4:
+            lines.append(f"list(APPEND {rng.choice(_NAMES)} {words()})")
+        elif choice < 0.5:
+            lines.append(f"message({words()}) # {words()}")
+        elif choice < 0.6:
+            block = rng.choice(["if", "foreach", "macro", "function"])
+            if block == "if":
+                lines.append(f"if({rng.choice(_WORDS)})")
+            elif block == "foreach":
+                lines.append(rng.choice(["foreach(item ${LIST})", "foreach(item IN LISTS LIST A)",
+                                         "foreach(item RANGE 2)", f"foreach(item {words()})"]))
+            else:
+                lines.append(f"{block}(call_{len(lines) % 3} first {words()})")
+            open_blocks.append(block)
+        elif choice < 0.75 and open_blocks:
+            if open_blocks[-1] == "if" and rng.random() < 0.3:
+                lines.append("else()")
+            else:
+                lines.append(f"end{open_blocks.pop()}()")
+        elif choice < 0.85:
+            lines.append(f"call_{rng.randrange(3)}({words()})")
+        else:
+            lines.append(f"add_executable(${{A}}_node {words()})")
+    # Occasionally leave a block open, to compare the errors that are raised
+    if rng.random() < 0.9:
+        lines.extend(f"end{block}()" for block in reversed(open_blocks))
+    return "\n".join(lines) + "\n"
+
+
+def check_sources(sources: t.Iterable[str], output: Path | None, var: dict[str, str] | None = None) -> int:
+    divergences = 0
+    for source in sources:
+        divergence = compare_source(source, var)
+        if divergence is None:
+            continue
+        divergences += 1
+        reproducer = minimize_source(source, lambda candidate: compare_source(candidate, var) is not None)
+        print(divergence.describe())
+        if output is not None:
+            print(f"  reproducer: {write_reproducer(output, reproducer, compare_source(reproducer, var))}")
+        else:
+            print(f"  reproducer:\n{reproducer}")
+    return divergences
+
+
+def check_packages(ros: str, packages: t.Iterable[Path], output: Path | None) -> int:
+    divergences = 0
+    for package in packages:
+        divergences += check_sources([path.read_text(errors="replace") for path in package.rglob("*")
+                                      if path.name == "CMakeLists.txt" or path.suffix == ".cmake"], output)
+        divergence = compare_package(ros, package)
+        if divergence is None:
+            continue
+        divergences += 1
+        print(divergence.describe())
+        reproducer = minimize_package(ros, package)
+        if output is not None:
+            print(f"  reproducer: {write_reproducer(output, reproducer, divergence)}")
+        else:
+            print(f"  reproducer:\n{reproducer}")
+    return divergences
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["fixtures", "synthetic", "fuzz"])
+    parser.add_argument("--output", type=Path, help="The directory to write reproducers to, rather than stdout")
+    parser.add_argument("--ros", choices=["ros1", "ros2"], default="ros1")
+    parser.add_argument("--packages", type=int, default=20, help="The number of synthetic packages")
+    parser.add_argument("--depth", type=int, default=2, help="The subdirectory depth of synthetic packages")
+    parser.add_argument("--count", type=int, default=1000, help="The number of sources to fuzz")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.mode == "fixtures":
+        divergences = check_packages("ros1", find_packages(FIXTURES), args.output)
+    elif args.mode == "synthetic":
+        sys.path.insert(0, str(BENCHMARKS))
+        from synthetic import WorkspaceSpec, generate_workspace
+        spec = WorkspaceSpec(ros=args.ros, packages=args.packages, depth=args.depth, seed=args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            divergences = check_packages(args.ros, generate_workspace(directory, spec), args.output)
+    else:
+        rng = random.Random(args.seed)
+        divergences = check_sources((random_source(rng) for _ in range(args.count)), args.output, FUZZ_VARIABLES)
+    print(f"{divergences} divergences")
+    if divergences:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""Generates CMake sources from a grammar, to find inputs that crash the parser or take it unreasonably long.
+
+Sources are generated from a grammar of CMake commands, blocks, calls and arguments, and are often made hostile by
+amplifying one feature: deeply nested blocks, huge or unterminated brackets, unterminated strings, a giant
+``foreach(... RANGE ...)``, or macros and functions that call themselves. Each source is parsed in a separate
+process, which is killed if it takes longer than the timeout, and the outcome is either the number of commands that
+the parser yielded, a :class:`CMakeSyntaxError` (which is how the parser reports malformed input), or a crash:
+any other exception, or a hang.
+
+The fuzzer records the worst time taken for inputs of each size (rounded up to a power of two), and adds the
+crashing cases, and the slowest of the others, to a corpus. tests/test_fuzz_corpus.py replays the corpus, and
+checks that each case still gives the outcome that was recorded for it, within a bound on its time. Once a crash
+is fixed, ``--refresh`` records the new outcome of each case, and ``--minimize`` replaces cases with the smallest
+sources that still take the same path through the parser. Usage::
+
+    python tests/fuzz_cmake.py [--count 2000] [--seed 0] [--timeout 5] [--keep 5] [--report report.json]
+    python tests/fuzz_cmake.py --refresh
+    python tests/fuzz_cmake.py --minimize slow-30fa6f14f04a.cmake
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import sys
+import time
+import typing as t
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+CORPUS = Path(__file__).resolve().parent / "fuzz_corpus"
+MANIFEST = "corpus.json"
+# The time that a corpus case may take, relative to the time that was recorded for it, and at the least
+TIME_FACTOR = 10.0
+MIN_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """The result of parsing one source.
+
+    Attributes
+    ----------
+    outcome: str
+        "ok", "hang", or the name of the exception that the parser raised
+    seconds: float
+        The time taken to parse the source, up to the timeout
+    commands: int
+        The number of commands that the parser yielded
+    digest: str
+        A hash of the commands that were yielded, or of the error message
+
+    """
+
+    outcome: str
+    seconds: float
+    commands: int = 0
+    digest: str = ""
+
+    @property
+    def crashed(self) -> bool:
+        return self.outcome not in ("ok", "CMakeSyntaxError")
+
+
+def _digest(value: object) -> str:
+    return hashlib.sha1(repr(value).encode()).hexdigest()  # noqa: S324
+
+
+def parse(source: str) -> Outcome:
+    """Parses a source in this process, and returns the outcome."""
+    from ros_cmake_analyzer.cmake_parser.parser import ParserContext
+    commands = []
+    start = time.perf_counter()
+    try:
+        for command, args, _tokens, location in ParserContext().parse(source, var={}):
+            commands.append((command, args, location))
+    except Exception as e:  # noqa: BLE001
+        return Outcome(type(e).__name__, time.perf_counter() - start, len(commands), _digest(str(e)))
+    return Outcome("ok", time.perf_counter() - start, len(commands), _digest(commands))
+
+
+def _serve(connection: t.Any) -> None:
+    while True:
+        source = connection.recv()
+        connection.send(parse(source))
+
+
+class Runner:
+    """Parses sources in a child process, which is replaced whenever it hangs or dies."""
+
+    def __init__(self) -> None:
+        self._start()
+
+    def _start(self) -> None:
+        context = multiprocessing.get_context("fork")
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child,), daemon=True)
+        self._process.start()
+
+    def _restart(self) -> None:
+        self._process.kill()
+        self._process.join()
+        self._start()
+
+    def run(self, source: str, timeout: float) -> Outcome:
+        self._connection.send(source)
+        if not self._connection.poll(timeout):
+            self._restart()
+            return Outcome("hang", timeout)
+        try:
+            return self._connection.recv()
+        except EOFError:
+            self._restart()
+            return Outcome("died", 0.0)
+
+    def close(self) -> None:
+        self._process.kill()
+        self._process.join()
+
+
+_COMMANDS = ("set", "list", "message", "add_executable", "add_library", "target_link_libraries",
+             "include_directories", "install", "string", "file", "while", "endwhile", "option")
+_WORDS = ("a", "SOURCES", "src/main.cpp", "ON", "OFF", "NOT", "AND", "APPEND", "PUBLIC", "TARGETS", "DESTINATION")
+_ESCAPES = ("\\n", "\\t", "\\;", "\\\"", "\\$", "\\\\")
+
+
+class _Grammar:
+    """Generates one source. size is the number of statements, and hostile the feature to amplify, if any."""
+
+    def __init__(self, rng: random.Random, size: int, hostile: str | None) -> None:
+        self.rng = rng
+        self.size = size
+        self.hostile = hostile
+        self.callables: list[str] = []
+        self.statements = 0
+
+    def source(self) -> str:
+        lines: list[str] = []
+        if self.hostile == "deep_nesting":
+            depth = self.rng.randint(50, 400)
+            blocks = [self.rng.choice(("if", "foreach")) for _ in range(depth)]
+            lines += ["if(a)" if block == "if" else "foreach(x a)" for block in blocks]
+            lines += self.block(0)
+            lines += [f"end{block}()" for block in reversed(blocks)]
+        elif self.hostile == "recursion":
+            kind = self.rng.choice(("macro", "function"))
+            lines += [f"{kind}(recurse_a x)", "  recurse_b(${x})", f"end{kind}()",
+                      f"{kind}(recurse_b x)", "  message(${x})", "  recurse_a(${x})", f"end{kind}()",
+                      "recurse_a(start)"]
+        elif self.hostile == "unterminated_brackets":
+            lines += [f"set(v{i} [{'=' * self.rng.randrange(3)}[ {self.word()})" for i in range(self.size * 20)]
+            lines += [f"#[{'=' * self.rng.randrange(3)}[ comment" for _ in range(self.size * 20)]
+        lines += self.block(0)
+        if self.hostile == "giant_range":
+            lines += [f"foreach(i RANGE {self.rng.randint(1000, 20000)})", "  set(x ${i})", "endforeach()"]
+        elif self.hostile == "huge_bracket":
+            fill = "=" * self.rng.randrange(3)
+            length = self.rng.randint(10**4, 10**5)
+            body = "".join(self.rng.choice(("x", "]", "[", "]]", "\n", ";")) for _ in range(length))
+            lines.append(f"set(v [{fill}[{body}]{fill}])")
+        elif self.hostile == "unterminated_string":
+            lines.append(f'set(v "{self.word()} ' + "x" * self.rng.randint(10**3, 10**5))
+        return "\n".join(lines) + "\n"
+
+    def block(self, depth: int) -> list[str]:
+        lines: list[str] = []
+        while self.statements < self.size:
+            self.statements += 1
+            choice = self.rng.random()
+            if choice < 0.1 and depth < 6:
+                lines += [f"if({self.arguments()})", *self.indent(self.block(depth + 1))]
+                if self.rng.random() < 0.4:
+                    lines += ["else()", *self.indent(self.block(depth + 1))]
+                lines.append("endif()")
+            elif choice < 0.18 and depth < 6:
+                header = self.rng.choice((f"foreach(x {self.arguments()})", "foreach(x IN LISTS SOURCES)",
+                                          "foreach(x IN ITEMS a b)", f"foreach(x RANGE {self.rng.randint(0, 5)})"))
+                lines += [header, *self.indent(self.block(depth + 1)), "endforeach()"]
+            elif choice < 0.24 and depth < 6:
+                kind = self.rng.choice(("macro", "function"))
+                name = f"call_{len(self.callables)}"
+                lines += [f"{kind}({name} first)", *self.indent(self.block(depth + 1)), f"end{kind}()"]
+                self.callables.append(name)
+            elif choice < 0.34 and self.callables:
+                lines.append(f"{self.rng.choice(self.callables)}({self.arguments()})")
+            elif choice < 0.4:
+                lines.append(self.rng.choice((f"# {self.word()}", f"#[[ {self.word()} ]]",
+                                              f"#[=[\n{self.word()}\n]=]")))
+            else:
+                lines.append(f"{self.rng.choice(_COMMANDS)}({self.arguments()})")
+            if self.rng.random() < 0.2:
+                break
+        return lines
+
+    def indent(self, lines: list[str]) -> list[str]:
+        return ["  " + line for line in lines]
+
+    def arguments(self) -> str:
+        return " ".join(self.argument() for _ in range(self.rng.randint(0, 5)))
+
+    def argument(self) -> str:
+        choice = self.rng.random()
+        if choice < 0.4:
+            return self.word()
+        if choice < 0.6:
+            return f'"{self.word()}{self.rng.choice(_ESCAPES)}{self.word()}"'
+        if choice < 0.7:
+            fill = "=" * self.rng.randrange(3)
+            return f"[{fill}[{self.word()}]{fill}]"
+        if choice < 0.8:
+            return f"$<{self.rng.choice(('BUILD_INTERFACE', 'CONFIG', 'TARGET_FILE'))}:{self.word()}>"
+        if choice < 0.9:
+            return f"{self.word()};{self.word()}"
+        return "${" + self.rng.choice(("x", "first", "ARGN", "SOURCES")) + "}"
+
+    def word(self) -> str:
+        word = self.rng.choice(_WORDS)
+        if self.rng.random() < 0.2:
+            word = "${" + f"{word}_${{x}}" + "}"
+        return word
+
+
+HOSTILE = ("deep_nesting", "recursion", "unterminated_brackets", "giant_range", "huge_bracket",
+           "unterminated_string")
+
+
+def generate(rng: random.Random, size: int) -> str:
+    """Generates a source of about size statements, which is hostile half of the time."""
+    hostile = rng.choice(HOSTILE) if rng.random() < 0.5 else None
+    return _Grammar(rng, size, hostile).source()
+
+
+def max_seconds(outcome: Outcome) -> float:
+    return max(MIN_SECONDS, TIME_FACTOR * outcome.seconds)
+
+
+class Corpus:
+    """The cases that are replayed as regression tests, along with the outcomes that were recorded for them."""
+
+    def __init__(self, directory: Path = CORPUS) -> None:
+        self.directory = directory
+        path = directory / MANIFEST
+        self.cases: dict[str, dict[str, t.Any]] = json.loads(path.read_text()) if path.exists() else {}
+
+    def add(self, kind: str, source: str, outcome: Outcome) -> str:
+        name = f"{kind}-{hashlib.sha1(source.encode()).hexdigest()[:12]}.cmake"  # noqa: S324
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / name).write_text(source)
+        self.cases[name] = {"kind": kind, **asdict(outcome), "max_seconds": max_seconds(outcome)}
+        return name
+
+    def source(self, name: str) -> str:
+        return (self.directory / name).read_text()
+
+    def remove(self, name: str) -> None:
+        del self.cases[name]
+        (self.directory / name).unlink()
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / MANIFEST).write_text(json.dumps(self.cases, indent=2, sort_keys=True) + "\n")
+
+
+def fuzz(count: int, seed: int, max_size: int, timeout: float) -> tuple[dict[int, float], list[tuple[str, Outcome]]]:
+    """Parses generated sources, and returns the worst time for each size, along with every source and outcome."""
+    rng = random.Random(seed)
+    runner = Runner()
+    worst: dict[int, float] = {}
+    results = []
+    try:
+        for _ in range(count):
+            source = generate(rng, rng.randint(1, max_size))
+            outcome = runner.run(source, timeout)
+            bucket = 1 << max(len(source) - 1, 0).bit_length()
+            worst[bucket] = max(worst.get(bucket, 0.0), outcome.seconds)
+            results.append((source, outcome))
+    finally:
+        runner.close()
+    return worst, results
+
+
+def refresh(corpus: Corpus, timeout: float) -> None:
+    """Records the current outcome of every case in the corpus."""
+    runner = Runner()
+    try:
+        for name, case in corpus.cases.items():
+            outcome = runner.run(corpus.source(name), timeout)
+            corpus.cases[name] = {"kind": case["kind"], **asdict(outcome), "max_seconds": max_seconds(outcome)}
+            print(f"{name}: {outcome.outcome} in {outcome.seconds:.3f}s")
+    finally:
+        runner.close()
+    corpus.save()
+
+
+_OPEN_BRACKET = re.compile(r"#?\[(=*)\[")
+
+
+def unterminated_brackets(source: str) -> Counter[str]:
+    """Counts the bracket arguments and comments that are never closed, by how they open, up to two of each.
+
+    The lexer once searched the rest of the source for the end of each of them, so that sources with many of them
+    took quadratic time. The second of each kind is the one that the lexer now skips the search for.
+    """
+    openings: Counter[str] = Counter()
+    for match in _OPEN_BRACKET.finditer(source):
+        if openings[match.group()] < 2 and source.find(f"]{match.group(1)}]", match.end()) < 0:
+            openings[match.group()] += 1
+    return openings
+
+
+def minimize_case(runner: Runner, source: str, timeout: float) -> str:
+    """Minimizes a source to one that gives the same outcome and has the same unterminated brackets."""
+    from differential import minimize_source
+    outcome = runner.run(source, timeout).outcome
+    brackets = unterminated_brackets(source)
+
+    def same_path(candidate: str) -> bool:
+        return unterminated_brackets(candidate) == brackets and runner.run(candidate, timeout).outcome == outcome
+
+    return minimize_source(source, same_path)
+
+
+def minimize(corpus: Corpus, names: list[str], timeout: float) -> None:
+    """Replaces the named cases of the corpus with minimized sources, and records their outcomes."""
+    runner = Runner()
+    try:
+        for name in names:
+            source = corpus.source(name)
+            minimized = minimize_case(runner, source, timeout)
+            kind = corpus.cases[name]["kind"]
+            corpus.remove(name)
+            new_name = corpus.add(kind, minimized, runner.run(minimized, timeout))
+            print(f"{name}: {len(source.splitlines())} lines -> {new_name}: {len(minimized.splitlines())} lines")
+    finally:
+        runner.close()
+    corpus.save()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000, help="The number of sources to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-size", type=int, default=200, help="The largest number of statements in a source")
+    parser.add_argument("--timeout", type=float, default=5.0, help="The time after which a parse is a hang")
+    parser.add_argument("--keep", type=int, default=5, help="The number of the slowest sources to add to the corpus")
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    parser.add_argument("--report", type=Path, help="The file to write the worst time for each size to, as JSON")
+    parser.add_argument("--refresh", action="store_true", help="Record the current outcome of each corpus case")
+    parser.add_argument("--minimize", nargs="+", metavar="NAME", help="Minimize these cases of the corpus")
+    args = parser.parse_args()
+    corpus = Corpus(args.corpus)
+    if args.refresh:
+        refresh(corpus, args.timeout)
+        return
+    if args.minimize:
+        minimize(corpus, args.minimize, args.timeout)
+        return
+    worst, results = fuzz(args.count, args.seed, args.max_size, args.timeout)
+    crashes = [(source, outcome) for source, outcome in results if outcome.crashed]
+    slowest = sorted((result for result in results if not result[1].crashed), key=lambda result: result[1].seconds)
+    for source, outcome in crashes:
+        print(f"crash: {outcome.outcome} after {outcome.seconds:.3f}s -> {corpus.add('crash', source, outcome)}")
+    for source, outcome in slowest[-args.keep:] if args.keep else ():
+        print(f"slow: {outcome.outcome} in {outcome.seconds:.3f}s -> {corpus.add('slow', source, outcome)}")
+    corpus.save()
+    print("worst time by input size (bytes):")
+    for bucket, seconds in sorted(worst.items()):
+        print(f"  <= {bucket:>9}: {seconds * 1000:10.1f} ms")
+    if args.report is not None:
+        args.report.write_text(json.dumps({str(bucket): seconds for bucket, seconds in sorted(worst.items())},
+                                          indent=2) + "\n")
+    if crashes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+function(recurse_a x)
+  recurse_b(${x})
+endfunction()
+function(recurse_b x)
+  message(${x})
+  recurse_a(${x})
+endfunction()
+recurse_a(start)
+file(${SOURCES} "ON\$TARGETS")
+endwhile(APPEND "NOT\;APPEND" "TARGETS\nPUBLIC" $<BUILD_INTERFACE:a>)
+# ${PUBLIC_${x}}
@@ -0,0 +1,21 @@
+# src/main.cpp
+function(call_0 first)
+  function(call_0 first)
+    add_library(ON [=[ON]=] ${PUBLIC_${x}} "DESTINATION\\SOURCES")
+    file(SOURCES;a ${ARGN} "SOURCES\;NOT" "a\;${APPEND_${x}}")
+    string(${x} $<TARGET_FILE:TARGETS> src/main.cpp)
+    #[=[
+AND
+]=]
+    install($<CONFIG:PUBLIC> "src/main.cpp\\a" APPEND $<BUILD_INTERFACE:ON> DESTINATION)
+    # APPEND
+    # NOT
+    target_link_libraries([==[${NOT_${x}}]==] OFF;NOT "OFF\$NOT" ${x})
+    include_directories([=[${a_${x}}]=] "a\nSOURCES" "a\nTARGETS" "src/main.cpp\"PUBLIC" $<TARGET_FILE:ON>)
+    set(AND a ${x})
+    list(NOT;${src/main.cpp_${x}} [=[AND]=] "OFF\"OFF" OFF)
+  endfunction()
+endfunction()
+foreach(i RANGE 19445)
+  set(x ${i})
+endforeach()
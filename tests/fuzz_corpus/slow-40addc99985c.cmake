@@ -0,0 +1,5 @@
+if([=[APPEND]=])
+endif()
+foreach(i RANGE 17165)
+  set(x ${i})
+endforeach()
@@ -0,0 +1,12 @@
+set(v1947 [=[ ${SOURCES_${x}})
+set(v1948 [=[ src/main.cpp)
+set(v1949 [[ PUBLIC)
+set(v1950 [==[ AND)
+set(v1953 [[ NOT)
+set(v1954 [==[ NOT)
+#[[
+#[==[
+#[[
+#[=[
+#[=[
+#[==[
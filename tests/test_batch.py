@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.core.package import Package
+from ros_cmake_analyzer.model import CMakeInfo
+from ros_cmake_analyzer.serialization import decode
+
+
+class _Collector:
+    def __init__(self) -> None:
+        self.results: dict[str, CMakeInfo] = {}
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self.results[package.name] = info
+
+
+class _EncodedCollector:
+    def __init__(self) -> None:
+        self.results: dict[str, bytes] = {}
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        raise AssertionError("encoded results should not be decoded")
+
+    def add_encoded(self, package: Package, data: memoryview) -> None:
+        self.results[package.name] = bytes(data)
+
+
+@pytest.mark.parametrize("transport", ["shm", "spool", "pickle"])
+def test_parallel_run_matches_sequential(transport: str) -> None:
+    packages = list(find_packages("tests/test_packages"))
+    sequential = _Collector()
+    BatchAnalyzer("ros1", sinks=[sequential]).run(packages)
+
+    parallel = _Collector()
+    report = BatchAnalyzer("ros1", sinks=[parallel], workers=2, transport=transport).run(packages)
+    assert sorted(report.analyzed) == sorted(packages)
+    assert parallel.results == sequential.results
+
+
+def test_encoded_sinks_receive_undecoded_results() -> None:
+    encoded = _EncodedCollector()
+    decoded = _Collector()
+    BatchAnalyzer("ros1", sinks=[encoded, decoded], workers=2).run(find_packages("tests/test_packages"))
+    assert set(encoded.results) == {"autorally_core", "car_demo"}
+    assert {name: decode(data) for name, data in encoded.results.items()} == decoded.results
+
+
+def test_failures_are_reported(tmp_path: Path) -> None:
+    (tmp_path / "package.xml").write_text("<package format='2'><name>broken</name></package>")
+    report = BatchAnalyzer("ros1", workers=2).run([tmp_path, Path("tests/test_packages/car_demo")])
+    assert report.analyzed == [Path("tests/test_packages/car_demo")]
+    assert tmp_path in report.failed
+
+
+class _FailingSink:
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        raise RuntimeError("sink failed")
+
+
+@pytest.mark.skipif(not Path("/dev/shm").is_dir(), reason="shared memory segments are not listed in /dev/shm")
+def test_interrupted_run_frees_shared_memory() -> None:
+    before = set(Path("/dev/shm").iterdir())
+    packages = sorted(find_packages("tests/test_packages")) * 3
+    with pytest.raises(RuntimeError, match="sink failed"):
+        BatchAnalyzer("ros1", sinks=[_FailingSink()], workers=3).run(packages)
+    assert set(Path("/dev/shm").iterdir()) <= before
+
+
+@pytest.mark.parametrize("transport", ["shm", "spool"])
+def test_workers_are_recycled(transport: str) -> None:
+    packages = sorted(find_packages("tests/test_packages")) * 3
+    expected = _Collector()
+    BatchAnalyzer("ros1", sinks=[expected]).run(packages)
+
+    collector = _Collector()
+    report = BatchAnalyzer("ros1", sinks=[collector], workers=2, transport=transport,
+                           max_tasks_per_worker=2).run(packages)
+    assert len(report.analyzed) == len(packages)
+    assert collector.results == expected.results
+    assert sum(worker.packages for worker in report.workers) == len(packages)
+    assert all(worker.packages <= 2 for worker in report.workers)
+    assert {worker.retired for worker in report.workers} <= {"max_tasks", "finished"}
+    assert len({worker.pid for worker in report.workers}) == len(report.workers) >= 3
+
+
+def test_workers_are_recycled_at_rss_high_water_mark() -> None:
+    packages = sorted(find_packages("tests/test_packages")) * 2
+    report = BatchAnalyzer("ros1", workers=2, max_worker_rss=1).run(packages)
+    assert len(report.analyzed) == len(packages)
+    assert [worker.retired for worker in report.workers] == ["max_rss"] * len(packages)
+    assert all(worker.peak_rss is not None and worker.peak_rss > 2 ** 20 for worker in report.workers)
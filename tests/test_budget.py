@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.budget import Budget, BudgetExceeded
+from ros_cmake_analyzer.cmake_parser.parser import ParserContext
+from ros_cmake_analyzer.diagnostics import AnalysisTruncated, DiagnosticsCollector, diagnostics
+from ros_cmake_analyzer.model import CMakeInfo
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.serialization import decode, encode
+
+AUTORALLY = Path("tests/test_packages/autorally_core")
+PACKAGE_XML = ('<?xml version="1.0"?>\n<package format="2"><name>demo</name><version>0.0.0</version>'
+               "<description>d</description><maintainer email='a@b.c'>m</maintainer><license>BSD</license>"
+               "<buildtool_depend>catkin</buildtool_depend></package>\n")
+
+
+def _package(tmp_path: Path, cmakelists: str) -> Path:
+    (tmp_path / "package.xml").write_text(PACKAGE_XML)
+    (tmp_path / "CMakeLists.txt").write_text(cmakelists)
+    (tmp_path / "a.cpp").write_text("int main() {}\n")
+    return tmp_path
+
+
+def _commands(source: str, budget: Budget) -> list[str]:
+    commands = []
+    with pytest.raises(BudgetExceeded) as e:
+        for command, *_ in ParserContext(budget=budget.tracker()).parse(source, var={}):
+            commands.append(command)
+    return [e.value.limit, *commands]
+
+
+def test_parser_enforces_each_limit() -> None:
+    assert _commands("foreach(i RANGE 100000000)\nendforeach()\n", Budget(max_loop_iterations=10))[0] \
+        == "max_loop_iterations"
+    assert _commands("foreach(i RANGE 100000000)\nendforeach()\n", Budget(max_seconds=0.05))[0] == "max_seconds"
+    assert _commands("a()\nb()\nc()\n", Budget(max_commands=2)) == ["max_commands", "a", "b"]
+    nested = "macro(g)\n  message(g)\nendmacro()\nmacro(h)\n  g()\nendmacro()\nh()\n"
+    assert _commands(nested, Budget(max_call_depth=1)) == ["max_call_depth", "macro", "endmacro", "macro", "endmacro"]
+
+
+def test_nested_calls_within_the_depth_are_allowed() -> None:
+    source = "macro(g)\n  message(g)\nendmacro()\nmacro(h)\n  g()\nendmacro()\nh()\nh()\n"
+    tracker = Budget(max_call_depth=2).tracker()
+    commands = [command for command, *_ in ParserContext(budget=tracker).parse(source, var={})]
+    assert commands.count("message") == 2
+    assert tracker.calls == 0
+
+
+def test_partial_result_is_returned_when_budget_is_exceeded(tmp_path: Path) -> None:
+    package = _package(tmp_path, "project(demo)\nadd_executable(first a.cpp)\n"
+                                 "foreach(i RANGE 100000000)\nendforeach()\nadd_executable(second a.cpp)\n")
+    collector = DiagnosticsCollector()
+    diagnostics.add_sink(collector)
+    try:
+        info = ROS1CMakeExtractor(package, budget=Budget(max_loop_iterations=1000)).get_cmake_info()
+    finally:
+        diagnostics.remove_sink(collector)
+    assert info.truncated
+    assert set(info.targets) == {"first"}
+    assert [(e.limit, e.value) for e in collector.of_type(AnalysisTruncated)] == [("max_loop_iterations", 1000)]
+    assert decode(encode(info)) == info
+    assert CMakeInfo.from_dict(info.to_dict()) == info
+
+    (package / "CMakeLists.txt").write_text("project(demo)\nadd_executable(first a.cpp)\n"
+                                            "foreach(i RANGE 100)\nendforeach()\nadd_executable(second a.cpp)\n")
+    complete = ROS1CMakeExtractor(package, budget=Budget(max_loop_iterations=1000)).get_cmake_info()
+    assert not complete.truncated
+    assert set(complete.targets) == {"first", "second"}
+
+
+def test_glob_results_are_limited(tmp_path: Path) -> None:
+    package = _package(tmp_path, "project(demo)\nfile(GLOB_RECURSE SOURCES *.cpp)\nadd_executable(demo ${SOURCES})\n")
+    for i in range(10):
+        (package / f"{i}.cpp").write_text("")
+    info = ROS1CMakeExtractor(package, budget=Budget(max_glob_results=5)).get_cmake_info()
+    assert info.truncated
+    assert not info.targets
+    assert not info.unprocessed_commands
+
+
+def test_subdirectories_stop_their_parents() -> None:
+    unlimited = ROS1CMakeExtractor(AUTORALLY).get_cmake_info()
+    assert not unlimited.truncated
+    info = ROS1CMakeExtractor(AUTORALLY, budget=Budget(max_commands=120)).get_cmake_info()
+    assert info.truncated
+    # Targets of the subdirectories that were processed before the budget ran out are kept
+    assert 0 < len(info.targets) < len(unlimited.targets)
+
+
+def test_batch_reports_truncated_packages(tmp_path: Path) -> None:
+    package = _package(tmp_path, "project(demo)\nforeach(i RANGE 100000000)\nendforeach()\n")
+    budget = Budget(max_seconds=1.0)
+    for workers in (1, 2):
+        report = BatchAnalyzer("ros1", workers=workers, budget=budget).run([package, AUTORALLY])
+        assert sorted(report.analyzed) == sorted([package, AUTORALLY])
+        assert report.truncated == [package]
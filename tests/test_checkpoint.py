@@ -0,0 +1,134 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.checkpoint import Checkpoint, run_checkpointed
+from ros_cmake_analyzer.core.package import Package
+from ros_cmake_analyzer.model import CMakeInfo
+from ros_cmake_analyzer.serialization import JSONLinesWriter
+
+FIXTURES = sorted(find_packages("tests/test_packages"))
+
+
+class _Interrupt(Exception):
+    pass
+
+
+class _InterruptAfter:
+    """Interrupts a run as the nth package is added, before it is added to the checkpoint."""
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self.n -= 1
+        if self.n == 0:
+            raise _Interrupt
+
+
+@pytest.fixture()
+def packages(tmp_path: Path) -> list[Path]:
+    for i in range(2):
+        for fixture in FIXTURES:
+            shutil.copytree(fixture, tmp_path / "src" / f"{fixture.name}_{i}")
+    return sorted(find_packages(tmp_path / "src"))
+
+
+def _results(output: Path) -> dict[str, dict]:
+    with output.open() as f:
+        return {str(path): info.to_dict() for _, path, info in JSONLinesWriter.read(f)}
+
+
+def test_interrupted_run_is_resumed(tmp_path: Path, packages: list[Path]) -> None:
+    output = tmp_path / "results.jsonl"
+    with pytest.raises(_Interrupt):
+        run_checkpointed(BatchAnalyzer("ros1", sinks=[_InterruptAfter(3)]), packages, output)
+    assert not output.exists()
+    # Simulates a crash part way through writing the result of the next package, and its journal record
+    partial = output.with_name("results.jsonl.partial")
+    journal = output.with_name("results.jsonl.journal")
+    with partial.open("ab") as f:
+        f.write(b'{"package": "torn"')
+    with journal.open("ab") as f:
+        f.write(b'{"path": "torn", "off')
+
+    analyzed = []
+
+    class _Recorder:
+        def add(self, package: Package, info: CMakeInfo) -> None:
+            analyzed.append(package.path)
+
+    report, checkpoint = run_checkpointed(BatchAnalyzer("ros1", sinks=[_Recorder()]), packages, output, resume=True)
+    assert analyzed == report.analyzed == packages[2:]
+    assert set(checkpoint.analyzed) == {str(path) for path in packages}
+    assert not partial.exists() and not journal.exists()
+
+    fresh = tmp_path / "fresh.jsonl"
+    run_checkpointed(BatchAnalyzer("ros1"), packages, fresh)
+    assert _results(output) == _results(fresh)
+
+
+def test_failures_are_retried_on_resume(tmp_path: Path, packages: list[Path]) -> None:
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "package.xml").write_text("<package format='2'><name>broken</name></package>")
+    output = tmp_path / "results.jsonl"
+    with pytest.raises(_Interrupt):
+        run_checkpointed(BatchAnalyzer("ros1", sinks=[_InterruptAfter(2)]), [broken, *packages], output)
+    checkpoint = Checkpoint(output, resume=True)
+    checkpoint.close()
+    assert list(checkpoint.failed) == [str(broken)]
+    assert list(checkpoint.analyzed) == [str(packages[0])]
+
+    # The package is fixed before the run is resumed
+    shutil.copytree(FIXTURES[0], broken, dirs_exist_ok=True)
+    report, checkpoint = run_checkpointed(BatchAnalyzer("ros1"), [broken, *packages], output, resume=True)
+    assert report.analyzed == [broken, *packages[1:]]
+    assert not report.failed
+    assert not checkpoint.failed
+    assert len(_results(output)) == len(packages) + 1
+
+
+def test_failures_that_persist_are_recorded_once(tmp_path: Path, packages: list[Path]) -> None:
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "package.xml").write_text("<package format='2'><name>broken</name></package>")
+    output = tmp_path / "results.jsonl"
+    with pytest.raises(_Interrupt):
+        run_checkpointed(BatchAnalyzer("ros1", sinks=[_InterruptAfter(2)]), [broken, *packages], output)
+
+    report, checkpoint = run_checkpointed(BatchAnalyzer("ros1"), [broken, *packages], output, resume=True)
+    assert list(report.failed) == [broken]
+    assert list(checkpoint.failed) == [str(broken)]
+    assert len(_results(output)) == len(packages)
+
+
+def test_resume_without_checkpoint_starts_afresh(tmp_path: Path, packages: list[Path]) -> None:
+    output = tmp_path / "results.jsonl"
+    report, _ = run_checkpointed(BatchAnalyzer("ros1"), packages[:1], output, resume=True)
+    assert report.analyzed == packages[:1]
+    assert len(_results(output)) == 1
+
+
+def test_crashed_workers_are_retried(tmp_path: Path, packages: list[Path], monkeypatch: pytest.MonkeyPatch) -> None:
+    analyze = BatchAnalyzer.analyze
+
+    def crash_once(self: BatchAnalyzer, package_dir: Path) -> tuple[Package, CMakeInfo]:
+        marker = tmp_path / f"{package_dir.name}.crashed"
+        if package_dir == packages[0] and not marker.exists():
+            marker.touch()
+            os._exit(3)
+        return analyze(self, package_dir)
+
+    # Workers are forked, so they inherit the patch
+    monkeypatch.setattr(BatchAnalyzer, "analyze", crash_once)
+    report = BatchAnalyzer("ros1", workers=2, retries=1).run(packages)
+    assert sorted(report.analyzed) == packages
+    assert not report.failed
+
+    (tmp_path / f"{packages[0].name}.crashed").unlink()
+    report = BatchAnalyzer("ros1", workers=2).run(packages)
+    assert report.failed == {packages[0]: "worker process exited with code 3"}
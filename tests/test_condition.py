@@ -0,0 +1,64 @@
+import random
+import subprocess
+import sys
+
+import pytest
+
+from ros_cmake_analyzer.core.package_xml.condition import (
+    compile_condition,
+    evaluate_condition,
+    evaluate_condition_reference,
+)
+
+CONTEXT = {"ROS_VERSION": "2", "ROS_DISTRO": "humble", "EMPTY": ""}
+TERMS = ["$ROS_VERSION", "$ROS_DISTRO", "$EMPTY", "$UNSET", "1", "2", "humble", "noetic", "a-b_c", '"x y"', "'2'",
+         '"tab\\tbed"', "''"]
+OPERATORS = ["==", "!=", "<", "<=", ">", ">="]
+
+
+def _condition(rng: random.Random, depth: int = 0) -> str:
+    if depth < 3 and rng.random() < 0.4:
+        joiner = rng.choice([" and ", " or ", "and", " or"])
+        return joiner.join(_condition(rng, depth + 1) for _ in range(rng.randint(2, 3)))
+    if depth < 3 and rng.random() < 0.2:
+        return f"({_condition(rng, depth + 1)})"
+    space = rng.choice(["", " ", "\n"])
+    return f"{rng.choice(TERMS)}{space}{rng.choice(OPERATORS)}{space}{rng.choice(TERMS)}"
+
+
+def _mutate(rng: random.Random, condition: str) -> str:
+    position = rng.randrange(len(condition) + 1)
+    return condition[:position] + rng.choice(["(", ")", "$", "=", " ", "and", "'", "x", ""]) + condition[position + 1:]
+
+
+def _outcome(evaluate, condition: str) -> bool | str:
+    try:
+        return evaluate(condition, CONTEXT)
+    except ValueError:
+        return "error"
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@pytest.mark.parametrize("seed", range(20))
+def test_compiled_conditions_match_pyparsing(seed: int) -> None:
+    rng = random.Random(seed)
+    for _ in range(50):
+        condition = _condition(rng)
+        if rng.random() < 0.5:
+            condition = _mutate(rng, condition)
+        assert _outcome(evaluate_condition, condition) == _outcome(evaluate_condition_reference, condition), condition
+
+
+def test_compiled_conditions_are_shared() -> None:
+    assert compile_condition("$ROS_VERSION == 2") is compile_condition("$ROS_VERSION == 2")
+    assert evaluate_condition(None, CONTEXT)
+    with pytest.raises(ValueError, match="failed to parse"):
+        evaluate_condition("$ROS_VERSION ==", CONTEXT)
+
+
+def test_evaluating_conditions_does_not_import_pyparsing() -> None:
+    code = ("import sys\n"
+            "from ros_cmake_analyzer.core.package_xml.condition import evaluate_condition\n"
+            "assert evaluate_condition('$ROS_VERSION == 2', {'ROS_VERSION': '2'})\n"
+            "assert 'pyparsing' not in sys.modules\n")
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,130 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer import cpp_index
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.cpp_index import ClassExport, ClassIndex, scan_source
+from ros_cmake_analyzer.model import IncompleteCMakeLibraryTarget, SourceLanguage
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.ros2 import ROS2CMakeExtractor
+
+AUTORALLY = Path("tests/test_packages/autorally_core").resolve()
+
+
+def test_scan_source_qualifies_classes_and_exports(tmp_path: Path) -> None:
+    source = tmp_path / "plugin.cpp"
+    source.write_text("""
+// class Commented {};
+namespace outer { namespace inner::deeper {
+class EXPORT_API Plugin : public Base<int>, private Other { struct Nested {}; void f() { if (x) {} } };
+enum class Kind { A, B };
+template <class T> struct Declared;
+}}
+namespace { struct Hidden {}; }
+PLUGINLIB_EXPORT_CLASS(outer::inner::deeper::Plugin, base::Plugin)
+namespace outer { RCLCPP_COMPONENTS_REGISTER_NODE(Component) }
+""")
+    symbols = scan_source(source)
+    assert symbols.classes == ("outer::inner::deeper::Plugin", "outer::inner::deeper::Plugin::Nested", "Hidden")
+    assert symbols.exports == (
+        ClassExport("outer::inner::deeper::Plugin", "base::Plugin"),
+        ClassExport("outer::Component", "rclcpp_components::NodeFactory"),
+    )
+    assert scan_source(source) is symbols
+
+    source.write_text("namespace outer { class Replaced {}; }\n")
+    assert scan_source(source).classes == ("outer::Replaced",)
+    assert scan_source(tmp_path / "missing.cpp").classes == ()
+
+
+def test_scan_cache_is_bounded(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cpp_index, "CACHE_SIZE", 2)
+    monkeypatch.setattr(cpp_index, "_cache", {})
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.cpp").write_text(f"class {name} {{}};\n")
+        scan_source(tmp_path / f"{name}.cpp")
+    assert list(cpp_index._cache) == [str(tmp_path / "b.cpp"), str(tmp_path / "c.cpp")]
+
+
+def test_class_index_resolves_nodelet_classes() -> None:
+    classes = ClassIndex()
+    BatchAnalyzer("ros1", sinks=[classes]).run([AUTORALLY])
+    exporting = classes.targets_exporting("autorally_core::CameraTrigger")
+    assert {ref.target.name for ref in exporting} == {"CameraTrigger"}
+    assert classes.files_exporting("::autorally_core::CameraTrigger") == \
+        [AUTORALLY / "src/camera_trigger/CameraTrigger.cpp"]
+    assert classes.resolve("autorally_core::DoesNotExist") == []
+
+    classes.remove(AUTORALLY)
+    assert classes.targets_exporting("autorally_core::CameraTrigger") == []
+
+
+def test_nodelet_aliases_share_the_completed_target() -> None:
+    info = ROS1CMakeExtractor(AUTORALLY).get_cmake_info()
+    target = info.targets["CameraTrigger"]
+    assert info.targets["autorally_core/CameraTrigger"] is target
+    assert target.entrypoint == "autorally_core::CameraTrigger::onInit"
+    # The aliases share the target that the libraries it links were added to
+    assert target.libraries == ("SerialSensorInterface", "ar_diagnostics")
+
+
+def test_component_sources_are_files(tmp_path: Path) -> None:
+    (tmp_path / "package.xml").write_text(
+        '<?xml version="1.0"?>\n<package format="3"><name>demo</name><version>0.0.0</version>'
+        '<description>demo</description><maintainer email="a@b.c">a</maintainer><license>MIT</license></package>\n')
+    (tmp_path / "CMakeLists.txt").write_text(
+        "project(demo)\n"
+        "add_library(talker SHARED src/talker.cpp src/util.cpp)\n"
+        'rclcpp_components_register_node(talker PLUGIN "demo::Talker" EXECUTABLE talker_node)\n')
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/talker.cpp").write_text(
+        "namespace demo { class Talker : public rclcpp::Node {}; }\nRCLCPP_COMPONENTS_REGISTER_NODE(demo::Talker)\n")
+    (tmp_path / "src/util.cpp").write_text("int util() { return 0; }\n")
+
+    info = ROS2CMakeExtractor(tmp_path).get_cmake_info()
+    assert set(info.targets["talker_node"].sources) == {Path("src/talker.cpp")}
+    assert info.targets["talker_node"].libraries == ("talker",)
+
+
+def test_registered_components_keep_the_library(tmp_path: Path) -> None:
+    (tmp_path / "package.xml").write_text(
+        '<?xml version="1.0"?>\n<package format="3"><name>demo</name><version>0.0.0</version>'
+        '<description>demo</description><maintainer email="a@b.c">a</maintainer><license>MIT</license></package>\n')
+    (tmp_path / "CMakeLists.txt").write_text(
+        "project(demo)\n"
+        "add_library(talker SHARED src/talker.cpp src/util.cpp)\n"
+        'rclcpp_components_register_nodes(talker "demo::Talker")\n'
+        "target_link_libraries(talker util)\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/talker.cpp").write_text(
+        "namespace demo { class Talker : public rclcpp::Node {}; }\nRCLCPP_COMPONENTS_REGISTER_NODE(demo::Talker)\n")
+    (tmp_path / "src/util.cpp").write_text("int util() { return 0; }\n")
+
+    info = ROS2CMakeExtractor(tmp_path).get_cmake_info()
+    library = info.targets["talker"]
+    assert library.kind == "library"
+    assert set(library.sources) == {Path("src/talker.cpp"), Path("src/util.cpp")}
+    assert library.entrypoint == "demo::Talker::Talker"
+    assert library.libraries == ("util",)
+
+
+def test_readding_a_package_rescans_changed_sources(tmp_path: Path) -> None:
+    source = tmp_path / "a.cpp"
+    source.write_text("namespace ns { class Foo {}; }\nPLUGINLIB_EXPORT_CLASS(ns::Foo, base::Plugin)\n")
+    library = IncompleteCMakeLibraryTarget("lib", SourceLanguage.CXX, {"a.cpp"}, [], set(), "CMakeLists.txt", 1)
+    classes = ClassIndex()
+    classes.add_targets("demo", tmp_path, {"lib": library})
+    assert [ref.key for ref in classes.resolve("ns::Foo")] == ["lib"]
+
+    source.write_text("namespace ns { class Bar {}; }\nPLUGINLIB_EXPORT_CLASS(ns::Bar, base::Plugin)\n")
+    os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10**9))
+    classes.add_targets("demo", tmp_path, {"lib": library})
+    assert classes.resolve("ns::Foo") == []
+    assert classes.files_exporting("ns::Foo") == []
+    assert [ref.key for ref in classes.resolve("ns::Bar")] == ["lib"]
+    assert classes.files_exporting("ns::Bar") == [source.resolve()]
+
+    classes.remove(tmp_path)
+    assert classes.files_defining("ns::Bar") == []
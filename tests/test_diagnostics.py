@@ -0,0 +1,91 @@
+import typing as t
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.diagnostics import (
+    CommandFailed,
+    Diagnostics,
+    DiagnosticsCollector,
+    GlobExpansion,
+    Level,
+    Message,
+    UnhandledCommand,
+    UnresolvedFile,
+    diagnostics,
+)
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+
+PACKAGE_XML = ('<?xml version="1.0"?>\n<package format="2"><name>demo</name><version>0.0.0</version>'
+               '<description>demo</description><maintainer email="a@b.c">a</maintainer><license>MIT</license>'
+               '</package>\n')
+
+
+@dataclass(frozen=True)
+class _Unformattable:
+    level: Level = Level.DEBUG
+
+    def message(self) -> str:
+        raise AssertionError("should not have been formatted")
+
+
+@pytest.fixture
+def collector() -> t.Iterator[DiagnosticsCollector]:
+    collector = DiagnosticsCollector()
+    previous = diagnostics.level
+    diagnostics.add_sink(collector)
+    diagnostics.level = Level.DEBUG
+    yield collector
+    diagnostics.remove_sink(collector)
+    diagnostics.level = previous
+
+
+def test_extractor_emits_typed_events(tmp_path: Path, collector: DiagnosticsCollector) -> None:
+    (tmp_path / "package.xml").write_text(PACKAGE_XML)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/main.cpp").write_text("int main() {}\n")
+    (tmp_path / "CMakeLists.txt").write_text(
+        "project(demo)\n"
+        "find_package(catkin REQUIRED)\n"
+        "file(GLOB SOURCES src/*.cpp)\n"
+        "add_executable(demo ${SOURCES} src/missing.cpp)\n"
+        "add_subdirectory(does_not_exist)\n")
+    info = ROS1CMakeExtractor(tmp_path).get_cmake_info()
+
+    unhandled, = collector.of_type(UnhandledCommand)
+    assert unhandled.command.command == "find_package"
+    glob, = collector.of_type(GlobExpansion)
+    assert (glob.pattern, [Path(m).name for m in glob.matches]) == ("src/*.cpp", ["main.cpp"])
+    unresolved, = collector.of_type(UnresolvedFile)
+    assert unresolved.file in info.unresolved_files
+    assert unresolved.file.filename == "src/missing.cpp"
+    failed, = collector.of_type(CommandFailed)
+    assert failed.command.command == "add_subdirectory"
+    assert "does_not_exist" in failed.message()
+
+
+def test_events_below_the_level_are_not_dispatched() -> None:
+    collector = DiagnosticsCollector()
+    dispatcher = Diagnostics([collector], level=Level.WARNING)
+    dispatcher.emit(Message(Level.INFO, "{} files", (3,)))
+    dispatcher.emit(Message(Level.WARNING, "{} files", (3,)))
+    assert [event.message() for event in collector.events] == ["3 files"]
+    assert not dispatcher.enabled(Level.DEBUG)
+
+
+def test_silent_mode_discards_everything() -> None:
+    collector = DiagnosticsCollector()
+    dispatcher = Diagnostics([collector], level=Level.DEBUG)
+    with dispatcher.silenced():
+        assert not dispatcher.enabled(Level.ERROR)
+        dispatcher.emit(Message(Level.ERROR, "dropped"))
+    dispatcher.emit(Message(Level.ERROR, "kept"))
+    assert [event.message() for event in collector.events] == ["kept"]
+    assert not Diagnostics([], level=Level.DEBUG).enabled(Level.ERROR)
+
+
+def test_loguru_sink_defers_formatting() -> None:
+    # Logging from the package is disabled by default, so the event is never formatted
+    dispatcher = Diagnostics(diagnostics.sinks, level=Level.DEBUG)
+    dispatcher.emit(_Unformattable())
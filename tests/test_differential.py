@@ -0,0 +1,54 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from differential import (
+    BENCHMARKS,
+    FIXTURES,
+    FUZZ_VARIABLES,
+    compare_package,
+    compare_source,
+    minimize_source,
+    random_source,
+)
+from ros_cmake_analyzer.batch import find_packages
+from ros_cmake_analyzer.cmake_parser import parser
+
+
+@pytest.mark.parametrize("package", sorted(find_packages(FIXTURES)), ids=lambda path: path.name)
+def test_fixtures_match_reference(package: Path) -> None:
+    for path in package.rglob("*"):
+        if path.name == "CMakeLists.txt" or path.suffix == ".cmake":
+            assert compare_source(path.read_text(errors="replace")) is None, path
+    assert compare_package("ros1", package) is None
+
+
+@pytest.mark.parametrize("ros", ["ros1", "ros2"])
+def test_synthetic_workspaces_match_reference(ros: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.syspath_prepend(str(BENCHMARKS))
+    from synthetic import WorkspaceSpec, generate_workspace
+    for package in generate_workspace(tmp_path, WorkspaceSpec(ros=ros, packages=2, depth=2)):
+        assert compare_package(ros, package) is None
+
+
+def test_fuzzed_sources_match_reference() -> None:
+    rng = random.Random(0)
+    for _ in range(300):
+        source = random_source(rng)
+        divergence = compare_source(source, FUZZ_VARIABLES)
+        assert divergence is None, divergence.describe()
+
+
+def test_divergence_is_minimized(monkeypatch: pytest.MonkeyPatch) -> None:
+    resolve_vars = parser._resolve_vars
+
+    def broken_resolve_vars(s: str, var: dict[str, str], env_var: dict[str, str]) -> str:
+        return resolve_vars(s, var, env_var).replace("nested", "")
+
+    monkeypatch.setattr(parser, "_resolve_vars", broken_resolve_vars)
+    source = "set(A a)\nif(A)\n  message(${A} ${A_${B}} b)\nendif()\nmessage(done)\n"
+    assert compare_source(source, FUZZ_VARIABLES) is not None
+    reproducer = minimize_source(source, lambda candidate: compare_source(candidate, FUZZ_VARIABLES) is not None)
+    # Only the line with the nested reference is left; its words cannot be removed without a syntax error
+    assert reproducer == "message(${A} ${A_${B}} b)\n"
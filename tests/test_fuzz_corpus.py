@@ -0,0 +1,39 @@
+import random
+import typing as t
+
+import pytest
+
+from fuzz_cmake import Corpus, Runner, generate, minimize_case
+
+CORPUS = Corpus()
+
+
+@pytest.fixture(scope="module")
+def runner() -> t.Iterator[Runner]:
+    runner = Runner()
+    yield runner
+    runner.close()
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS.cases))
+def test_corpus_case_is_unchanged_and_within_time_bound(runner: Runner, name: str) -> None:
+    case = CORPUS.cases[name]
+    outcome = runner.run(CORPUS.source(name), case["max_seconds"])
+    assert outcome.outcome == case["outcome"], f"took {outcome.seconds:.3f}s"
+    assert outcome.digest == case["digest"]
+    # Errors may be raised after a number of commands that depends on the depth of the stack
+    if outcome.outcome == "ok":
+        assert outcome.commands == case["commands"]
+
+
+def test_generated_sources_do_not_crash(runner: Runner) -> None:
+    rng = random.Random(0)
+    for _ in range(30):
+        source = generate(rng, rng.randint(1, 50))
+        outcome = runner.run(source, 5.0)
+        assert not outcome.crashed, (outcome, source[:500])
+
+
+def test_minimized_cases_keep_their_unterminated_brackets(runner: Runner) -> None:
+    source = "set(a b)\n" * 20 + "set(v [=[ a)\n" * 3 + "#[[ comment\n" * 3 + "message(x)\n"
+    assert minimize_case(runner, source, 5.0) == "set(v [=[ a)\nset(v [=[ a)\n#[[\n#[[\n"
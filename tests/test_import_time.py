@@ -0,0 +1,36 @@
+import subprocess
+import sys
+import types
+
+import pytest
+
+from differential import BENCHMARKS
+
+# Measured with -X importtime, so this excludes the startup of the interpreter
+IMPORT_BUDGET_MS = 50
+
+
+@pytest.fixture
+def import_time(monkeypatch: pytest.MonkeyPatch) -> types.ModuleType:
+    monkeypatch.syspath_prepend(str(BENCHMARKS))
+    import import_time
+    return import_time
+
+
+def test_import_is_within_budget(import_time: types.ModuleType) -> None:
+    # The fastest of several runs, to be robust against a busy machine
+    assert import_time.import_time("ros_cmake_analyzer", runs=3) < IMPORT_BUDGET_MS
+
+
+def test_heavy_dependencies_are_imported_on_first_use() -> None:
+    script = (
+        "import sys, ros_cmake_analyzer.ros1, ros_cmake_analyzer.ros2\n"
+        "print(' '.join(m for m in ('loguru', 'charset_normalizer', 'pyparsing', 'concurrent.futures') "
+        "if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
+
+    script = "import ros_cmake_analyzer, sys; ros_cmake_analyzer.CMakeExtractor; print('loguru' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.index import SourceIndex
+
+AUTORALLY = Path("tests/test_packages/autorally_core").resolve()
+
+
+def test_source_index_lookups() -> None:
+    index = SourceIndex()
+    BatchAnalyzer("ros1", sinks=[index]).run(find_packages("tests/test_packages"))
+
+    owners = index.targets_for(AUTORALLY / "src/xbee/XbeeInterface.cpp")
+    assert sorted(ref.key for ref in owners) == ["xbeeCoordinator", "xbeeNode"]
+    assert all(ref.package == "autorally_core" for ref in owners)
+    assert index.targets_for(AUTORALLY / "src/does_not_exist.cpp") == []
+
+    under = {ref.key for ref in index.targets_under(AUTORALLY / "src/xbee")}
+    assert under == {"xbeeCoordinator", "xbeeNode"}
+    assert index.targets_under(AUTORALLY / "src/xb") == []
+    assert {ref.key for ref in index.targets_with_prefix(str(AUTORALLY / "src/xb"))} == under
+
+
+def test_source_index_reanalysis_replaces_package() -> None:
+    index = SourceIndex()
+    analyzer = BatchAnalyzer("ros1", sinks=[index])
+    analyzer.run([AUTORALLY])
+    size = len(index)
+    analyzer.run([AUTORALLY])
+    assert len(index) == size
+    assert len(index.targets_for(AUTORALLY / "src/xbee/XbeeNode.cpp")) == 1
+
+    index.remove(AUTORALLY)
+    assert len(index) == 0
+    assert index.targets_under(AUTORALLY) == []
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+from pathlib import Path
+
+
+def test_ros2_packages_are_analyzed(tmp_path: Path) -> None:
+    (tmp_path / "package.xml").write_text(
+        '<?xml version="1.0"?>\n<package format="3"><name>demo</name><version>0.0.0</version>'
+        '<description>demo</description><maintainer email="a@b.c">a</maintainer><license>MIT</license></package>\n')
+    (tmp_path / "CMakeLists.txt").write_text(
+        "project(demo)\n"
+        "add_executable(talker src/talker.cpp)\n")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src/talker.cpp").write_text("int main() {}\n")
+
+    result = subprocess.run([sys.executable, "-m", "ros_cmake_analyzer.main", "ros2", str(tmp_path)],
+                            capture_output=True, text=True, check=True)
+    assert "Target 'talker' has sources" in result.stderr
+    assert "Done" in result.stderr
@@ -0,0 +1,72 @@
+import pickle
+from pathlib import Path
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.core.package import Package
+from ros_cmake_analyzer.model import CMakeBinaryTarget, CMakeInfo, IncompleteCMakeLibraryTarget, SourceLanguage
+from ros_cmake_analyzer.paths import PathSequence, PathSet, PathTable, session_table
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.serialization import decode, encode
+
+
+def test_path_set_behaves_like_a_set_of_paths() -> None:
+    table = PathTable()
+    paths = PathSet(["src/b.cpp", Path("src/a.cpp"), "src/b.cpp"], table)
+    assert len(paths) == 2
+    assert Path("src/a.cpp") in paths
+    assert "src/a.cpp" in paths
+    assert "src/c.cpp" not in paths
+    assert paths == {Path("src/a.cpp"), Path("src/b.cpp")}
+    assert paths == PathSet(["src/a.cpp", "src/b.cpp"])
+    assert hash(paths) == hash(PathSet(["src/a.cpp", "src/b.cpp"]))
+    assert len(table) == 2
+
+
+def test_path_sequence_keeps_order() -> None:
+    includes = PathSequence(["include", "/opt/ros/include", "include"])
+    assert list(includes) == [Path("include"), Path("/opt/ros/include"), Path("include")]
+    assert includes[1:] == PathSequence(["/opt/ros/include", "include"])
+
+
+def test_targets_share_interned_paths_and_are_hashable() -> None:
+    first = CMakeBinaryTarget("a", SourceLanguage.CXX, {Path("src/main.cpp")}, ["include"], set(), "CMakeLists.txt", 1)
+    second = CMakeBinaryTarget("b", SourceLanguage.CXX, {"src/main.cpp"}, ["include"], set(), "CMakeLists.txt", 2)
+    assert next(iter(first.sources)) is next(iter(second.sources))
+    assert first.includes.ids == second.includes.ids
+    assert len({first, second, pickle.loads(pickle.dumps(first))}) == 2
+
+    library = IncompleteCMakeLibraryTarget("lib", SourceLanguage.CXX, {"src/lib.cpp"}, [], set(), "CMakeLists.txt", 3)
+    completed = library.complete("ns::Lib::onInit")
+    assert completed.sources is library.sources
+
+
+def test_each_package_interns_its_paths_in_a_table_of_its_own() -> None:
+    before = len(session_table())
+    infos = [ROS1CMakeExtractor("tests/test_packages/autorally_core").get_cmake_info() for _ in range(3)]
+    infos.append(decode(encode(infos[0])))
+    tables = [{id(target.sources.table) for target in info.targets.values()} for info in infos]
+    assert all(len(table) == 1 for table in tables)
+    assert len(set.union(*tables)) == len(infos)
+    assert infos[-1] == infos[0]
+    assert len(session_table()) == before
+
+
+class _Collector:
+    def __init__(self) -> None:
+        self.results: list[tuple[str, CMakeInfo]] = []
+
+    def add(self, package: Package, info: CMakeInfo) -> None:
+        self.results.append((package.name, info))
+
+
+def test_batch_runs_do_not_grow_the_session_table() -> None:
+    packages = sorted(find_packages("tests/test_packages")) * 2
+    BatchAnalyzer("ros1").run(packages[:1])
+    before = len(session_table())
+    for transport in ("shm", "pickle"):
+        collector = _Collector()
+        BatchAnalyzer("ros1", sinks=[collector], workers=2, transport=transport).run(packages)
+        assert len(collector.results) == len(packages)
+    collector = _Collector()
+    BatchAnalyzer("ros1", sinks=[collector]).run(packages)
+    assert len(session_table()) == before
@@ -1,9 +1,53 @@
 from pathlib import Path
 
+import pytest
+
 from ros_cmake_analyzer.core.package import Package
+from ros_cmake_analyzer.core.package_xml.package import InvalidPackage, parse_package_string
+from ros_cmake_analyzer.core.package_xml.reader import load_package_xml, read_package_xml, read_package_xml_string
 
 
 def test_simple_package() -> None:
     package = Package.from_dir(Path("tests/test_packages/car_demo"))
     assert package.name == "car_demo"
     assert len(package.definition.exports) == 1
+
+
+def test_read_package_xml_dependencies_and_exports() -> None:
+    definition = read_package_xml("tests/test_packages/autorally_core/package.xml")
+    assert definition.name == "autorally_core"
+    assert definition.package_format == 1
+    assert [(e.tagname, e.attributes) for e in definition.exports] == [
+        ("cpp", {"cflags": "-I${prefix}/include"}),
+        ("nodelet", {"plugin": "${prefix}/nodelet_plugins.xml"}),
+    ]
+    # Format 1 run dependencies are both build export and exec dependencies
+    assert [d.name for d in definition.exec_depends] == [d.name for d in definition.build_export_depends]
+
+    definition = read_package_xml("tests/test_packages/car_demo/package.xml")
+    assert {d.name for d in definition.build_depends} == {"gazebo_ros", "prius_msgs"}
+    assert "joy" in {d.name for d in definition.exec_depends}
+    assert [d.name for d in definition.buildtool_depends] == ["catkin"]
+
+
+def test_strict_parsing_reports_specification_errors() -> None:
+    manifest = """<package format="2">
+      <name>broken</name><version>1.0.0</version><description>d</description>
+      <maintainer email="a@b.org">a</maintainer><license>MIT</license>
+      <run_depend>roscpp</run_depend>
+    </package>"""
+    assert read_package_xml_string(manifest).name == "broken"
+    with pytest.raises(InvalidPackage, match="replace <run_depend>"):
+        parse_package_string(manifest)
+    with pytest.raises(InvalidPackage, match="invalid XML"):
+        read_package_xml_string("<package><name>")
+
+
+def test_load_package_xml_is_cached_until_modified(tmp_path: Path) -> None:
+    manifest = tmp_path / "package.xml"
+    manifest.write_text('<package format="2"><name>first</name></package>')
+    definition = load_package_xml(manifest)
+    assert load_package_xml(manifest) is definition
+    assert Package.from_dir(tmp_path).definition is definition
+    manifest.write_text('<package format="2"><name>second</name></package>')
+    assert load_package_xml(manifest).name == "second"
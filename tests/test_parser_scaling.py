@@ -0,0 +1,38 @@
+import types
+
+import pytest
+
+from differential import BENCHMARKS
+from ros_cmake_analyzer.cmake_parser.parser import _resolve_vars, argparse
+
+SIZES = (500, 1000, 2000, 4000)
+# Linear growth, with room for noise; quadratic stages fit an exponent of about 2
+MAX_EXPONENT = 1.5
+
+
+@pytest.fixture
+def parser_scaling(monkeypatch: pytest.MonkeyPatch) -> types.ModuleType:
+    monkeypatch.syspath_prepend(str(BENCHMARKS))
+    import parser_scaling
+    return parser_scaling
+
+
+@pytest.mark.parametrize("stage", ["lexer", "unterminated_brackets", "generator_expressions", "resolve_vars",
+                                   "expand_list", "parse_block", "nested_blocks", "argparse"])
+def test_parser_stage_scales_linearly(parser_scaling: types.ModuleType, stage: str) -> None:
+    _, exponent = parser_scaling.measure(stage, SIZES)
+    assert exponent < MAX_EXPONENT
+
+
+def test_resolve_vars_substitutes_nested_references() -> None:
+    variables = {"B": "b", "A_b": "nested", "L": "x;y"}
+    assert _resolve_vars("${A_${B}} ${L} ${MISSING}.", variables, {}) == "nested x;y ."
+    # A value that ends with a backslash escapes the reference that follows it
+    assert _resolve_vars("${S}${B}", {"S": "\\", "B": "b"}, {}) == "\\\\${B}"
+
+
+def test_argparse_takes_the_longest_option() -> None:
+    opts, remaining = argparse(["x", "NO", "DEFAULT", "PATH", "a", "NO", "b"],
+                               {"NO": "*", "NO DEFAULT": "-", "PATH": "?"})
+    assert opts == {"NO": ["b"], "NO DEFAULT": True, "PATH": "a"}
+    assert remaining == ["x"]
@@ -0,0 +1,58 @@
+import io
+import shutil
+from pathlib import Path
+
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.core.plugin_xml import PluginIndex, parse_plugin_description, read_plugin_description
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+
+AUTORALLY = Path("tests/test_packages/autorally_core")
+
+
+def test_parse_plugin_description_with_several_libraries() -> None:
+    contents = b"""<?xml version="1.0"?>
+<library path="lib/libfirst">
+  <class name="pkg/First" type="pkg::First" base_class_type="nodelet::Nodelet"><description>1</description></class>
+</library>
+<library path="lib/libsecond">
+  <class type="pkg::Second" base_class_type="rviz::Display"/>
+</library>
+"""
+    first, second = parse_plugin_description(io.BytesIO(contents))
+    assert (first.library, first.name, first.type_, first.is_nodelet) == ("lib/libfirst", "pkg/First", "pkg::First", True)
+    assert (second.library, second.name, second.base_class_type) == ("lib/libsecond", "pkg::Second", "rviz::Display")
+
+
+def test_read_plugin_description_is_cached_until_modified(tmp_path: Path) -> None:
+    path = tmp_path / "plugins.xml"
+    path.write_text('<library path="a"><class type="a::A" base_class_type="b::B"/></library>')
+    classes = read_plugin_description(path)
+    assert read_plugin_description(path) is classes
+    path.write_text('<library path="a"><class type="a::Changed" base_class_type="b::B"/></library>')
+    assert [c.type_ for c in read_plugin_description(path)] == ["a::Changed"]
+    assert read_plugin_description(tmp_path / "missing.xml") == ()
+
+
+def test_plugin_index_from_package_exports(tmp_path: Path) -> None:
+    # Without a nodelet_plugins.xml in the package root, nodelets are found through the package.xml export
+    package_dir = tmp_path / "autorally_core"
+    shutil.copytree(AUTORALLY, package_dir)
+    (package_dir / "nodelet_plugins.xml").rename(package_dir / "plugins.xml")
+    package_xml = package_dir / "package.xml"
+    package_xml.write_text(package_xml.read_text().replace("/nodelet_plugins.xml", "/plugins.xml"))
+
+    info = ROS1CMakeExtractor(package_dir).get_cmake_info()
+    assert info.targets["ImageRepublisher"].entrypoint == "autorally_core::ImageRepublisher::onInit"
+
+    plugins = PluginIndex()
+    BatchAnalyzer("ros1", sinks=[plugins]).run([package_dir])
+    nodelets = plugins.nodelets("autorally_core")
+    assert len(nodelets) == 7
+    assert plugins.classes_for_base_class("nodelet::Nodelet") == nodelets
+    assert plugins.classes_for_base_class_package("nodelet") == nodelets
+    assert [d.plugin.name for d in plugins.classes_named("autorally_core::CameraTrigger")] == \
+        ["autorally_core/CameraTrigger"]
+
+    plugins.remove("autorally_core")
+    assert len(plugins) == 0
+    assert plugins.classes_for_base_class("nodelet::Nodelet") == []
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.cmake_parser.parser import _parse_commands
+from ros_cmake_analyzer.diagnostics import DiagnosticsCollector, Level, UnhandledCommand, diagnostics
+from ros_cmake_analyzer.prelude import PreludeCache, prelude_length
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+
+PACKAGE_XML = ('<?xml version="1.0"?>\n<package format="2"><name>{name}</name><version>0.0.0</version>'
+               "<description>d</description><maintainer email='a@b.c'>m</maintainer><license>BSD</license>"
+               "<buildtool_depend>catkin</buildtool_depend></package>\n")
+PRELUDE = """\
+cmake_minimum_required(VERSION 3.5)
+project(shared)
+find_package(catkin REQUIRED COMPONENTS roscpp)
+set(COMMON_SOURCES src/common.cpp)
+list(APPEND EXTRA_SOURCES src/extra.cpp)
+#[[ A bracket comment
+    over two lines ]]
+macro(add_tool name)
+  add_executable(${name} src/${name}.cpp ${COMMON_SOURCES})
+  target_link_libraries(${name} ${catkin_LIBRARIES})
+endmacro()
+function(add_plugin name)
+  add_library(${name} src/${name}.cpp)
+endfunction()
+"""
+
+
+def _package(root: Path, name: str, cmakelists: str) -> Path:
+    package = root / name
+    (package / "src").mkdir(parents=True)
+    (package / "package.xml").write_text(PACKAGE_XML.format(name=name))
+    (package / "CMakeLists.txt").write_text(cmakelists)
+    for source in ("common", "extra", "tool", "plugin", name):
+        (package / "src" / f"{source}.cpp").write_text("int main() {}\n")
+    return package
+
+
+def _packages(root: Path, prelude: str = PRELUDE, count: int = 4) -> list[Path]:
+    return [_package(root, f"pkg{i}", prelude + f"add_tool(pkg{i})\nlist(APPEND EXTRA_SOURCES src/tool.cpp)\n"
+                                              f"add_library(lib{i} ${{EXTRA_SOURCES}})\nadd_plugin(plugin)\n")
+            for i in range(count)]
+
+
+def test_prelude_length() -> None:
+    assert prelude_length(_parse_commands(PRELUDE + "add_tool(a)\nset(B 1)\n", "f")) == 12
+    assert prelude_length(_parse_commands("set(A 1)\nif(A)\nset(B 1)\nendif()\n", "f")) == 1
+    # A command that the prelude redefines is not part of it
+    assert prelude_length(_parse_commands("macro(message)\nadd_executable(x)\nendmacro()\nmessage()\n", "f")) == 3
+    assert prelude_length(_parse_commands("macro(unterminated)\nset(A 1)\n", "f")) == 0
+
+
+def test_restored_packages_match_fresh_analysis(tmp_path: Path) -> None:
+    packages = _packages(tmp_path)
+    preludes = PreludeCache()
+    for package in packages:
+        restored = ROS1CMakeExtractor(package, preludes=preludes).get_cmake_info()
+        assert restored.to_dict() == ROS1CMakeExtractor(package).get_cmake_info().to_dict()
+        assert set(restored.targets) >= {package.name, f"lib{packages.index(package)}", "plugin"}
+    # The snapshot is taken the second time that the prelude is seen
+    assert len(preludes) == 1
+    assert preludes.hits == len(packages) - 2
+
+
+def test_syntax_errors_keep_their_lines(tmp_path: Path) -> None:
+    packages = _packages(tmp_path, count=2)
+    broken = _package(tmp_path, "broken", PRELUDE + "add_tool(broken))\nadd_plugin(plugin)\n")
+    preludes = PreludeCache()
+    for package in packages:
+        ROS1CMakeExtractor(package, preludes=preludes).get_cmake_info()
+    info = ROS1CMakeExtractor(broken, preludes=preludes, resilient=True).get_cmake_info()
+    assert preludes.hits == 1
+    assert info.to_dict() == ROS1CMakeExtractor(broken, resilient=True).get_cmake_info().to_dict()
+    # The parser does not count the line break within the bracket comment of the prelude
+    assert [c.cmake_line_no for c in info.unprocessed_commands if "skipped" in c.reason] == [14]
+
+
+def test_diagnostics_are_replayed(tmp_path: Path) -> None:
+    packages = _packages(tmp_path, count=3)
+    preludes = PreludeCache()
+    collector = DiagnosticsCollector()
+    diagnostics.add_sink(collector)
+    level = diagnostics.level
+    diagnostics.level = Level.DEBUG
+    try:
+        for package in packages:
+            collector.clear()
+            ROS1CMakeExtractor(package, preludes=preludes).get_cmake_info()
+    finally:
+        diagnostics.level = level
+        diagnostics.remove_sink(collector)
+    assert preludes.hits == 1
+    unhandled = [(e.command.command, e.command.cmake_file) for e in collector.of_type(UnhandledCommand)]
+    assert ("cmake_minimum_required", packages[2] / "CMakeLists.txt") in unhandled
+    assert all(cmake_file == packages[2] / "CMakeLists.txt" for _, cmake_file in unhandled)
+
+
+@pytest.mark.parametrize("prelude", [
+    PRELUDE + "set(HERE ${cmakelists})\n",
+    PRELUDE + "set(A 1) ",
+    PRELUDE + "#[[ unterminated\n",
+], ids=["refers_to_package", "shares_a_line", "unterminated_bracket"])
+def test_preludes_that_cannot_be_shared(tmp_path: Path, prelude: str) -> None:
+    preludes = PreludeCache()
+    for package in _packages(tmp_path, prelude, count=3):
+        assert (ROS1CMakeExtractor(package, preludes=preludes).get_cmake_info().to_dict()
+                == ROS1CMakeExtractor(package).get_cmake_info().to_dict())
+    assert preludes.hits == 0
+
+
+def test_batch_shares_preludes(tmp_path: Path) -> None:
+    packages = _packages(tmp_path)
+    expected = BatchAnalyzer("ros1").run(packages)
+    for workers in (1, 2):
+        report = BatchAnalyzer("ros1", workers=workers, share_preludes=True).run(packages)
+        assert sorted(report.analyzed) == sorted(expected.analyzed)
@@ -0,0 +1,73 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from fuzz_cmake import generate
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.cmake_parser.parser import CMakeSyntaxError, _parse_commands
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+
+PACKAGE_XML = ('<?xml version="1.0"?>\n<package format="2"><name>demo</name><version>0.0.0</version>'
+               "<description>d</description><maintainer email='a@b.c'>m</maintainer><license>BSD</license>"
+               "<buildtool_depend>catkin</buildtool_depend></package>\n")
+
+
+def _recover(source: str) -> tuple[list[tuple[str, list[str]]], list[tuple[str | None, int, int]]]:
+    errors: list = []
+    commands = _parse_commands(source, "CMakeLists.txt", errors=errors)
+    return ([(c.name, [value for _, value in c.args]) for c in commands],
+            [(e.command, e.line, e.end_line) for e in errors])
+
+
+@pytest.mark.parametrize(("source", "commands", "skipped"), [
+    ("a(1)\nb(2))\nc(3)\n", [("a", ["1"]), ("b", ["2"]), ("c", ["3"])], [(None, 2, 2)]),
+    ("a(1)\nb\nc(3)\n", [("a", ["1"]), ("c", ["3"])], [("b", 2, 2)]),
+    ('a(1)\nb("unterminated\nc(3)\n', [("a", ["1"]), ("c", ["3"])], [("b", 2, 2)]),
+    ("a(1)\nb(x (y)\nc(3)\n", [("a", ["1"]), ("c", ["3"])], [("b", 2, 2)]),
+    ("a(1)\n) ) junk\nmore junk\nc(3)\n", [("a", ["1"]), ("c", ["3"])], [(None, 2, 2), ("more", 3, 3)]),
+    ("a(\nb(\nc()\n", [("c", [])], [("a", 1, 1), ("b", 2, 2)]),
+    ("a(1)\nb", [("a", ["1"])], [("b", 2, 2)]),
+], ids=["stray_parenthesis", "missing_parenthesis", "unterminated_string", "unclosed_parenthesis", "junk",
+        "several_unclosed", "end_of_file"])
+def test_parser_resynchronizes_at_next_line(source: str, commands: list, skipped: list) -> None:
+    with pytest.raises(CMakeSyntaxError):
+        _parse_commands(source, "CMakeLists.txt")
+    assert _recover(source) == (commands, skipped)
+
+
+def test_valid_sources_parse_the_same_when_recovering() -> None:
+    rng = random.Random(0)
+    for _ in range(100):
+        source = generate(rng, rng.randint(1, 30))
+        try:
+            expected = [(c.name, c.args, c.line) for c in _parse_commands(source, "f")]
+        except CMakeSyntaxError:
+            _recover(source)
+            continue
+        errors: list = []
+        assert [(c.name, c.args, c.line) for c in _parse_commands(source, "f", errors=errors)] == expected
+        assert not errors
+
+
+def test_extractor_records_skipped_regions(tmp_path: Path) -> None:
+    (tmp_path / "package.xml").write_text(PACKAGE_XML)
+    (tmp_path / "a.cpp").write_text("int main() {}\n")
+    (tmp_path / "CMakeLists.txt").write_text("project(demo)\nadd_executable(first a.cpp))\n"
+                                             'message("unterminated\nadd_executable(second a.cpp)\n')
+    with pytest.raises(CMakeSyntaxError):
+        ROS1CMakeExtractor(tmp_path).get_cmake_info()
+
+    info = ROS1CMakeExtractor(tmp_path, resilient=True).get_cmake_info()
+    assert set(info.targets) == {"first", "second"}
+    skipped = [(c.command, c.cmake_line_no) for c in info.unprocessed_commands if "skipped" in c.reason]
+    assert skipped == [("", 2), ("message", 3)]
+
+    report = BatchAnalyzer("ros1", workers=2, resilient=True).run([tmp_path])
+    assert report.analyzed == [tmp_path]
+
+
+def test_unterminated_command_is_reported_where_it_starts() -> None:
+    errors: list = []
+    _parse_commands("a(1)\nb(x\nc(3)\n\n\n", "CMakeLists.txt", errors=errors)
+    assert [(e.message, e.line) for e in errors] == [("CMakeLists.txt(2): expected ')' and got end of file", 2)]
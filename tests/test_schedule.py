@@ -0,0 +1,100 @@
+import shutil
+from pathlib import Path
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.checkpoint import main
+from ros_cmake_analyzer.core.package import Package
+from ros_cmake_analyzer.model import CMakeInfo
+from ros_cmake_analyzer.schedule import CostHistory, PackageCost, measure
+
+FIXTURES = sorted(find_packages("tests/test_packages"))
+
+
+def _package(root: Path, name: str, size: int) -> Path:
+    package = root / name
+    (package / "cmake").mkdir(parents=True)
+    (package / "CMakeLists.txt").write_text("#" * size)
+    (package / "cmake" / "extra.cmake").write_text("#" * size)
+    (package / "a.cpp").write_text("#" * 100000)
+    return package
+
+
+def test_measure_counts_cmake_files(tmp_path: Path) -> None:
+    package = _package(tmp_path, "a", 100)
+    fingerprint, size = measure(package)
+    assert size == 200
+    assert measure(package) == (fingerprint, size)
+    (package / "cmake" / "extra.cmake").write_text("#" * 101)
+    assert measure(package)[0] != fingerprint
+    assert measure(package)[1] == 201
+
+
+def test_unseen_packages_are_ordered_by_size(tmp_path: Path) -> None:
+    packages = [_package(tmp_path, name, size) for name, size in [("small", 10), ("large", 1000), ("medium", 100)]]
+    assert [p.name for p in CostHistory().schedule(packages)] == ["large", "medium", "small"]
+
+
+def test_history_overrides_size(tmp_path: Path) -> None:
+    small, large, unseen = (_package(tmp_path, name, size) for name, size in [("s", 10), ("l", 1000), ("u", 500)])
+    history = CostHistory()
+    history.record(small, 5.0)
+    history.record(large, 1.0)
+    # The unseen package is estimated at the average rate of the recorded packages
+    assert history.estimate(unseen) == (6.0 / 2020) * 1000
+    assert history.schedule([large, unseen, small]) == [small, unseen, large]
+
+    # A package whose CMake files have changed is scaled by its new size
+    (large / "CMakeLists.txt").write_text("#" * 3000)
+    history = CostHistory(history.costs)
+    assert history.estimate(large) == 2.0
+
+
+def test_recording_smooths_unchanged_packages(tmp_path: Path) -> None:
+    package = _package(tmp_path, "a", 10)
+    history = CostHistory()
+    history.record(package, 4.0)
+    history.record(package, 2.0)
+    assert history.costs[str(package)].seconds == 3.0
+    (package / "CMakeLists.txt").write_text("changed")
+    history = CostHistory(history.costs)
+    history.record(package, 1.0)
+    assert history.costs[str(package)].seconds == 1.0
+
+
+def test_history_round_trip(tmp_path: Path) -> None:
+    assert not CostHistory.load(tmp_path / "missing.json").costs
+    history = CostHistory({"a": PackageCost("0123", 1.5, 20), "b": PackageCost("4567", 0.25, 3)})
+    history.save(tmp_path / "costs.json")
+    assert CostHistory.load(tmp_path / "costs.json").costs == history.costs
+    assert not (tmp_path / "costs.json.tmp").exists()
+
+
+def test_batch_analyzes_most_expensive_first(tmp_path: Path) -> None:
+    packages = []
+    for i in range(2):
+        for fixture in FIXTURES:
+            packages.append(tmp_path / f"{fixture.name}_{i}")
+            shutil.copytree(fixture, packages[-1])
+    fingerprint, size = measure(packages[0])
+    history = CostHistory({str(packages[0]): PackageCost(fingerprint, 1000.0, size),
+                           str(packages[2]): PackageCost(measure(packages[2])[0], 1.0, size)})
+    analyzed = []
+
+    class _Recorder:
+        def add(self, package: Package, info: CMakeInfo) -> None:
+            analyzed.append(package.path)
+
+    report = BatchAnalyzer("ros1", sinks=[_Recorder()], cost_history=history).run(packages)
+    assert analyzed[0] == packages[0]
+    assert sorted(report.analyzed) == sorted(packages)
+    assert set(history.costs) == {str(path) for path in packages}
+    assert history.costs[str(packages[0])].seconds < 1000.0
+
+    report = BatchAnalyzer("ros1", workers=2, cost_history=history).run(packages)
+    assert sorted(report.analyzed) == sorted(packages)
+    assert all(cost.seconds > 0 for cost in history.costs.values())
+
+
+def test_command_line_records_history(tmp_path: Path) -> None:
+    main([str(tmp_path / "results.jsonl"), "ros1", "tests/test_packages", "--cost-history", str(tmp_path / "c.json")])
+    assert set(CostHistory.load(tmp_path / "c.json").costs) == {str(path) for path in FIXTURES}
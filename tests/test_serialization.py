@@ -0,0 +1,90 @@
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.model import (
+    TARGET_CLASSES,
+    CMakeBinaryTarget,
+    CMakeInfo,
+    CMakePluginReference,
+    CommandInformation,
+    FileInformation,
+    SourceLanguage,
+)
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.serialization import UnsupportedFormatError, decode, encode, read_json, write_json
+
+
+def _text(rng: random.Random) -> str:
+    alphabet = "abcXYZ_/.-;$ {}\"\\\né中\U0001f600"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randrange(12)))
+
+
+def _random_info(rng: random.Random) -> CMakeInfo:
+    targets = {}
+    for _ in range(rng.randrange(6)):
+        target_class = rng.choice(list(TARGET_CLASSES.values()))
+        args = {}
+        if issubclass(target_class, CMakeBinaryTarget):
+            args["_entrypoint"] = rng.choice([None, "main", _text(rng)])
+        target = target_class(
+            _text(rng),
+            rng.choice(list(SourceLanguage)),
+            {_text(rng) for _ in range(rng.randrange(5))},
+            [_text(rng) for _ in range(rng.randrange(4))],
+            {_text(rng) for _ in range(rng.randrange(2))},
+            _text(rng),
+            rng.randrange(10_000),
+            tuple(_text(rng) for _ in range(rng.randrange(3))),
+            **args,
+        )
+        targets[_text(rng)] = target
+        if rng.random() < 0.3:
+            targets[_text(rng) + "/alias"] = target
+    return CMakeInfo(
+        Path(_text(rng)),
+        targets,
+        tuple(CMakePluginReference(Path(_text(rng)), _text(rng), _text(rng), rng.randrange(100))
+              for _ in range(rng.randrange(3))),
+        {_text(rng) for _ in range(rng.randrange(3))},
+        [FileInformation(_text(rng), Path(_text(rng)), rng.randrange(100)) for _ in range(rng.randrange(3))],
+        [CommandInformation(_text(rng), [_text(rng) for _ in range(rng.randrange(4))], _text(rng),
+                            Path(_text(rng)), rng.randrange(100)) for _ in range(rng.randrange(4))],
+    )
+
+
+def _json_round_trip(info: CMakeInfo) -> CMakeInfo:
+    buffer = io.StringIO()
+    write_json(info, buffer)
+    buffer.seek(0)
+    return read_json(buffer)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_round_trips(seed: int) -> None:
+    info = _random_info(random.Random(seed))
+    for decoded in (decode(encode(info)), _json_round_trip(info)):
+        assert decoded == info
+        # Targets that are keyed more than once are still shared after decoding
+        assert len({id(target) for target in decoded.targets.values()}) == \
+            len({id(target) for target in info.targets.values()})
+
+
+def test_extracted_info_round_trips() -> None:
+    info = ROS1CMakeExtractor("tests/test_packages/autorally_core").get_cmake_info()
+    decoded = decode(memoryview(encode(info)))
+    assert decoded == info
+    assert decoded.targets["ImageRepublisher"].entrypoint == "autorally_core::ImageRepublisher::onInit"
+    assert decoded.targets["xbeeNode"].libraries == ("SerialSensorInterface", "ar_diagnostics")
+    assert _json_round_trip(info) == info
+
+
+def test_rejects_other_versions() -> None:
+    data = bytearray(encode(_random_info(random.Random(0))))
+    data[4] = 99
+    with pytest.raises(UnsupportedFormatError):
+        decode(data)
+    with pytest.raises(UnsupportedFormatError):
+        read_json(io.StringIO('{"format": "ros-cmake-analyzer/cmake-info", "version": 99}'))
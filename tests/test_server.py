@@ -0,0 +1,60 @@
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import find_packages
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.server import AnalysisError, ForkServer, request
+
+FIXTURES = sorted(find_packages("tests/test_packages"))
+
+
+@pytest.fixture()
+def server(tmp_path: Path) -> Iterator[Path]:
+    address = tmp_path / "server.sock"
+    process = subprocess.Popen([sys.executable, "-m", "ros_cmake_analyzer.server", "serve", str(address)])
+    try:
+        deadline = time.monotonic() + 30
+        while not address.exists():
+            assert process.poll() is None and time.monotonic() < deadline
+            time.sleep(0.01)
+        yield address
+    finally:
+        process.terminate()
+        assert process.wait(timeout=30) == 0
+    assert not address.exists()
+
+
+def test_results_match_the_extractor(server: Path) -> None:
+    for package_dir in FIXTURES:
+        name, path, info = request(server, "ros1", package_dir)
+        # The client sends the absolute path of the package, as the server may be in another directory
+        extractor = ROS1CMakeExtractor(package_dir.absolute())
+        assert (name, path) == (extractor.package.name, package_dir.absolute())
+        assert info.to_dict() == extractor.get_cmake_info().to_dict()
+
+
+def test_failures_are_reported(server: Path, tmp_path: Path) -> None:
+    with pytest.raises(AnalysisError, match="missing"):
+        request(server, "ros1", tmp_path / "missing")
+    # The server carries on after a failure
+    assert request(server, "ros1", FIXTURES[0])[0] == "autorally_core"
+
+
+def test_command_line_client(server: Path) -> None:
+    command = [sys.executable, "-m", "ros_cmake_analyzer.server", "request", str(server), "ros1"]
+    result = subprocess.run([*command, str(FIXTURES[1])], capture_output=True, text=True, check=True)
+    assert result.stdout.startswith('{"package": "car_demo"')
+    result = subprocess.run([*command, "missing"], capture_output=True, text=True, check=False)
+    assert result.returncode == 1
+    assert result.stdout.startswith('{"error"')
+
+
+def test_socket_is_removed_when_closed(tmp_path: Path) -> None:
+    with ForkServer(tmp_path / "server.sock") as server:
+        assert [path.name for path in tmp_path.iterdir()] == ["server.sock"]
+    assert not server.address.exists()
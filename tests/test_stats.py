@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.model import CMakeInfo
+from ros_cmake_analyzer.ros1 import ROS1CMakeExtractor
+from ros_cmake_analyzer.stats import AnalysisStats
+
+AUTORALLY = Path("tests/test_packages/autorally_core")
+
+
+def test_stats_are_only_collected_on_request() -> None:
+    assert ROS1CMakeExtractor(AUTORALLY).get_cmake_info().stats is None
+
+
+def test_stats_cover_files_handlers_and_filesystem() -> None:
+    info = ROS1CMakeExtractor(AUTORALLY, collect_stats=True).get_cmake_info()
+    stats = info.stats
+    assert stats is not None
+
+    top_level = stats.files[str(AUTORALLY / "CMakeLists.txt")]
+    assert top_level.bytes_read == (AUTORALLY / "CMakeLists.txt").stat().st_size
+    assert top_level.lex_seconds > 0 and top_level.parse_seconds > 0 and top_level.expand_seconds > 0
+    assert str(AUTORALLY / "src/ocs/CMakeLists.txt") in stats.files
+    assert stats.bytes_read == sum(Path(f).stat().st_size for f in stats.files)
+
+    assert stats.handlers["add_subdirectory"].calls == len(stats.files) - 1
+    assert stats.handlers["add_subdirectory"].seconds > stats.handlers["project"].seconds
+    assert stats.slowest_handlers(1)[0][0] == "add_subdirectory"
+    assert stats.filesystem["rglob"] >= 4
+    assert stats.filesystem["read"] == len(stats.files)
+
+    assert CMakeInfo.from_dict(info.to_dict()).stats == stats
+    assert CMakeInfo.from_dict(info.to_dict()) == info
+
+
+def test_batch_runs_combine_stats() -> None:
+    package = AUTORALLY.resolve()
+    report = BatchAnalyzer("ros1", collect_stats=True).run([package, package])
+    single = ROS1CMakeExtractor(package, collect_stats=True).get_cmake_info().stats
+    assert report.stats is not None and single is not None
+    assert report.stats.packages == 2
+    assert report.stats.handlers["add_library"].calls == 2 * single.handlers["add_library"].calls
+
+    parallel = BatchAnalyzer("ros1", workers=2, collect_stats=True).run([package, package])
+    assert parallel.stats is not None
+    assert parallel.stats.handlers["add_library"].calls == report.stats.handlers["add_library"].calls
+    assert BatchAnalyzer("ros1").run([package]).stats is None
+
+
+def test_merge_adds_counts() -> None:
+    first, second = AnalysisStats(), AnalysisStats()
+    first.record_handler("set", 1.0)
+    second.record_handler("set", 2.0)
+    second.count("glob", 3)
+    second.file("CMakeLists.txt").bytes_read = 10
+    first.merge(second)
+    assert (first.handlers["set"].calls, first.handlers["set"].seconds) == (2, 3.0)
+    assert (first.filesystem, first.bytes_read, first.packages) == ({"glob": 3}, 10, 2)
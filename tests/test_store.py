@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from ros_cmake_analyzer.batch import BatchAnalyzer, find_packages
+from ros_cmake_analyzer.store import ResultStore
+
+
+def test_store_queries(tmp_path: Path) -> None:
+    with ResultStore(tmp_path / "results.db", batch_size=1) as store:
+        report = BatchAnalyzer("ros1", sinks=[store]).run(find_packages("tests/test_packages"))
+        assert not report.failed
+        assert [p.name for p in store.packages()] == ["autorally_core", "car_demo"]
+
+        compiling = store.targets_compiling("src/xbee/XbeeInterface.cpp")
+        assert sorted(t.key for t in compiling) == ["xbeeCoordinator", "xbeeNode"]
+        absolute = Path("tests/test_packages/autorally_core/src/xbee/XbeeInterface.cpp").resolve()
+        assert store.targets_compiling(absolute) == compiling
+
+        libraries = {t.key for t in store.targets_of_kind("library")}
+        assert "ImageRepublisher" in libraries
+        assert {t.key for t in store.targets_linking("ar_diagnostics")} >= {"runStop", "xbeeNode"}
+
+
+def test_store_replaces_reingested_package(tmp_path: Path) -> None:
+    database = tmp_path / "results.db"
+    for _ in range(2):
+        with ResultStore(database) as store:
+            BatchAnalyzer("ros1", sinks=[store]).run(["tests/test_packages/car_demo"])
+    with ResultStore(database) as store:
+        assert len(store.packages()) == 1
+        assert len(store.targets_compiling("nodes/joystick_translator")) == 1
+
+
+class _Interrupt(Exception):
+    pass
+
+
+def _ingest_and_fail(database: Path) -> None:
+    with ResultStore(database, batch_size=2) as store:
+        BatchAnalyzer("ros1", sinks=[store]).run(["tests/test_packages/car_demo"])
+        raise _Interrupt
+
+
+def test_store_discards_the_unfinished_batch_of_a_failed_run(tmp_path: Path) -> None:
+    with pytest.raises(_Interrupt):
+        _ingest_and_fail(tmp_path / "interrupted.db")
+    with ResultStore(tmp_path / "interrupted.db") as store:
+        assert store.packages() == []
+
+    # Batches that were written before the failure are kept
+    database = tmp_path / "results.db"
+    with ResultStore(database, batch_size=2) as store:
+        BatchAnalyzer("ros1", sinks=[store]).run(sorted(find_packages("tests/test_packages")))
+    with pytest.raises(_Interrupt):
+        _ingest_and_fail(database)
+    with ResultStore(database) as store:
+        assert [p.name for p in store.packages()] == ["autorally_core", "car_demo"]
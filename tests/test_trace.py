@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+from ros_cmake_analyzer import trace
+from ros_cmake_analyzer.batch import BatchAnalyzer
+from ros_cmake_analyzer.core import plugin_xml
+from ros_cmake_analyzer.store import main as store_main
+
+AUTORALLY = Path("tests/test_packages/autorally_core").resolve()
+
+
+def _spans(events: list[dict], category: str) -> list[dict]:
+    return [event for event in events if event["ph"] == "X" and event["cat"] == category]
+
+
+def test_serial_run_records_spans() -> None:
+    # Plugin description files are only parsed, and traced, when they are not already cached
+    plugin_xml._cache.clear()
+    tracer = trace.Tracer(handler_threshold=0)
+    BatchAnalyzer("ros1", tracer=tracer).run([AUTORALLY])
+    assert trace.current is None
+
+    package, = _spans(tracer.events, "package")
+    assert package["name"] == "autorally_core"
+    files = _spans(tracer.events, "cmake")
+    assert {event["args"]["path"] for event in files} >= {str(AUTORALLY / "CMakeLists.txt")}
+    assert len(_spans(tracer.events, "subdirectory")) == len(files) - 1
+    assert {event["name"] for event in _spans(tracer.events, "handler")} >= {"add_library", "add_subdirectory"}
+    assert _spans(tracer.events, "plugin_xml")
+    for event in tracer.events:
+        assert package["ts"] <= event["ts"] and event["ts"] + event["dur"] <= package["ts"] + package["dur"] + 1
+
+
+def test_handler_threshold_filters_short_calls() -> None:
+    tracer = trace.Tracer(handler_threshold=60)
+    BatchAnalyzer("ros1", tracer=tracer).run([AUTORALLY])
+    assert _spans(tracer.events, "handler") == []
+
+
+def test_parallel_run_has_a_track_per_worker(tmp_path: Path) -> None:
+    output = tmp_path / "trace.json"
+    store_main([str(tmp_path / "results.db"), "ingest", "ros1", str(AUTORALLY), str(AUTORALLY),
+                "--workers", "2", "--trace", str(output)])
+    events = json.loads(output.read_text())["traceEvents"]
+    names = {event["pid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+    assert sorted(names.values()) == ["ros-cmake-analyzer", "worker-0", "worker-1"]
+    workers = {pid for pid, name in names.items() if name.startswith("worker-")}
+    packages = _spans(events, "package")
+    assert len(packages) == 2
+    assert {event["pid"] for event in packages} <= workers
+    assert {event["pid"] for event in _spans(events, "cmake")} <= workers